@@ -0,0 +1,486 @@
+"""Benchmarks of the whole-slide CLI pipelines on a synthetic slide.
+
+These benchmarks follow the conventions of airspeed velocity (asv): the
+``time_*`` methods are timed, the ``peakmem_*`` methods record the peak
+resident set size of the process and the ``track_*`` methods record the
+throughput of a CLI in tiles per second.  The synthetic slide is generated
+once by ``setup_cache``.  Its size and nuclear density, and the Dask
+scheduler used by the CLIs, are configured by the environment variables
+``HTK_BENCHMARK_SLIDE_SIZE`` (default 4096), ``HTK_BENCHMARK_NUCLEI_DENSITY``
+(nuclei per million pixels, default 1500) and ``HTK_BENCHMARK_SCHEDULER``
+(default multithreading).
+
+They can also be run directly with ``python -m benchmarks.bench_cli_pipelines``,
+which runs every benchmark in a fresh process and prints its time, throughput
+and peak RSS.
+
+"""
+from argparse import Namespace
+import contextlib
+import copy
+import importlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+try:
+    from queue import Empty
+except ImportError:
+    from Queue import Empty
+
+from benchmarks.synthetic_slide import make_synthetic_slide
+
+SLIDE_SIZE = int(os.environ.get('HTK_BENCHMARK_SLIDE_SIZE', 4096))
+NUCLEI_DENSITY = float(os.environ.get('HTK_BENCHMARK_NUCLEI_DENSITY', 1500))
+SCHEDULER = os.environ.get('HTK_BENCHMARK_SCHEDULER', 'multithreading')
+
+SLIDE_MAGNIFICATION = 20.0
+
+
+def run_cli(name, *args, **kwargs):
+    """Run a CLI in the current process.
+
+    Parameters
+    ----------
+    name : str
+        Name of the CLI, e.g. 'NucleiDetection'.
+    *args :
+        The positional arguments of the CLI.
+    **kwargs :
+        The flags of the CLI, passed as ``--<key>=<value>``.
+
+    Returns
+    -------
+    args : Namespace
+        The parsed arguments the CLI was run with.
+
+    """
+    from histomicstk.cli.utils import CLIArgumentParser
+
+    cli = importlib.import_module('histomicstk.cli.{0}.{0}'.format(name))
+
+    parser = CLIArgumentParser(os.path.join(
+        os.path.dirname(cli.__file__), name + '.xml'))
+
+    cli_args = parser.parse_args(
+        [str(arg) for arg in args] +
+        ['--{}={}'.format(k, v) for k, v in sorted(kwargs.items())])
+
+    # the CLIs report their progress on stdout
+    with _suppress_stdout():
+        cli.main(cli_args)
+
+    return cli_args
+
+
+@contextlib.contextmanager
+def _suppress_stdout():
+
+    stdout = sys.stdout
+
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            yield
+        finally:
+            sys.stdout = stdout
+
+
+def _nuclei_cli_args(slide_path):
+    """Parse the default arguments of the NucleiDetection CLI."""
+    from histomicstk.cli.utils import CLIArgumentParser
+
+    cli = importlib.import_module(
+        'histomicstk.cli.NucleiDetection.NucleiDetection')
+
+    return CLIArgumentParser(os.path.join(
+        os.path.dirname(cli.__file__), 'NucleiDetection.xml')).parse_args(
+            [slide_path, os.devnull])
+
+
+def _create_dask_client():
+
+    from histomicstk.cli import utils as cli_utils
+
+    with _suppress_stdout():
+        cli_utils.create_dask_client(Namespace(
+            scheduler=SCHEDULER, num_workers=0, num_threads_per_worker=0))
+
+
+class _SlideSuite(object):
+
+    number = 1
+    repeat = 3
+    warmup_time = 0
+    timeout = 1800
+
+    def setup_cache(self):
+
+        return os.path.abspath(make_synthetic_slide(
+            'synthetic_slide.tiff', SLIDE_SIZE, NUCLEI_DENSITY,
+            magnification=SLIDE_MAGNIFICATION))
+
+    def setup(self, slide_path):
+
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self, slide_path):
+
+        shutil.rmtree(self.tmp_dir)
+
+    def _tmp_path(self, filename):
+
+        return os.path.join(self.tmp_dir, filename)
+
+
+class CLIPipelinesSuite(_SlideSuite):
+    """End-to-end runs of the whole-slide CLIs."""
+
+    def run_nuclei_detection(self, slide_path):
+
+        return run_cli(
+            'NucleiDetection', slide_path, self._tmp_path('nuclei.anot'),
+            scheduler=SCHEDULER, num_threads_per_worker=0)
+
+    def run_compute_nuclei_features(self, slide_path):
+
+        return run_cli(
+            'ComputeNucleiFeatures', slide_path,
+            self._tmp_path('features.csv'), self._tmp_path('nuclei.anot'),
+            scheduler=SCHEDULER, num_threads_per_worker=0)
+
+    def run_positive_pixel_count(self, slide_path, **kwargs):
+
+        return run_cli(
+            'PositivePixelCount', slide_path,
+            0.83, 0.15, 0.05, 0.95, 0.65, 0.35, 0.05,
+            returnparameterfile=self._tmp_path('ppc.txt'),
+            scheduler=SCHEDULER, **kwargs)
+
+    def run_positive_pixel_count_label_image(self, slide_path):
+
+        return self.run_positive_pixel_count(
+            slide_path, outputLabelImage=self._tmp_path('labels.tiff'),
+            maxRegionSize=SLIDE_SIZE)
+
+    def run_background_intensity(self, slide_path):
+
+        return run_cli(
+            'BackgroundIntensity', slide_path,
+            sampleApproximateTotal=20000,
+            returnparameterfile=self._tmp_path('background.txt'),
+            scheduler=SCHEDULER)
+
+    def run_separate_stains_macenko_pca(self, slide_path):
+
+        return run_cli(
+            'SeparateStainsMacenkoPCA', slide_path, '255,255,255',
+            streamSampleSize=100000,
+            returnparameterfile=self._tmp_path('stains.txt'),
+            scheduler=SCHEDULER)
+
+    def run_separate_stains_xu_snmf(self, slide_path):
+
+        return run_cli(
+            'SeparateStainsXuSnmf', slide_path, '255,255,255',
+            streamSampleSize=20000,
+            returnparameterfile=self._tmp_path('stains.txt'),
+            scheduler=SCHEDULER)
+
+    def time_nuclei_detection(self, slide_path):
+        self.run_nuclei_detection(slide_path)
+
+    def time_compute_nuclei_features(self, slide_path):
+        self.run_compute_nuclei_features(slide_path)
+
+    def time_positive_pixel_count(self, slide_path):
+        self.run_positive_pixel_count(slide_path)
+
+    def time_positive_pixel_count_label_image(self, slide_path):
+        self.run_positive_pixel_count_label_image(slide_path)
+
+    def time_background_intensity(self, slide_path):
+        self.run_background_intensity(slide_path)
+
+    def time_separate_stains_macenko_pca(self, slide_path):
+        self.run_separate_stains_macenko_pca(slide_path)
+
+    def time_separate_stains_xu_snmf(self, slide_path):
+        self.run_separate_stains_xu_snmf(slide_path)
+
+    def peakmem_nuclei_detection(self, slide_path):
+        self.run_nuclei_detection(slide_path)
+
+    def peakmem_compute_nuclei_features(self, slide_path):
+        self.run_compute_nuclei_features(slide_path)
+
+    def peakmem_positive_pixel_count(self, slide_path):
+        self.run_positive_pixel_count(slide_path)
+
+    def peakmem_positive_pixel_count_label_image(self, slide_path):
+        self.run_positive_pixel_count_label_image(slide_path)
+
+    def peakmem_background_intensity(self, slide_path):
+        self.run_background_intensity(slide_path)
+
+    def peakmem_separate_stains_macenko_pca(self, slide_path):
+        self.run_separate_stains_macenko_pca(slide_path)
+
+    def peakmem_separate_stains_xu_snmf(self, slide_path):
+        self.run_separate_stains_xu_snmf(slide_path)
+
+    def track_nuclei_detection_throughput(self, slide_path):
+        return self._throughput(self.run_nuclei_detection, slide_path)
+
+    track_nuclei_detection_throughput.unit = 'tiles/s'
+
+    def track_compute_nuclei_features_throughput(self, slide_path):
+        return self._throughput(self.run_compute_nuclei_features, slide_path)
+
+    track_compute_nuclei_features_throughput.unit = 'tiles/s'
+
+    def track_positive_pixel_count_throughput(self, slide_path):
+        return self._throughput(self.run_positive_pixel_count, slide_path)
+
+    track_positive_pixel_count_throughput.unit = 'tiles/s'
+
+    def _throughput(self, run, slide_path):
+        """Run a CLI and return the number of tiles of its analysis tile grid
+        processed per second.
+        """
+        import large_image
+
+        import histomicstk.utils as htk_utils
+
+        start_time = time.time()
+
+        args = run(slide_path)
+
+        elapsed = time.time() - start_time
+
+        it_kwargs = {}
+
+        if hasattr(args, 'analysis_tile_size'):
+            it_kwargs = {
+                'tile_size': {'width': args.analysis_tile_size},
+                'scale': {'magnification': args.analysis_mag},
+            }
+
+        num_tiles = htk_utils.get_tile_source(slide_path).getSingleTile(
+            format=large_image.tilesource.TILE_FORMAT_NUMPY,
+            **it_kwargs)['iterator_range']['position']
+
+        return num_tiles / elapsed
+
+
+class NucleiDetectionStagesSuite(_SlideSuite):
+    """The stages of the NucleiDetection CLI, timed separately."""
+
+    def setup(self, slide_path):
+
+        import histomicstk.preprocessing.color_normalization as htk_cnorm
+        import histomicstk.utils as htk_utils
+        from histomicstk.cli import utils as cli_utils
+        from histomicstk.cli.NucleiDetection import NucleiDetection
+
+        _create_dask_client()
+
+        self.args = _nuclei_cli_args(slide_path)
+
+        self.ts = htk_utils.get_tile_source(slide_path)
+
+        self.it_kwargs = {
+            'tile_size': {'width': self.args.analysis_tile_size},
+            'scale': {'magnification': self.args.analysis_mag},
+        }
+
+        self.im_fgnd_mask_lres, self.fgnd_seg_scale = \
+            cli_utils.segment_wsi_foreground_at_low_res(self.ts)
+
+        self.tile_positions = [
+            tile['tile_position']['position']
+            for tile in htk_utils.foreground_tile_iterator(
+                slide_path, self.im_fgnd_mask_lres, self.fgnd_seg_scale,
+                self.it_kwargs, min_fgnd_frac=self.args.min_fgnd_frac,
+                order='hilbert')]
+
+        if not self.tile_positions:
+            # skipped by asv, e.g. if the slide is smaller than a tile
+            raise NotImplementedError(
+                'The synthetic slide has no foreground analysis tile')
+
+        super(NucleiDetectionStagesSuite, self).setup(slide_path)
+
+        self.src_mu_lab, self.src_sigma_lab = htk_cnorm.reinhard_stats(
+            slide_path, 0.01, magnification=self.args.analysis_mag,
+            method='moments')
+
+        self.nuclei_annot = NucleiDetection.detect_tile_nuclei_batch(
+            self.tile_positions[:1], slide_path, self.args, self.it_kwargs,
+            self.src_mu_lab, self.src_sigma_lab)
+
+    def time_foreground_mask(self, slide_path):
+
+        from histomicstk.cli import utils as cli_utils
+
+        cli_utils.segment_wsi_foreground_at_low_res(self.ts)
+
+    def time_tile_foreground_fraction(self, slide_path):
+
+        import histomicstk.utils as htk_utils
+
+        list(htk_utils.foreground_tile_iterator(
+            slide_path, self.im_fgnd_mask_lres, self.fgnd_seg_scale,
+            self.it_kwargs, min_fgnd_frac=self.args.min_fgnd_frac,
+            order='hilbert'))
+
+    def time_reinhard_stats(self, slide_path):
+
+        import histomicstk.preprocessing.color_normalization as htk_cnorm
+
+        htk_cnorm.reinhard_stats(
+            slide_path, 0.01, magnification=self.args.analysis_mag,
+            method='moments')
+
+    def time_detect_tile_nuclei(self, slide_path):
+
+        from histomicstk.cli.NucleiDetection import NucleiDetection
+
+        NucleiDetection.detect_tile_nuclei(
+            slide_path, self.tile_positions[0], self.args, self.it_kwargs,
+            self.src_mu_lab, self.src_sigma_lab)
+
+    def time_detect_tile_nuclei_gvf(self, slide_path):
+
+        from histomicstk.cli.NucleiDetection import NucleiDetection
+
+        args = copy.copy(self.args)
+        args.nuclei_segmentation_method = 'gvf'
+
+        NucleiDetection.detect_tile_nuclei(
+            slide_path, self.tile_positions[0], args, self.it_kwargs,
+            self.src_mu_lab, self.src_sigma_lab)
+
+    def time_write_annotations(self, slide_path):
+
+        from histomicstk.cli import utils as cli_utils
+
+        with cli_utils.AnnotationWriter(
+                self._tmp_path('nuclei.anot'), 'nuclei') as annot_writer:
+            annot_writer.write_elements(
+                cli_utils.nuclei_annotation_elements(self.nuclei_annot))
+
+
+def _run_benchmark(suite_class, name, slide_path, queue):
+    """Run a benchmark and put its time, result, peak RSS and error, if it
+    failed, in queue.
+    """
+    import resource
+
+    try:
+        suite = suite_class()
+        suite.setup(slide_path)
+
+        try:
+            start_time = time.time()
+            result = getattr(suite, name)(slide_path)
+            elapsed = time.time() - start_time
+        finally:
+            suite.teardown(slide_path)
+
+    except NotImplementedError:
+        # asv skips benchmarks whose setup raises NotImplementedError
+        queue.put((None, None, None, 'skipped'))
+        return
+
+    except (ImportError, OSError, RuntimeError, ValueError, MemoryError):
+        # missing optional dependencies, unreadable or unwritable files and
+        # errors of the CLIs on the synthetic slide are reported, any other
+        # error exits the process and is reported by its exit code
+        queue.put((None, None, None, traceback.format_exc()))
+        return
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss *= 1 if sys.platform == 'darwin' else 1024
+
+    queue.put((elapsed, result, peak_rss, None))
+
+
+def _get_benchmark_result(process, queue):
+    """Get the result of the benchmark run by process, or an error if the
+    process exited without one, e.g. if it crashed.
+    """
+
+    while True:
+
+        try:
+            return queue.get(timeout=1)
+        except Empty:
+            pass
+
+        if not process.is_alive():
+            try:
+                return queue.get(timeout=1)
+            except Empty:
+                return (None, None, None,
+                        'exited with code {}'.format(process.exitcode))
+
+
+def main():
+
+    tmp_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+
+    try:
+        os.chdir(tmp_dir)
+
+        slide_path = CLIPipelinesSuite().setup_cache()
+
+        print('Synthetic slide: {0}x{0} pixels, {1:g} nuclei per million '
+              'pixels, {2:.1f} MB'.format(
+                  SLIDE_SIZE, NUCLEI_DENSITY,
+                  os.path.getsize(slide_path) / 1e6))
+
+        for suite_class in (CLIPipelinesSuite, NucleiDetectionStagesSuite):
+
+            for name in sorted(dir(suite_class)):
+
+                if not name.startswith(('time_', 'track_')):
+                    continue
+
+                # each benchmark is run in a fresh process to measure its
+                # own peak RSS
+                queue = multiprocessing.Queue()
+                process = multiprocessing.Process(
+                    target=_run_benchmark,
+                    args=(suite_class, name, slide_path, queue))
+                process.start()
+                elapsed, result, peak_rss, error = _get_benchmark_result(
+                    process, queue)
+                process.join()
+
+                if error is not None:
+                    print('{0:48s} {1}'.format(
+                        suite_class.__name__ + '.' + name,
+                        error.rstrip().splitlines()[-1]))
+                    if error != 'skipped':
+                        sys.stderr.write(error)
+                    continue
+
+                print('{0:48s} {1:9.3f} s {2:>16s} {3:8.1f} MB'.format(
+                    suite_class.__name__ + '.' + name, elapsed,
+                    '' if result is None else '{:.2f} tiles/s'.format(result),
+                    peak_rss / 1e6))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+
+    main()
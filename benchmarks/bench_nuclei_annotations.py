@@ -0,0 +1,191 @@
+"""Benchmarks of the generation of nuclei annotations from a label image.
+
+These benchmarks follow the conventions of airspeed velocity (asv): every
+``time_*`` method of a class is timed after calling its ``setup`` method.
+They can also be run directly with ``python -m benchmarks.bench_nuclei_annotations``.
+
+"""
+import timeit
+
+import numpy as np
+import scipy.ndimage
+import skimage.measure
+
+import histomicstk.segmentation as htk_seg
+from histomicstk.cli import utils as cli_utils
+
+
+def dense_label_tile(size=1024, num_nuclei=4000, seed=0):
+    """Generate a synthetic label image densely packed with nuclei.
+
+    Nuclei are the Voronoi cells of random seed points, separated by one
+    pixel of background and opened to remove the one pixel wide corners
+    that the boundary tracer can not follow.
+
+    """
+    rng = np.random.RandomState(seed)
+
+    im_seeds = np.ones((size, size), dtype=bool)
+    im_seeds[rng.randint(0, size, num_nuclei),
+             rng.randint(0, size, num_nuclei)] = False
+
+    im_label = np.zeros((size, size), dtype=np.int32)
+    im_label[~im_seeds] = np.arange(1, np.count_nonzero(~im_seeds) + 1)
+
+    # assign every pixel to its nearest seed
+    _, (rows, cols) = scipy.ndimage.distance_transform_edt(
+        im_seeds, return_indices=True)
+    im_label = im_label[rows, cols]
+
+    # separate touching nuclei
+    im_border = scipy.ndimage.grey_dilation(im_label, size=3) != im_label
+    im_label[im_border] = 0
+
+    im_label[~scipy.ndimage.binary_opening(
+        im_label > 0, structure=np.ones((3, 3)))] = 0
+
+    return im_label
+
+
+def _per_object_bbox_annotations(im_nuclei_seg_mask, tile_info):
+
+    nuclei_annot_list = []
+
+    gx = tile_info['gx']
+    gy = tile_info['gy']
+    wfrac = tile_info['gwidth'] / np.double(tile_info['width'])
+    hfrac = tile_info['gheight'] / np.double(tile_info['height'])
+
+    nuclei_obj_props = skimage.measure.regionprops(im_nuclei_seg_mask)
+
+    for i in range(len(nuclei_obj_props)):
+        cx = nuclei_obj_props[i].centroid[1]
+        cy = nuclei_obj_props[i].centroid[0]
+        width = nuclei_obj_props[i].bbox[3] - nuclei_obj_props[i].bbox[1] + 1
+        height = nuclei_obj_props[i].bbox[2] - nuclei_obj_props[i].bbox[0] + 1
+
+        # convert to base pixel coords
+        cx = np.round(gx + cx * wfrac, 2)
+        cy = np.round(gy + cy * hfrac, 2)
+        width = np.round(width * wfrac, 2)
+        height = np.round(height * hfrac, 2)
+
+        # create annotation json
+        cur_bbox = {
+            "type": "rectangle",
+            "center": [cx, cy, 0],
+            "width": width,
+            "height": height,
+            "rotation": 0,
+            "fillColor": "rgba(0,0,0,0)",
+            "lineColor": "rgb(0,255,0)"
+        }
+
+        nuclei_annot_list.append(cur_bbox)
+
+    return nuclei_annot_list
+
+
+def _per_object_boundary_annotations(im_nuclei_seg_mask, tile_info):
+
+    nuclei_annot_list = []
+
+    gx = tile_info['gx']
+    gy = tile_info['gy']
+    wfrac = tile_info['gwidth'] / np.double(tile_info['width'])
+    hfrac = tile_info['gheight'] / np.double(tile_info['height'])
+
+    by, bx = htk_seg.label.trace_object_boundaries(im_nuclei_seg_mask,
+                                                   trace_all=True)
+
+    for i in range(len(bx)):
+
+        # get boundary points and convert to base pixel space
+        num_points = len(bx[i])
+
+        if num_points < 3:
+            continue
+
+        cur_points = np.zeros((num_points, 3))
+        cur_points[:, 0] = np.round(gx + bx[i] * wfrac, 2)
+        cur_points[:, 1] = np.round(gy + by[i] * hfrac, 2)
+        cur_points = cur_points.tolist()
+
+        # create annotation json
+        cur_annot = {
+            "type": "polyline",
+            "points": cur_points,
+            "closed": True,
+            "fillColor": "rgba(0,0,0,0)",
+            "lineColor": "rgb(0,255,0)"
+        }
+
+        nuclei_annot_list.append(cur_annot)
+
+    return nuclei_annot_list
+
+
+class NucleiAnnotationsSuite(object):
+    """Per-object loop versus batched generation on a dense 1024x1024 tile.
+
+    The ``time_*_compact`` benchmarks only time the computation of the flat
+    coordinate buffer and offsets that tile tasks return, while the
+    ``time_*_batched`` benchmarks also materialise the annotation elements
+    as is done when the annotation file is written.
+
+    """
+
+    def setup(self):
+
+        self.im_label = dense_label_tile()
+
+        self.tile_info = {
+            'gx': 4096, 'gy': 8192,
+            'gwidth': 2048, 'gheight': 2048,
+            'width': 1024, 'height': 1024,
+        }
+
+    def time_bbox_per_object_loop(self):
+        _per_object_bbox_annotations(self.im_label, self.tile_info)
+
+    def time_bbox_compact(self):
+        cli_utils.compute_tile_nuclei_bboxes(self.im_label, self.tile_info)
+
+    def time_bbox_batched(self):
+        list(cli_utils.nuclei_annotation_elements(
+            cli_utils.compute_tile_nuclei_bboxes(
+                self.im_label, self.tile_info)))
+
+    def time_boundary_per_object_loop(self):
+        _per_object_boundary_annotations(self.im_label, self.tile_info)
+
+    def time_boundary_compact(self):
+        cli_utils.compute_tile_nuclei_boundaries(
+            self.im_label, self.tile_info)
+
+    def time_boundary_batched(self):
+        list(cli_utils.nuclei_annotation_elements(
+            cli_utils.compute_tile_nuclei_boundaries(
+                self.im_label, self.tile_info)))
+
+
+def main():
+
+    suite = NucleiAnnotationsSuite()
+    suite.setup()
+
+    print('Number of nuclei = {}'.format(len(np.unique(suite.im_label)) - 1))
+
+    for name in sorted(dir(suite)):
+
+        if not name.startswith('time_'):
+            continue
+
+        t = min(timeit.repeat(getattr(suite, name), number=1, repeat=3))
+
+        print('{0:32s} {1:8.4f} s'.format(name, t))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,170 @@
+"""Generation of synthetic H&E whole-slide images for the benchmarks.
+
+The slides are pyramidal tiled TIFFs written with pyvips, which can be read
+by large_image like any scanned slide.  Their content is a mosaic of a small
+number of distinct synthetic tissue tiles, such that slides of any size can
+be generated quickly and with bounded memory.
+
+A slide can also be generated from the command line, e.g.
+``python -m benchmarks.synthetic_slide slide.tiff --size 16384``.
+
+"""
+import argparse
+import os
+
+import numpy as np
+import scipy.ndimage
+
+from histomicstk.preprocessing.color_conversion import sda_to_rgb
+from histomicstk.preprocessing.color_deconvolution import stain_color_map
+
+
+def synthetic_he_tile(size=1024, nuclei_density=1500, seed=0):
+    """Generate a synthetic H&E tile.
+
+    Nuclei are hematoxylin stained discs of random radius between 5 and 10
+    pixels on a background of smoothly varying eosin stained stroma.
+
+    Parameters
+    ----------
+    size : int
+        Width and height of the tile.
+    nuclei_density : float
+        Average number of nuclei per million pixels.
+    seed : int
+        Seed of the random number generator.
+
+    Returns
+    -------
+    im_tile : array_like
+        A size x size x 3 RGB image of type uint8.
+
+    """
+    rng = np.random.RandomState(seed)
+
+    num_nuclei = rng.poisson(nuclei_density * size * size / 1e6)
+
+    # distance of every pixel to the center of its nearest nucleus
+    im_centers = np.ones((size, size), dtype=bool)
+    rows = rng.randint(0, size, num_nuclei)
+    cols = rng.randint(0, size, num_nuclei)
+    im_centers[rows, cols] = False
+
+    im_radius = np.zeros((size, size))
+    im_radius[rows, cols] = rng.uniform(5, 10, num_nuclei)
+
+    im_dist, (near_rows, near_cols) = \
+        scipy.ndimage.distance_transform_edt(im_centers, return_indices=True)
+
+    im_nuclei = im_dist < im_radius[near_rows, near_cols]
+
+    # stain concentrations in SDA units
+    im_hematoxylin = scipy.ndimage.gaussian_filter(
+        im_nuclei * rng.uniform(80, 120), 1.0)
+    im_hematoxylin += 5 * rng.rand(size, size)
+
+    im_eosin = 25 + 10 * scipy.ndimage.gaussian_filter(
+        rng.randn(size, size), 16) / 0.02
+    im_eosin = np.clip(im_eosin, 5, 50) + 5 * rng.rand(size, size)
+
+    w = np.array([stain_color_map['hematoxylin'], stain_color_map['eosin']]).T
+    w /= np.linalg.norm(w, axis=0)
+
+    im_sda = np.dot(np.stack([im_hematoxylin, im_eosin], axis=-1), w.T)
+
+    return np.clip(sda_to_rgb(im_sda, 255), 0, 255).astype(np.uint8)
+
+
+def make_synthetic_slide(path, size=8192, nuclei_density=1500,
+                         tissue_fraction=0.5, magnification=20.0,
+                         num_unique_tiles=8, tile_size=1024, seed=0):
+    """Write a synthetic H&E whole-slide image as a pyramidal tiled TIFF.
+
+    Parameters
+    ----------
+    path : str
+        Path of the output TIFF file.
+    size : int
+        Width and height of the slide at full resolution, rounded up to a
+        multiple of `tile_size`.
+    nuclei_density : float
+        Average number of nuclei per million pixels of tissue.
+    tissue_fraction : float
+        Approximate fraction of the slide covered by an elliptical piece of
+        tissue.  The rest of the slide is glass background.
+    magnification : float
+        Objective magnification of the slide at full resolution.
+    num_unique_tiles : int
+        Number of distinct tissue tiles the slide is a mosaic of.
+    tile_size : int
+        Size of the tiles of the mosaic.
+    seed : int
+        Seed of the random number generator.
+
+    Returns
+    -------
+    path : str
+        Path of the output TIFF file.
+
+    """
+    import pyvips
+
+    def to_vips(im):
+        return pyvips.Image.new_from_memory(
+            np.ascontiguousarray(im).data, im.shape[1], im.shape[0],
+            im.shape[2], 'uchar').copy(interpretation='srgb')
+
+    rng = np.random.RandomState(seed)
+
+    num_tiles = -(-size // tile_size)
+
+    tissue_tiles = [
+        to_vips(synthetic_he_tile(tile_size, nuclei_density, seed + i))
+        for i in range(num_unique_tiles)]
+
+    glass_tile = to_vips(np.full((tile_size, tile_size, 3), 240, np.uint8))
+
+    # tiles inside an ellipse of the requested area are tissue
+    rows, cols = np.mgrid[:num_tiles, :num_tiles] + 0.5 - num_tiles / 2.0
+    radius = num_tiles / 2.0 * np.sqrt(tissue_fraction * 4 / np.pi)
+    is_tissue = (rows / radius) ** 2 + (cols / (1.25 * radius)) ** 2 <= 1
+
+    tiles = [tissue_tiles[rng.randint(num_unique_tiles)] if tissue
+             else glass_tile for tissue in is_tissue.ravel()]
+
+    im_slide = pyvips.Image.arrayjoin(tiles, across=num_tiles)
+
+    # resolution in pixels per mm, assuming 0.25 microns per pixel at 40x
+    resolution = 1000.0 / (10.0 / magnification)
+
+    im_slide.tiffsave(
+        path, tile=True, tile_width=256, tile_height=256, pyramid=True,
+        compression='jpeg', Q=90, bigtiff=True,
+        xres=resolution, yres=resolution, resunit='cm')
+
+    return path
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Generate a synthetic H&E whole-slide image.')
+    parser.add_argument('path', help='path of the output TIFF file')
+    parser.add_argument('--size', type=int, default=8192)
+    parser.add_argument('--nuclei-density', type=float, default=1500)
+    parser.add_argument('--tissue-fraction', type=float, default=0.5)
+    parser.add_argument('--magnification', type=float, default=20.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    make_synthetic_slide(
+        args.path, args.size, args.nuclei_density, args.tissue_fraction,
+        args.magnification, seed=args.seed)
+
+    print('Wrote {} ({:.1f} MB)'.format(
+        args.path, os.path.getsize(args.path) / 1e6))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -4,7 +4,6 @@ import time
 
 import numpy as np
 import pandas as pd
-import dask
 
 import histomicstk.preprocessing.color_normalization as htk_cnorm
 import histomicstk.preprocessing.color_deconvolution as htk_cdeconv
@@ -27,7 +26,7 @@ def compute_tile_nuclei_features(slide_path, tile_position, args, it_kwargs,
                                  src_mu_lab=None, src_sigma_lab=None):
 
     # get slide tile source
-    ts = large_image.getTileSource(slide_path)
+    ts = htk_utils.get_tile_source(slide_path)
 
     # get requested tile
     tile_info = ts.getSingleTile(
@@ -39,16 +38,17 @@ def compute_tile_nuclei_features(slide_path, tile_position, args, it_kwargs,
     im_tile = tile_info['tile'][:, :, :3]
 
     # perform color normalization
-    im_nmzd = htk_cnorm.reinhard(im_tile,
-                                 args.reference_mu_lab,
-                                 args.reference_std_lab,
-                                 src_mu=src_mu_lab,
-                                 src_sigma=src_sigma_lab)
+    im_nmzd = cli_utils.normalize_tile_color(im_tile, args,
+                                             src_mu_lab, src_sigma_lab)
 
     # perform color decovolution
     w = cli_utils.get_stain_matrix(args)
 
-    im_stains = htk_cdeconv.color_deconvolution(im_nmzd, w).Stains
+    # only deconvolve the stains that are used
+    stain_channels = [0, 1] if args.cytoplasm_features else [0]
+
+    im_stains = htk_cdeconv.fused_color_deconvolution(
+        im_nmzd, w, channels=stain_channels)
 
     im_nuclei_stain = im_stains[:, :, 0].astype(np.float)
 
@@ -70,14 +70,16 @@ def compute_tile_nuclei_features(slide_path, tile_position, args, it_kwargs,
 
         im_nuclei_seg_mask = htk_seg_label.delete_border(im_nuclei_seg_mask)
 
-    # generate nuclei annotations
-    nuclei_annot_list = []
+    # generate compact nuclei annotations, annotation elements are only
+    # created when the annotation file is written
+    nuclei_annot = cli_utils.concat_nuclei_annotations(
+        [], args.nuclei_annotation_format)
 
     flag_nuclei_found = np.any(im_nuclei_seg_mask)
 
     if flag_nuclei_found:
 
-        nuclei_annot_list = cli_utils.create_tile_nuclei_annotations(
+        nuclei_annot = cli_utils.compute_tile_nuclei_annotations(
             im_nuclei_seg_mask, tile_info, args.nuclei_annotation_format)
 
     # compute nuclei features
@@ -104,7 +106,102 @@ def compute_tile_nuclei_features(slide_path, tile_position, args, it_kwargs,
 
         fdata.columns = ['Feature.' + col for col in fdata.columns]
 
-    return nuclei_annot_list, fdata
+        # store the location of the nuclei alongside their features in
+        # parquet files, keeping the columns of csv and h5 files unchanged
+        if os.path.splitext(args.outputNucleiFeatureFile)[1] == '.parquet':
+            fdata = pd.concat([
+                cli_utils.compute_tile_nuclei_identifiers(
+                    im_nuclei_seg_mask, tile_info),
+                fdata
+            ], axis=1)
+
+    return nuclei_annot, fdata
+
+
+def compute_tile_nuclei_features_batch(tile_positions, slide_path, args,
+                                       it_kwargs, src_mu_lab=None,
+                                       src_sigma_lab=None):
+
+    nuclei_annot_list = []
+    fdata_list = []
+
+    for tile_position in tile_positions:
+
+        cur_annot, cur_fdata = compute_tile_nuclei_features(
+            slide_path, tile_position, args, it_kwargs,
+            src_mu_lab, src_sigma_lab)
+
+        nuclei_annot_list.append(cur_annot)
+
+        if cur_fdata is not None:
+            fdata_list.append(cur_fdata)
+
+    fdata = None
+
+    if len(fdata_list) > 0:
+        fdata = pd.concat(fdata_list, ignore_index=True)
+
+    nuclei_annot = cli_utils.concat_nuclei_annotations(
+        nuclei_annot_list, args.nuclei_annotation_format)
+
+    return nuclei_annot, fdata
+
+
+class BufferedFeatureWriter(object):
+    """Collect nuclei feature data frames and write them to a .csv or .h5
+    file once all of them were received.
+
+    This has the same interface as histomicstk.cli.utils.ParquetFeatureWriter
+    for the formats that can not be written incrementally.
+
+    """
+
+    def __init__(self, filename):
+
+        self.filename = filename
+        self.count = 0
+
+        self._fdata_list = []
+
+    def write_frame(self, fdata):
+
+        self._fdata_list.append(fdata)
+        self.count += len(fdata)
+
+    def close(self):
+
+        nuclei_fdata = pd.DataFrame()
+
+        if len(self._fdata_list) > 0:
+            nuclei_fdata = pd.concat(self._fdata_list, ignore_index=True)
+
+        self._fdata_list = []
+
+        feature_file_format = os.path.splitext(self.filename)[1]
+
+        if feature_file_format == '.csv':
+
+            nuclei_fdata.to_csv(self.filename, index=False)
+
+        elif feature_file_format == '.h5':
+
+            nuclei_fdata.to_hdf(self.filename, 'Features',
+                                format='table', mode='w')
+
+        else:
+
+            raise ValueError('Extension of output feature file must be .csv, '
+                             '.h5 or .parquet')
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        # do not write a partial feature file on errors
+        if exc_type is None:
+            self.close()
 
 
 def check_args(args):
@@ -121,8 +218,10 @@ def check_args(args):
     if len(args.analysis_roi) != 4:
         raise ValueError('Analysis ROI must be a vector of 4 elements.')
 
-    if os.path.splitext(args.outputNucleiFeatureFile)[1] not in ['.csv', '.h5']:
-        raise ValueError('Extension of output feature file must be .csv or .h5')
+    if os.path.splitext(args.outputNucleiFeatureFile)[1] not in [
+            '.csv', '.h5', '.parquet']:
+        raise ValueError('Extension of output feature file must be .csv, .h5 '
+                         'or .parquet')
 
 
 def main(args):
@@ -161,7 +260,7 @@ def main(args):
     #
     print('\n>> Reading input image ... \n')
 
-    ts = large_image.getTileSource(args.inputImageFile)
+    ts = htk_utils.get_tile_source(args.inputImageFile)
 
     ts_metadata = ts.getMetadata()
 
@@ -179,7 +278,10 @@ def main(args):
         start_time = time.time()
 
         im_fgnd_mask_lres, fgnd_seg_scale = \
-            cli_utils.segment_wsi_foreground_at_low_res(ts)
+            cli_utils.segment_wsi_foreground_at_low_res(
+                ts, mask_method=args.foreground_mask_method,
+                seed=(None if args.foreground_mask_seed == -1
+                      else args.foreground_mask_seed))
 
         fgnd_time = time.time() - start_time
 
@@ -187,10 +289,8 @@ def main(args):
             cli_utils.disp_time_hms(fgnd_time)))
 
     #
-    # Compute foreground fraction of tiles in parallel using Dask
+    # Select the foreground tiles without decoding them
     #
-    tile_fgnd_frac_list = [1.0]
-
     it_kwargs = {
         'tile_size': {'width': args.analysis_tile_size},
         'scale': {'magnification': args.analysis_mag},
@@ -206,29 +306,31 @@ def main(args):
             'units': 'base_pixels'
         }
 
+    num_tiles = ts.getSingleTile(**it_kwargs)['iterator_range']['position']
+
+    tile_positions = list(range(num_tiles))
+
     if is_wsi:
 
         print('\n>> Computing foreground fraction of all tiles ...\n')
 
         start_time = time.time()
 
-        num_tiles = ts.getSingleTile(**it_kwargs)['iterator_range']['position']
-
         print('Number of tiles = {}'.format(num_tiles))
 
         if process_whole_image:
 
-            tile_fgnd_frac_list = htk_utils.compute_tile_foreground_fraction(
-                args.inputImageFile, im_fgnd_mask_lres, fgnd_seg_scale,
-                it_kwargs
-            )
-
-        else:
+            # foreground tiles in hilbert order, such that the tiles of a
+            # batch are close to each other in the slide
+            tile_positions = [
+                tile['tile_position']['position']
+                for tile in htk_utils.foreground_tile_iterator(
+                    args.inputImageFile, im_fgnd_mask_lres, fgnd_seg_scale,
+                    it_kwargs, min_fgnd_frac=args.min_fgnd_frac,
+                    order='hilbert')
+            ]
 
-            tile_fgnd_frac_list = [1.0] * num_tiles
-
-        num_fgnd_tiles = np.count_nonzero(
-            tile_fgnd_frac_list >= args.min_fgnd_frac)
+        num_fgnd_tiles = len(tile_positions)
 
         percent_fgnd_tiles = 100.0 * num_fgnd_tiles / num_tiles
 
@@ -253,7 +355,8 @@ def main(args):
         start_time = time.time()
 
         src_mu_lab, src_sigma_lab = htk_cnorm.reinhard_stats(
-            args.inputImageFile, 0.01, magnification=args.analysis_mag)
+            args.inputImageFile, 0.01, magnification=args.analysis_mag,
+            method=args.reinhard_stats_method)
 
         rstats_time = time.time() - start_time
 
@@ -267,81 +370,51 @@ def main(args):
 
     start_time = time.time()
 
-    tile_result_list = []
-
-    for tile in ts.tileIterator(**it_kwargs):
-
-        tile_position = tile['tile_position']['position']
-
-        if is_wsi and tile_fgnd_frac_list[tile_position] <= args.min_fgnd_frac:
-            continue
+    # process batches of tiles, writing the annotations of each batch to
+    # the annotation file as soon as it completes
+    annot_fname = os.path.splitext(
+        os.path.basename(args.outputNucleiAnnotationFile))[0]
 
-        # detect nuclei
-        cur_result = dask.delayed(compute_tile_nuclei_features)(
-            args.inputImageFile,
-            tile_position,
-            args, it_kwargs,
-            src_mu_lab, src_sigma_lab
-        )
+    annot_name = annot_fname + '-nuclei-' + args.nuclei_annotation_format
 
-        # append result to list
-        tile_result_list.append(cur_result)
+    # parquet feature files are written batch by batch, one row group per
+    # batch of tiles, while csv and h5 files are written once all tiles are
+    # processed
+    if feature_file_format == '.parquet':
+        feature_writer = cli_utils.ParquetFeatureWriter(
+            args.outputNucleiFeatureFile)
+    else:
+        feature_writer = BufferedFeatureWriter(args.outputNucleiFeatureFile)
 
-    tile_result_list = dask.delayed(tile_result_list).compute()
+    # the color normalization table is shared by the workers through a
+    # temporary directory that is removed once all tiles are processed
+    with cli_utils.AnnotationWriter(args.outputNucleiAnnotationFile,
+                                    annot_name) as annot_writer, \
+            feature_writer, cli_utils.lut_cache_dir(args):
 
-    nuclei_annot_list = [annot
-                         for annot_list, fdata in tile_result_list
-                         for annot in annot_list]
+        for batch_annot, batch_fdata in cli_utils.process_tile_batches(
+                compute_tile_nuclei_features_batch, tile_positions,
+                args.tile_grouping, args.inputImageFile, args, it_kwargs,
+                src_mu_lab, src_sigma_lab):
 
-    nuclei_fdata = pd.DataFrame()
+            annot_writer.write_elements(
+                cli_utils.nuclei_annotation_elements(batch_annot))
 
-    if len(nuclei_annot_list) > 0:
-
-        nuclei_fdata = pd.concat([
-            fdata
-            for annot_list, fdata in tile_result_list if fdata is not None],
-            ignore_index=True
-        )
+            if batch_fdata is not None:
+                feature_writer.write_frame(batch_fdata)
 
     nuclei_detection_time = time.time() - start_time
 
-    print('Number of nuclei = {}'.format(len(nuclei_annot_list)))
+    print('Number of nuclei = {}'.format(annot_writer.count))
     print('Nuclei detection time = {}'.format(
         cli_utils.disp_time_hms(nuclei_detection_time)))
 
-    #
-    # Write annotation file
-    #
-    print('\n>> Writing annotation file ...\n')
-
-    annot_fname = os.path.splitext(
-        os.path.basename(args.outputNucleiAnnotationFile))[0]
-
-    annotation = {
-        'name': annot_fname + '-nuclei-' + args.nuclei_annotation_format,
-        'elements': nuclei_annot_list
-    }
-
-    with open(args.outputNucleiAnnotationFile, 'w') as annotation_file:
-        json.dump(annotation, annotation_file, indent=2, sort_keys=False)
-
-    #
-    # Create CSV Feature file
-    #
-    print('>> Writing CSV feature file')
-
-    if feature_file_format == '.csv':
-
-        nuclei_fdata.to_csv(args.outputNucleiFeatureFile, index=False)
-
-    elif feature_file_format == '.h5':
-
-        nuclei_fdata.to_hdf(args.outputNucleiFeatureFile, 'Features',
-                            format='table', mode='w')
-
-    else:
+    print('Tile source pool: {hits} hits, {misses} misses, '
+          '{evictions} evictions'.format(
+              **cli_utils.get_tile_source_pool_info(c)))
 
-        raise ValueError('Extension of output feature file must be .csv or .h5')
+    print('Number of rows written to the feature file = {}'.format(
+        feature_writer.count))
 
     total_time_taken = time.time() - total_start_time
 
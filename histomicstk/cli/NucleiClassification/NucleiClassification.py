@@ -56,24 +56,69 @@ def gen_distinct_rgb_colors(n, seed=None):
     return color_list
 
 
-def read_feature_file(args):
+def read_feature_file(args, columns=None):
+    """Lazily read the nuclei feature file as a dask dataframe.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        CLI arguments, `args.inputNucleiFeatureFile` is read.
+    columns : list of str, optional
+        Columns to read.  Columnar (.parquet) files only load these columns
+        from disk.  Default is to read all columns.
+
+    Returns
+    -------
+    ddf : dask.dataframe.DataFrame
+
+    """
 
     fname, feature_file_format = os.path.splitext(args.inputNucleiFeatureFile)
 
     if feature_file_format == '.csv':
 
-        ddf = dd.read_csv(args.inputNucleiFeatureFile)
+        ddf = dd.read_csv(args.inputNucleiFeatureFile, usecols=columns)
 
     elif feature_file_format == '.h5':
 
-        ddf = dd.read_hdf(args.inputNucleiFeatureFile, 'Features')
+        ddf = dd.read_hdf(args.inputNucleiFeatureFile, 'Features',
+                          columns=columns)
+
+    elif feature_file_format == '.parquet':
+
+        ddf = dd.read_parquet(args.inputNucleiFeatureFile, columns=columns)
 
     else:
-        raise ValueError('Extension of output feature file must be .csv or .h5')
+        raise ValueError('Extension of input feature file must be .csv, .h5 '
+                         'or .parquet')
+
+    if columns is not None:
+        ddf = ddf[columns]
 
     return ddf
 
 
+def get_feature_columns(columns, clf_model):
+    """Get the columns of a feature file that are input to a model.
+
+    These are the columns the model was fit with if it records them, and
+    otherwise the columns prefixed by `Feature.`, which excludes the
+    `Identifier.` columns stored alongside the features.  Files without
+    any `Feature.` column are assumed to only contain features.
+
+    """
+    columns = list(columns)
+
+    model_columns = getattr(clf_model, 'feature_names_in_', None)
+
+    if model_columns is not None:
+        return [col for col in model_columns if col in columns]
+
+    feature_columns = [col for col in columns if col.startswith('Feature.')]
+
+    return feature_columns if len(feature_columns) > 0 else columns
+
+
 def check_args(args):
 
     if not os.path.isfile(args.inputImageFile):
@@ -112,11 +157,16 @@ def main(args):
 
     ddf = read_feature_file(args)
 
-    if len(ddf.columns) != clf_model.n_features_:
+    feature_columns = get_feature_columns(ddf.columns, clf_model)
+
+    if len(feature_columns) != clf_model.n_features_:
 
         raise ValueError('The number of features of the classification model '
                          'and the input feature file do not match.')
 
+    # only read the columns needed by the model
+    ddf = read_feature_file(args, feature_columns)
+
     #
     # read nuclei annotation file
     #
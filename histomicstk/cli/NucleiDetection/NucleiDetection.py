@@ -3,7 +3,6 @@ import json
 import time
 
 import numpy as np
-import dask
 
 import histomicstk.preprocessing.color_normalization as htk_cnorm
 import histomicstk.preprocessing.color_deconvolution as htk_cdeconv
@@ -25,7 +24,7 @@ def detect_tile_nuclei(slide_path, tile_position, args, it_kwargs,
                        src_mu_lab=None, src_sigma_lab=None):
 
     # get slide tile source
-    ts = large_image.getTileSource(slide_path)
+    ts = htk_utils.get_tile_source(slide_path)
 
     # get requested tile
     tile_info = ts.getSingleTile(
@@ -37,16 +36,14 @@ def detect_tile_nuclei(slide_path, tile_position, args, it_kwargs,
     im_tile = tile_info['tile'][:, :, :3]
 
     # perform color normalization
-    im_nmzd = htk_cnorm.reinhard(im_tile,
-                                 args.reference_mu_lab,
-                                 args.reference_std_lab,
-                                 src_mu=src_mu_lab,
-                                 src_sigma=src_sigma_lab)
+    im_nmzd = cli_utils.normalize_tile_color(im_tile, args,
+                                             src_mu_lab, src_sigma_lab)
 
     # perform color decovolution
     w = cli_utils.get_stain_matrix(args)
 
-    im_stains = htk_cdeconv.color_deconvolution(im_nmzd, w).Stains
+    im_stains = htk_cdeconv.fused_color_deconvolution(im_nmzd, w,
+                                                      channels=[0])
 
     im_nuclei_stain = im_stains[:, :, 0].astype(np.float)
 
@@ -54,7 +51,12 @@ def detect_tile_nuclei(slide_path, tile_position, args, it_kwargs,
     im_nuclei_fgnd_mask = im_nuclei_stain < args.foreground_threshold
 
     # segment nuclei
-    im_nuclei_seg_mask = htk_nuclear.detect_nuclei_kofahi(
+    if args.nuclei_segmentation_method == 'gvf':
+        detect_nuclei = htk_nuclear.detect_nuclei_gvf
+    else:
+        detect_nuclei = htk_nuclear.detect_nuclei_kofahi
+
+    im_nuclei_seg_mask = detect_nuclei(
         im_nuclei_stain,
         im_nuclei_fgnd_mask,
         args.min_radius,
@@ -68,16 +70,33 @@ def detect_tile_nuclei(slide_path, tile_position, args, it_kwargs,
 
         im_nuclei_seg_mask = htk_seg_label.delete_border(im_nuclei_seg_mask)
 
-    # generate nuclei annotations
-    nuclei_annot_list = []
+    # generate compact nuclei annotations, annotation elements are only
+    # created when the annotation file is written
+    nuclei_annot = cli_utils.concat_nuclei_annotations(
+        [], args.nuclei_annotation_format)
 
     flag_nuclei_found = np.any(im_nuclei_seg_mask)
 
     if flag_nuclei_found:
-        nuclei_annot_list = cli_utils.create_tile_nuclei_annotations(
+        nuclei_annot = cli_utils.compute_tile_nuclei_annotations(
             im_nuclei_seg_mask, tile_info, args.nuclei_annotation_format)
 
-    return nuclei_annot_list
+    return nuclei_annot
+
+
+def detect_tile_nuclei_batch(tile_positions, slide_path, args, it_kwargs,
+                             src_mu_lab=None, src_sigma_lab=None):
+
+    nuclei_annot_list = []
+
+    for tile_position in tile_positions:
+
+        nuclei_annot_list.append(detect_tile_nuclei(
+            slide_path, tile_position, args, it_kwargs,
+            src_mu_lab, src_sigma_lab))
+
+    return cli_utils.concat_nuclei_annotations(
+        nuclei_annot_list, args.nuclei_annotation_format)
 
 
 def main(args):
@@ -125,7 +144,7 @@ def main(args):
     #
     print('\n>> Reading input image ... \n')
 
-    ts = large_image.getTileSource(args.inputImageFile)
+    ts = htk_utils.get_tile_source(args.inputImageFile)
 
     ts_metadata = ts.getMetadata()
 
@@ -143,7 +162,10 @@ def main(args):
         start_time = time.time()
 
         im_fgnd_mask_lres, fgnd_seg_scale = \
-            cli_utils.segment_wsi_foreground_at_low_res(ts)
+            cli_utils.segment_wsi_foreground_at_low_res(
+                ts, mask_method=args.foreground_mask_method,
+                seed=(None if args.foreground_mask_seed == -1
+                      else args.foreground_mask_seed))
 
         fgnd_time = time.time() - start_time
 
@@ -151,10 +173,8 @@ def main(args):
             cli_utils.disp_time_hms(fgnd_time)))
 
     #
-    # Compute foreground fraction of tiles in parallel using Dask
+    # Select the foreground tiles without decoding them
     #
-    tile_fgnd_frac_list = [1.0]
-
     it_kwargs = {
         'tile_size': {'width': args.analysis_tile_size},
         'scale': {'magnification': args.analysis_mag},
@@ -170,29 +190,31 @@ def main(args):
             'units':  'base_pixels'
         }
 
+    num_tiles = ts.getSingleTile(**it_kwargs)['iterator_range']['position']
+
+    tile_positions = list(range(num_tiles))
+
     if is_wsi:
 
         print('\n>> Computing foreground fraction of all tiles ...\n')
 
         start_time = time.time()
 
-        num_tiles = ts.getSingleTile(**it_kwargs)['iterator_range']['position']
-
         print('Number of tiles = {}'.format(num_tiles))
 
         if process_whole_image:
 
-            tile_fgnd_frac_list = htk_utils.compute_tile_foreground_fraction(
-                args.inputImageFile, im_fgnd_mask_lres, fgnd_seg_scale,
-                it_kwargs
-            )
-
-        else:
+            # foreground tiles in hilbert order, such that the tiles of a
+            # batch are close to each other in the slide
+            tile_positions = [
+                tile['tile_position']['position']
+                for tile in htk_utils.foreground_tile_iterator(
+                    args.inputImageFile, im_fgnd_mask_lres, fgnd_seg_scale,
+                    it_kwargs, min_fgnd_frac=args.min_fgnd_frac,
+                    order='hilbert')
+            ]
 
-            tile_fgnd_frac_list = np.full(num_tiles, 1.0)
-
-        num_fgnd_tiles = np.count_nonzero(
-            tile_fgnd_frac_list >= args.min_fgnd_frac)
+        num_fgnd_tiles = len(tile_positions)
 
         percent_fgnd_tiles = 100.0 * num_fgnd_tiles / num_tiles
 
@@ -217,7 +239,8 @@ def main(args):
         start_time = time.time()
 
         src_mu_lab, src_sigma_lab = htk_cnorm.reinhard_stats(
-            args.inputImageFile, 0.01, magnification=args.analysis_mag)
+            args.inputImageFile, 0.01, magnification=args.analysis_mag,
+            method=args.reinhard_stats_method)
 
         rstats_time = time.time() - start_time
 
@@ -225,59 +248,43 @@ def main(args):
             cli_utils.disp_time_hms(rstats_time)))
 
     #
-    # Detect nuclei in parallel using Dask
+    # Detect nuclei in parallel using Dask and write annotation file
     #
-    print('\n>> Detecting nuclei ...\n')
+    print('\n>> Detecting nuclei and writing annotation file ...\n')
 
     start_time = time.time()
 
-    tile_nuclei_list = []
-
-    for tile in ts.tileIterator(**it_kwargs):
-
-        tile_position = tile['tile_position']['position']
-
-        if is_wsi and tile_fgnd_frac_list[tile_position] <= args.min_fgnd_frac:
-            continue
+    # detect nuclei in batches of tiles and write the annotations of each
+    # batch to the annotation file as soon as it completes
+    annot_fname = os.path.splitext(
+        os.path.basename(args.outputNucleiAnnotationFile))[0]
 
-        # detect nuclei
-        cur_nuclei_list = dask.delayed(detect_tile_nuclei)(
-            args.inputImageFile,
-            tile_position,
-            args, it_kwargs,
-            src_mu_lab, src_sigma_lab
-        )
+    annot_name = annot_fname + '-nuclei-' + args.nuclei_annotation_format
 
-        # append result to list
-        tile_nuclei_list.append(cur_nuclei_list)
+    # the color normalization table is shared by the workers through a
+    # temporary directory that is removed once all tiles are processed
+    with cli_utils.AnnotationWriter(args.outputNucleiAnnotationFile,
+                                    annot_name) as annot_writer, \
+            cli_utils.lut_cache_dir(args):
 
-    tile_nuclei_list = dask.delayed(tile_nuclei_list).compute()
+        for batch_nuclei_annot in cli_utils.process_tile_batches(
+                detect_tile_nuclei_batch, tile_positions, args.tile_grouping,
+                args.inputImageFile, args, it_kwargs,
+                src_mu_lab, src_sigma_lab):
 
-    nuclei_list = [anot
-                   for anot_list in tile_nuclei_list for anot in anot_list]
+            annot_writer.write_elements(
+                cli_utils.nuclei_annotation_elements(batch_nuclei_annot))
 
     nuclei_detection_time = time.time() - start_time
 
-    print('Number of nuclei = {}'.format(len(nuclei_list)))
+    print('Number of nuclei = {}'.format(annot_writer.count))
 
     print('Nuclei detection time = {}'.format(
         cli_utils.disp_time_hms(nuclei_detection_time)))
 
-    #
-    # Write annotation file
-    #
-    print('\n>> Writing annotation file ...\n')
-
-    annot_fname = os.path.splitext(
-        os.path.basename(args.outputNucleiAnnotationFile))[0]
-
-    annotation = {
-        "name":     annot_fname + '-nuclei-' + args.nuclei_annotation_format,
-        "elements": nuclei_list
-    }
-
-    with open(args.outputNucleiAnnotationFile, 'w') as annotation_file:
-        json.dump(annotation, annotation_file, indent=2, sort_keys=False)
+    print('Tile source pool: {hits} hits, {misses} misses, '
+          '{evictions} evictions'.format(
+              **cli_utils.get_tile_source_pool_info(c)))
 
     total_time_taken = time.time() - total_start_time
 
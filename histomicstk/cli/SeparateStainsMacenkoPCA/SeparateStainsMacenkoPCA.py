@@ -2,6 +2,7 @@ from histomicstk.cli.utils import CLIArgumentParser
 import numpy
 
 from histomicstk.preprocessing.color_deconvolution import rgb_separate_stains_macenko_pca
+from histomicstk.preprocessing.color_deconvolution import slide_separate_stains_macenko_pca
 
 from histomicstk.cli import utils
 
@@ -11,8 +12,13 @@ def main(args):
     args.macenko.I_0 = numpy.array(args.macenko.I_0)
 
     utils.create_dask_client(args.dask)
-    sample = utils.sample_pixels(args.sample)
-    stain_matrix = rgb_separate_stains_macenko_pca(sample.T, **vars(args.macenko))
+    if args.stream.sample_size == -1:
+        sample = utils.sample_pixels(args.sample)
+        stain_matrix = rgb_separate_stains_macenko_pca(sample.T, **vars(args.macenko))
+    else:
+        kwargs = utils.sda_statistics_args(args.sample, args.stream)
+        kwargs.update(vars(args.macenko))
+        stain_matrix = slide_separate_stains_macenko_pca(**kwargs)
     with open(args.returnParameterFile, 'w') as f:
         for i, stain in enumerate(stain_matrix.T):
             f.write('stainColor_{} = {}\n'.format(i+1, ','.join(map(str, stain))))
@@ -11,9 +11,12 @@ def main(args):
     args = utils.splitArgs(args)
     args.snmf.I_0 = numpy.array(args.snmf.I_0)
 
-    print(">> Starting Dask cluster and sampling pixels")
+    print(">> Starting Dask cluster")
     utils.create_dask_client(args.dask)
-    sample = utils.sample_pixels(args.sample)
+
+    if args.stream.sample_size == -1:
+        print('>> Sampling pixels')
+        sample = utils.sample_pixels(args.sample)
 
     # Create stain matrix
     print('>> Creating stain matrix')
@@ -25,7 +28,12 @@ def main(args):
     # Perform color deconvolution
     print('>> Performing color deconvolution')
 
-    w_est = htk_cdeconv.rgb_separate_stains_xu_snmf(sample.T, **vars(args.snmf))
+    if args.stream.sample_size == -1:
+        w_est = htk_cdeconv.rgb_separate_stains_xu_snmf(sample.T, **vars(args.snmf))
+    else:
+        kwargs = utils.sda_statistics_args(args.sample, args.stream)
+        kwargs.update(vars(args.snmf))
+        w_est = htk_cdeconv.slide_separate_stains_xu_snmf(**kwargs)
     w_est = htk_cdeconv.complement_stain_matrix(w_est)
 
     with open(args.returnParameterFile, 'w') as f:
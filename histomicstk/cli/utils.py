@@ -1,18 +1,33 @@
 from argparse import Namespace
+from collections import namedtuple, OrderedDict
 from datetime import timedelta
+import contextlib
+import gzip
+import itertools
+import json
+import os
+import shutil
+import tempfile
 from slicer_cli_web import ctk_cli_adjustment  # noqa - imported for side effects
 from ctk_cli import CLIArgumentParser
 import psutil
 import numpy as np
-import skimage.measure
-import skimage.morphology
+import pandas as pd
+import scipy.ndimage
 
 import histomicstk.preprocessing.color_deconvolution as htk_cdeconv
+import histomicstk.preprocessing.color_normalization as htk_cnorm
 import histomicstk.segmentation as htk_seg
 import histomicstk.utils as htk_utils
 
 import large_image
 
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
 
 # These defaults are only used if girder is not present
 # Use memcached by default.
@@ -52,7 +67,67 @@ def get_stain_matrix(args, count=3):
     return np.array([get_stain_vector(args, i+1) for i in range(count)]).T
 
 
-def segment_wsi_foreground_at_low_res(ts, lres_size=2048):
+def normalize_tile_color(im_tile, args, src_mu_lab=None, src_sigma_lab=None):
+    """Perform Reinhard color normalization of a tile to the
+    args.reference_mu_lab and args.reference_std_lab statistics.
+
+    If the statistics `src_mu_lab` and `src_sigma_lab` of the slide are
+    given, the normalization is a lookup in a table that is computed once
+    per process.  If the directory args.lut_cache_dir set by
+    `lut_cache_dir` exists, the table is also cached there for the workers
+    processing the other tiles of the slide.  Otherwise the tile is
+    normalized with its own statistics.
+
+    """
+    if src_mu_lab is None or src_sigma_lab is None:
+        return htk_cnorm.reinhard(im_tile,
+                                  args.reference_mu_lab,
+                                  args.reference_std_lab,
+                                  src_mu=src_mu_lab,
+                                  src_sigma=src_sigma_lab)
+
+    # the directory does not exist on workers of other machines
+    cache_dir = getattr(args, 'lut_cache_dir', None)
+    if cache_dir is not None and not os.path.isdir(cache_dir):
+        cache_dir = None
+
+    lut = htk_cnorm.reinhard_lut(
+        args.reference_mu_lab, args.reference_std_lab,
+        src_mu_lab, src_sigma_lab, cache_dir=cache_dir)
+
+    return htk_cnorm.apply_reinhard_lut(im_tile, lut)
+
+
+@contextlib.contextmanager
+def lut_cache_dir(args):
+    """Create a temporary directory private to the user in which the workers
+    share the color normalization tables of `normalize_tile_color`, and
+    remove it on exit.
+
+    The directory is stored in args.lut_cache_dir, such that the tasks that
+    are given `args` use it.
+
+    """
+    args.lut_cache_dir = tempfile.mkdtemp(prefix='histomicstk-lut-')
+    try:
+        yield args.lut_cache_dir
+    finally:
+        shutil.rmtree(args.lut_cache_dir, ignore_errors=True)
+        args.lut_cache_dir = None
+
+
+def segment_wsi_foreground_at_low_res(ts, lres_size=2048, mask_method='kde',
+                                      seed=None):
+    """Segment the foreground of a slide at a low resolution whose largest
+    dimension is at least `lres_size` pixels.
+
+    `mask_method` and `seed` are passed as the `method` and `seed` of
+    histomicstk.utils.simple_mask.  The 'histogram' method gives the same
+    mask on every run, and so does the 'kde' method with a seed.
+
+    Returns the foreground mask and the scale at which it was segmented.
+
+    """
 
     ts_metadata = ts.getMetadata()
 
@@ -74,105 +149,422 @@ def segment_wsi_foreground_at_low_res(ts, lres_size=2048):
     im_lres = im_lres[:, :, :3]
 
     # compute foreground mask at low-res
-    im_fgnd_mask_lres = htk_utils.simple_mask(im_lres)
+    im_fgnd_mask_lres = htk_utils.simple_mask(im_lres, method=mask_method,
+                                              seed=seed)
 
     return im_fgnd_mask_lres, fgnd_seg_scale
 
 
-def create_tile_nuclei_bbox_annotations(im_nuclei_seg_mask, tile_info):
+# Compact representation of the nuclei annotations of one or more tiles.
+#
+# For the 'bbox' format, `coords` is an (n, 4) array of the center x, center y,
+# width and height of each nucleus.  For the 'boundary' format, `coords` is an
+# (N, 3) array of the concatenated (x, y, 0) boundary points of all nuclei.
+# In both cases the rows of the i-th nucleus are
+# `coords[offsets[i]:offsets[i + 1]]` and all values are in base pixels.
+NucleiAnnotations = namedtuple('NucleiAnnotations',
+                               ['format', 'coords', 'offsets'])
+
 
-    nuclei_annot_list = []
+def _tile_base_pixel_transform(tile_info):
 
     gx = tile_info['gx']
     gy = tile_info['gy']
     wfrac = tile_info['gwidth'] / np.double(tile_info['width'])
     hfrac = tile_info['gheight'] / np.double(tile_info['height'])
 
-    nuclei_obj_props = skimage.measure.regionprops(im_nuclei_seg_mask)
+    return gx, gy, wfrac, hfrac
 
-    for i in range(len(nuclei_obj_props)):
-        cx = nuclei_obj_props[i].centroid[1]
-        cy = nuclei_obj_props[i].centroid[0]
-        width = nuclei_obj_props[i].bbox[3] - nuclei_obj_props[i].bbox[1] + 1
-        height = nuclei_obj_props[i].bbox[2] - nuclei_obj_props[i].bbox[0] + 1
 
-        # convert to base pixel coords
-        cx = np.round(gx + cx * wfrac, 2)
-        cy = np.round(gy + cy * hfrac, 2)
-        width = np.round(width * wfrac, 2)
-        height = np.round(height * hfrac, 2)
+def _label_centroids_and_bboxes(im_label):
 
-        # create annotation json
-        cur_bbox = {
-            "type": "rectangle",
-            "center": [cx, cy, 0],
-            "width": width,
-            "height": height,
-            "rotation": 0,
-            "fillColor": "rgba(0,0,0,0)",
-            "lineColor": "rgb(0,255,0)"
-        }
+    im_label = np.asarray(im_label)
 
-        nuclei_annot_list.append(cur_bbox)
+    # per-label pixel counts and coordinate sums give the centroids
+    label_flat = im_label.ravel()
+    rows, cols = np.indices(im_label.shape)
 
-    return nuclei_annot_list
+    count = np.bincount(label_flat)
+    labels = np.flatnonzero(count[1:]) + 1
 
+    cy = np.bincount(label_flat, rows.ravel())[labels] / count[labels]
+    cx = np.bincount(label_flat, cols.ravel())[labels] / count[labels]
 
-def create_tile_nuclei_boundary_annotations(im_nuclei_seg_mask, tile_info):
+    # bounding boxes (one slice tuple per label, None for absent labels)
+    obj_slices = scipy.ndimage.find_objects(im_label)
 
-    nuclei_annot_list = []
+    bbox = np.array([[sl[0].start, sl[1].start, sl[0].stop, sl[1].stop]
+                     for sl in (obj_slices[lbl - 1] for lbl in labels)],
+                    dtype=np.int64).reshape(-1, 4)
 
-    gx = tile_info['gx']
-    gy = tile_info['gy']
-    wfrac = tile_info['gwidth'] / np.double(tile_info['width'])
-    hfrac = tile_info['gheight'] / np.double(tile_info['height'])
+    return labels, cx, cy, bbox
 
-    by, bx = htk_seg.label.trace_object_boundaries(im_nuclei_seg_mask,
-                                                   trace_all=True)
 
-    for i in range(len(bx)):
+def compute_tile_nuclei_bboxes(im_nuclei_seg_mask, tile_info):
+    """Compute the bounding box annotations of all nuclei of a tile at once.
 
-        # get boundary points and convert to base pixel space
-        num_points = len(bx[i])
+    Returns a NucleiAnnotations with the 'bbox' format.
 
-        if num_points < 3:
-            continue
+    """
+    gx, gy, wfrac, hfrac = _tile_base_pixel_transform(tile_info)
 
-        cur_points = np.zeros((num_points, 3))
-        cur_points[:, 0] = np.round(gx + bx[i] * wfrac, 2)
-        cur_points[:, 1] = np.round(gy + by[i] * hfrac, 2)
-        cur_points = cur_points.tolist()
+    labels, cx, cy, bbox = _label_centroids_and_bboxes(im_nuclei_seg_mask)
 
-        # create annotation json
-        cur_annot = {
-            "type": "polyline",
-            "points": cur_points,
-            "closed": True,
-            "fillColor": "rgba(0,0,0,0)",
-            "lineColor": "rgb(0,255,0)"
-        }
+    coords = np.empty((len(labels), 4))
 
-        nuclei_annot_list.append(cur_annot)
+    # convert to base pixel coords
+    coords[:, 0] = np.round(gx + cx * wfrac, 2)
+    coords[:, 1] = np.round(gy + cy * hfrac, 2)
+    coords[:, 2] = np.round((bbox[:, 3] - bbox[:, 1] + 1) * wfrac, 2)
+    coords[:, 3] = np.round((bbox[:, 2] - bbox[:, 0] + 1) * hfrac, 2)
 
-    return nuclei_annot_list
+    return NucleiAnnotations('bbox', coords, np.arange(len(labels) + 1))
 
 
-def create_tile_nuclei_annotations(im_nuclei_seg_mask, tile_info, format):
+def compute_tile_nuclei_identifiers(im_nuclei_seg_mask, tile_info):
+    """Compute the centroid and bounding box of all nuclei of a tile.
+
+    Params
+    ------
+    im_nuclei_seg_mask: array_like
+        Label image of the nuclei of the tile.
+    tile_info: dict
+        The tile dictionary returned by large_image.
+
+    Returns
+    -------
+    fdata: pandas.DataFrame
+        One row per label in increasing label order (the order of
+        skimage.measure.regionprops) with the columns
+        `Identifier.CentroidX`, `Identifier.CentroidY`, `Identifier.Xmin`,
+        `Identifier.Ymin`, `Identifier.Xmax` and `Identifier.Ymax` in base
+        pixels.  The maximum coordinates are exclusive.
+
+    """
+    gx, gy, wfrac, hfrac = _tile_base_pixel_transform(tile_info)
+
+    labels, cx, cy, bbox = _label_centroids_and_bboxes(im_nuclei_seg_mask)
+
+    return pd.DataFrame(OrderedDict([
+        ('Identifier.CentroidX', np.round(gx + cx * wfrac, 2)),
+        ('Identifier.CentroidY', np.round(gy + cy * hfrac, 2)),
+        ('Identifier.Xmin', np.round(gx + bbox[:, 1] * wfrac, 2)),
+        ('Identifier.Ymin', np.round(gy + bbox[:, 0] * hfrac, 2)),
+        ('Identifier.Xmax', np.round(gx + bbox[:, 3] * wfrac, 2)),
+        ('Identifier.Ymax', np.round(gy + bbox[:, 2] * hfrac, 2)),
+    ]))
+
+
+def compute_tile_nuclei_boundaries(im_nuclei_seg_mask, tile_info):
+    """Compute the boundary annotations of all nuclei of a tile at once.
+
+    Boundaries with fewer than 3 points are dropped.  Returns a
+    NucleiAnnotations with the 'boundary' format.
+
+    """
+    gx, gy, wfrac, hfrac = _tile_base_pixel_transform(tile_info)
+
+    by, bx, offsets, _ = htk_seg.label.trace_label_boundaries(
+        im_nuclei_seg_mask)
+
+    num_points = np.diff(offsets)
+
+    # drop the boundaries with fewer than 3 points
+    is_kept = num_points >= 3
+    keep = np.repeat(is_kept, num_points)
+
+    offsets = np.zeros(np.count_nonzero(is_kept) + 1, dtype=np.int64)
+    np.cumsum(num_points[is_kept], out=offsets[1:])
+
+    # convert boundary points of all nuclei to base pixel space
+    coords = np.zeros((offsets[-1], 3))
+    coords[:, 0] = np.round(gx + bx[keep] * wfrac, 2)
+    coords[:, 1] = np.round(gy + by[keep] * hfrac, 2)
 
+    return NucleiAnnotations('boundary', coords, offsets)
+
+
+def compute_tile_nuclei_annotations(im_nuclei_seg_mask, tile_info, format):
+    """Compute the annotations of all nuclei of a tile in a compact form.
+
+    Params
+    ------
+    im_nuclei_seg_mask: array_like
+        Label image of the nuclei of the tile.
+    tile_info: dict
+        The tile dictionary returned by large_image.  Its 'gx', 'gy',
+        'gwidth', 'gheight', 'width' and 'height' keys are used to convert
+        coordinates to base pixels.
+    format: str
+        'bbox' or 'boundary'.
+
+    Returns
+    -------
+    annotations: NucleiAnnotations
+        Use nuclei_annotation_elements to get the annotation elements.
+
+    """
     if format == 'bbox':
 
-        return create_tile_nuclei_bbox_annotations(im_nuclei_seg_mask,
-                                                   tile_info)
+        return compute_tile_nuclei_bboxes(im_nuclei_seg_mask, tile_info)
 
     elif format == 'boundary':
 
-        return create_tile_nuclei_boundary_annotations(im_nuclei_seg_mask,
-                                                       tile_info)
+        return compute_tile_nuclei_boundaries(im_nuclei_seg_mask, tile_info)
+
     else:
 
         raise ValueError('Invalid value passed for nuclei_annotation_format')
 
 
+def concat_nuclei_annotations(annotations_list, format):
+    """Concatenate a list of NucleiAnnotations of the given format."""
+    annotations_list = [annot for annot in annotations_list
+                        if len(annot.offsets) > 1]
+
+    if len(annotations_list) == 0:
+        return NucleiAnnotations(
+            format, np.zeros((0, 4 if format == 'bbox' else 3)),
+            np.zeros(1, dtype=np.int64))
+
+    coords = np.concatenate([annot.coords for annot in annotations_list])
+
+    offsets = [annotations_list[0].offsets]
+    for annot in annotations_list[1:]:
+        offsets.append(annot.offsets[1:] + offsets[-1][-1])
+
+    return NucleiAnnotations(format, coords, np.concatenate(offsets))
+
+
+def nuclei_annotation_elements(annotations):
+    """Generate the large_image annotation elements of NucleiAnnotations.
+
+    Params
+    ------
+    annotations: NucleiAnnotations
+
+    Returns
+    -------
+    elements: generator of dict
+        One annotation element per nucleus.
+
+    """
+    coords = annotations.coords.tolist()
+    offsets = annotations.offsets.tolist()
+
+    if annotations.format == 'bbox':
+
+        for cx, cy, width, height in coords:
+
+            yield {
+                "type": "rectangle",
+                "center": [cx, cy, 0],
+                "width": width,
+                "height": height,
+                "rotation": 0,
+                "fillColor": "rgba(0,0,0,0)",
+                "lineColor": "rgb(0,255,0)"
+            }
+
+    else:
+
+        for i in range(len(offsets) - 1):
+
+            yield {
+                "type": "polyline",
+                "points": coords[offsets[i]:offsets[i + 1]],
+                "closed": True,
+                "fillColor": "rgba(0,0,0,0)",
+                "lineColor": "rgb(0,255,0)"
+            }
+
+
+def create_tile_nuclei_bbox_annotations(im_nuclei_seg_mask, tile_info):
+
+    return list(nuclei_annotation_elements(
+        compute_tile_nuclei_bboxes(im_nuclei_seg_mask, tile_info)))
+
+
+def create_tile_nuclei_boundary_annotations(im_nuclei_seg_mask, tile_info):
+
+    return list(nuclei_annotation_elements(
+        compute_tile_nuclei_boundaries(im_nuclei_seg_mask, tile_info)))
+
+
+def create_tile_nuclei_annotations(im_nuclei_seg_mask, tile_info, format):
+
+    return list(nuclei_annotation_elements(compute_tile_nuclei_annotations(
+        im_nuclei_seg_mask, tile_info, format)))
+
+
+class AnnotationWriter(object):
+    """Incrementally write a large_image annotation file.
+
+    Elements are serialized as soon as they are passed to `write_elements`,
+    so that the annotation of a whole slide never has to be held in memory.
+    The output is a compact (non-indented) JSON document of the form
+    `{"name": ..., "elements": [...]}` as expected by the large_image
+    annotation plugin of Girder.
+
+    Params
+    ------
+    filename: str
+        Path of the output annotation file.
+    name: str
+        Name of the annotation.
+    compress: bool, optional
+        Whether to gzip the output.  Defaults to compressing only if
+        `filename` ends with `.gz`.
+
+    Examples
+    --------
+    >>> with AnnotationWriter('nuclei.anot', 'nuclei') as writer:
+    ...     writer.write_elements(elements)
+
+    """
+
+    def __init__(self, filename, name, compress=None):
+
+        if compress is None:
+            compress = filename.endswith('.gz')
+
+        self.filename = filename
+        self.name = name
+        self.count = 0
+
+        self._file = (gzip.open if compress else open)(filename, 'wb')
+        self._write('{"name":%s,"elements":[' % json.dumps(name))
+
+    def _write(self, text):
+
+        self._file.write(text.encode('utf8'))
+
+    def write_elements(self, elements):
+        """Append annotation elements to the file.
+
+        Params
+        ------
+        elements: iterable of dict
+            The annotation elements.
+
+        """
+        for element in elements:
+
+            self._write(('' if self.count == 0 else ',') +
+                        json.dumps(element, separators=(',', ':')))
+
+            self.count += 1
+
+    def close(self):
+        """Finish the annotation and close the file."""
+        if self._file is not None:
+            self._write(']}')
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            # do not leave a partial annotation file on errors
+            self._file.close()
+            self._file = None
+            os.remove(self.filename)
+
+
+class ParquetFeatureWriter(object):
+    """Incrementally write a nuclei feature table to a Parquet file.
+
+    Every data frame passed to `write_frame` is appended to the file as a
+    separate row group as soon as it is received, so that the features of
+    a whole slide never have to be held in memory.  Being columnar, the
+    resulting file can be read one column at a time, e.g. with
+    `pandas.read_parquet(filename, columns=[...])`.
+
+    Params
+    ------
+    filename: str
+        Path of the output Parquet file.
+    compression: str, optional
+        Compression codec of the column chunks.  Default is 'snappy'.
+
+    Examples
+    --------
+    >>> with ParquetFeatureWriter('nuclei.parquet') as writer:
+    ...     writer.write_frame(fdata)
+
+    """
+
+    def __init__(self, filename, compression='snappy'):
+
+        if pyarrow is None:
+            raise ImportError('pyarrow is required to write Parquet files')
+
+        self.filename = filename
+        self.compression = compression
+        self.count = 0
+
+        self._writer = None
+
+    def write_frame(self, fdata):
+        """Append the rows of a data frame to the file as a row group.
+
+        All data frames must have the same columns.
+
+        Params
+        ------
+        fdata: pandas.DataFrame
+            The rows to write.  The index is not written.
+
+        """
+        if self._writer is None:
+
+            table = pyarrow.Table.from_pandas(fdata, preserve_index=False)
+
+            self._writer = pyarrow.parquet.ParquetWriter(
+                self.filename, table.schema, compression=self.compression)
+
+        else:
+
+            table = pyarrow.Table.from_pandas(
+                fdata, schema=self._writer.schema, preserve_index=False)
+
+        self._writer.write_table(table)
+
+        self.count += len(fdata)
+
+    def close(self):
+        """Close the file, creating an empty table if nothing was written."""
+        if self._writer is None:
+            self._writer = pyarrow.parquet.ParquetWriter(
+                self.filename, pyarrow.schema([]),
+                compression=self.compression)
+
+        self._writer.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if exc_type is None:
+            self.close()
+            return
+
+        # do not leave a partial feature file on errors
+        if self._writer is not None:
+            self._writer.close()
+
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+
 def create_dask_client(args):
     """Create and install a Dask distributed client using args from a
     Namespace, supporting the following attributes:
@@ -233,6 +625,115 @@ def create_dask_client(args):
     return dask.distributed.Client(scheduler)
 
 
+def process_tile_batches(func, tile_positions, tile_grouping, *args):
+    """Apply a function to batches of tile positions using Dask and yield the
+    result of each batch as soon as it is available.
+
+    Each task processes a contiguous run of at most `tile_grouping` of the
+    given tile positions, which keeps the scheduler overhead low for slides
+    with a large number of tiles.  With a Dask distributed client, about
+    twice as many tasks as there are worker threads are in flight at a time,
+    and a new one is submitted each time a result is consumed.  Results are
+    yielded in the order in which the tasks complete and are only gathered
+    to the client when they are consumed.  With the other schedulers, a
+    small window of tasks is computed at a time.
+
+    Params
+    ------
+    func: callable
+        A function called as `func(batch_positions, *args)`.
+    tile_positions: list of int
+        The tile positions to process.
+    tile_grouping: int
+        The number of tiles to process as part of a single task.
+    *args:
+        Additional arguments passed to `func`.
+
+    Returns
+    -------
+    results: generator
+        The results of `func` for each batch.  These are not necessarily
+        produced in the order of `tile_positions`.
+
+    """
+    import dask
+    import dask.distributed
+
+    tile_grouping = max(1, int(tile_grouping))
+    tile_positions = list(tile_positions)
+
+    tasks = [
+        dask.delayed(func)(tile_positions[i:i + tile_grouping], *args)
+        for i in range(0, len(tile_positions), tile_grouping)
+    ]
+
+    try:
+        client = dask.distributed.get_client()
+    except ValueError:
+        client = None
+
+    if client is not None:
+        # Client.ncores was renamed to Client.nthreads
+        nthreads = getattr(client, 'nthreads', None) or client.ncores
+        window = 2 * max(1, sum(nthreads().values()))
+
+        # keep a window of tasks in flight, submitting a new one each time a
+        # result is consumed, such that results that have not been consumed
+        # yet stay on the workers
+        tasks = iter(tasks)
+        completed = dask.distributed.as_completed(
+            [client.compute(task) for task in itertools.islice(
+                tasks, window)])
+        for future in completed:
+            result = future.result()
+            del future
+            for task in itertools.islice(tasks, 1):
+                completed.add(client.compute(task))
+            yield result
+        return
+
+    window = 2 * max(1, psutil.cpu_count(logical=True) or 1)
+
+    for i in range(0, len(tasks), window):
+        for result in dask.compute(*tasks[i:i + window]):
+            yield result
+
+
+def get_tile_source_pool_info(client=None):
+    """Get the counters of the tile source pool summed over the current
+    process and, when a Dask distributed client is available, all of its
+    workers.
+
+    Params
+    ------
+    client: dask.distributed.Client, optional
+        The client to query the workers of.  If not provided, the current
+        default client is used if there is one.
+
+    Returns
+    -------
+    info: dict
+        The summed `hits`, `misses` and `evictions` counters and `size` of
+        the pools (see histomicstk.utils.tile_source_pool_info).
+
+    """
+    info_list = [htk_utils.tile_source_pool_info()]
+
+    if client is None:
+        import dask.distributed
+        try:
+            client = dask.distributed.get_client()
+        except ValueError:
+            client = None
+
+    if client is not None:
+        info_list.extend(
+            client.run(htk_utils.tile_source_pool_info).values())
+
+    return {k: sum(info[k] for info in info_list)
+            for k in ('hits', 'misses', 'evictions', 'size')}
+
+
 def get_region_dict(region, maxRegionSize=None, tilesource=None):
     """Return a dict corresponding to region, checking the region size if
     maxRegionSize is provided.
@@ -320,15 +821,44 @@ def sample_pixels(args):
     and handles the special default values.
 
     """
+    return htk_utils.sample_pixels(**_sample_args(args))
+
+
+def sda_statistics_args(sample_args, stream_args):
+    """Convert Namespaces of the arguments of sample_pixels and of the
+    streamed statistics to the keyword arguments of
+    histomicstk.preprocessing.color_deconvolution.compute_slide_sda_statistics.
+    The sample fraction and approximate sample total of sample_pixels are
+    replaced by the per-tile fraction and sample size of the streamed
+    statistics.
+
+    """
+    args = _sample_args(sample_args)
+    args.pop('sample_fraction', None)
+    args.pop('sample_approximate_total', None)
+    args['sample_fraction'] = stream_args.sample_fraction
+    args['sample_size'] = stream_args.sample_size
+    return args
+
+
+def _sample_args(args):
     args = (args._asdict() if hasattr(args, '_asdict') else vars(args)).copy()
     for k in 'magnification', 'sample_fraction', 'sample_approximate_total':
         if args[k] == -1:
             del args[k]
-    return htk_utils.sample_pixels(**args)
+    return args
 
 
 __all__ = (
+    'AnnotationWriter',
     'CLIArgumentParser',
+    'NucleiAnnotations',
+    'ParquetFeatureWriter',
+    'compute_tile_nuclei_annotations',
+    'compute_tile_nuclei_bboxes',
+    'compute_tile_nuclei_boundaries',
+    'compute_tile_nuclei_identifiers',
+    'concat_nuclei_annotations',
     'create_dask_client',
     'create_tile_nuclei_annotations',
     'create_tile_nuclei_bbox_annotations',
@@ -337,7 +867,12 @@ __all__ = (
     'get_region_dict',
     'get_stain_matrix',
     'get_stain_vector',
+    'get_tile_source_pool_info',
+    'lut_cache_dir',
+    'nuclei_annotation_elements',
+    'process_tile_batches',
     'sample_pixels',
+    'sda_statistics_args',
     'segment_wsi_foreground_at_low_res',
     'splitArgs',
 )
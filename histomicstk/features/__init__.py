@@ -14,6 +14,7 @@ from .compute_haralick_features import compute_haralick_features
 from .compute_intensity_features import compute_intensity_features
 from .compute_morphometry_features import compute_morphometry_features
 from .graycomatrixext import graycomatrixext
+from .object_table import ObjectTable
 
 from .compute_nuclei_features import compute_nuclei_features
 
@@ -29,4 +30,5 @@ __all__ = (
     'compute_morphometry_features',
     'compute_nuclei_features',
     'graycomatrixext',
+    'ObjectTable',
 )
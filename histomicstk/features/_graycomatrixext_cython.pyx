@@ -0,0 +1,92 @@
+import numpy as np
+cimport numpy as np
+cimport cython
+
+@cython.cdivision(True)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _graycomatrixext_cython(np.int64_t[:, ::1] im_input not None,
+                            np.uint8_t[:, ::1] im_roi_mask not None,
+                            np.int64_t[:, ::1] offsets not None,
+                            long num_levels, bint symmetric, bint normed,
+                            bint exclude_boundary):
+
+    cdef long sy = im_input.shape[0]
+    cdef long sx = im_input.shape[1]
+    cdef long num_offsets = offsets.shape[0]
+
+    cdef double[:, :, ::1] glcm = np.zeros(
+        [num_levels, num_levels, num_offsets], dtype=np.float64)
+
+    cdef long x, y, nx, ny, ox, oy, i, j, k
+    cdef np.int64_t p1, p2
+    cdef double pcount, psum
+    cdef int invalid_level = 0
+
+    with nogil:
+
+        # accumulate the counts of pixel pairs of all offsets
+        for y in range(sy):
+            for x in range(sx):
+
+                if im_roi_mask[y, x] == 0:
+                    continue
+
+                p1 = im_input[y, x]
+
+                for k in range(num_offsets):
+
+                    oy = offsets[k, 0]
+                    ox = offsets[k, 1]
+
+                    ny = y + oy
+                    nx = x + ox
+
+                    if ny < 0 or ny >= sy or nx < 0 or nx >= sx:
+                        continue
+
+                    if exclude_boundary and im_roi_mask[ny, nx] == 0:
+                        continue
+
+                    p2 = im_input[ny, nx]
+
+                    if p1 < 0 or p1 >= num_levels or \
+                            p2 < 0 or p2 >= num_levels:
+                        invalid_level = 1
+                        break
+
+                    glcm[p1, p2, k] += 1
+
+                if invalid_level:
+                    break
+
+            if invalid_level:
+                break
+
+        if not invalid_level:
+
+            for k in range(num_offsets):
+
+                # symmetricize if asked for
+                if symmetric:
+                    for i in range(num_levels):
+                        glcm[i, i, k] *= 2
+                        for j in range(i + 1, num_levels):
+                            pcount = glcm[i, j, k] + glcm[j, i, k]
+                            glcm[i, j, k] = pcount
+                            glcm[j, i, k] = pcount
+
+                # normalize if asked
+                if normed:
+                    psum = 0
+                    for i in range(num_levels):
+                        for j in range(num_levels):
+                            psum = psum + glcm[i, j, k]
+                    for i in range(num_levels):
+                        for j in range(num_levels):
+                            glcm[i, j, k] = glcm[i, j, k] / psum
+
+    if invalid_level:
+        raise ValueError('invalid entry in coordinates array')
+
+    return np.asarray(glcm)
@@ -0,0 +1,233 @@
+"""Label-indexed reductions of pixel values shared by the feature functions.
+
+The pixels of all objects of a label image are gathered once into a buffer
+sorted by object, such that statistics of all objects can be computed with
+segment reductions instead of a python loop over objects.
+
+"""
+import numpy as np
+
+
+def label_pixel_index(im_label, rprops):
+    """Get the linear indices of the pixels of all objects grouped by object.
+
+    Parameters
+    ----------
+    im_label : array_like
+        A labeled mask image.
+
+    rprops : output of skimage.measure.regionprops
+        The objects, in the order in which they are grouped.
+
+    Returns
+    -------
+    pixel_ind : array_like
+        Linear indices into `im_label` of the pixels of all objects. The
+        pixels of the i-th object are `pixel_ind[offsets[i]:offsets[i+1]]`.
+
+    offsets : array_like
+        A (num_objects + 1) array of the start of the pixels of each object.
+
+    """
+    label_flat = np.ravel(im_label)
+
+    labels = np.array([prop.label for prop in rprops], dtype=np.int64)
+
+    # map labels to object positions
+    max_label = max(label_flat.max(), labels.max()) if len(labels) else 0
+    label_pos = np.full(max_label + 1, -1, dtype=np.int64)
+    label_pos[labels] = np.arange(len(labels))
+
+    pixel_ind = np.flatnonzero(label_flat)
+    pixel_pos = label_pos[label_flat[pixel_ind]]
+
+    valid = pixel_pos >= 0
+    pixel_ind = pixel_ind[valid]
+    pixel_pos = pixel_pos[valid]
+
+    # group pixels by object
+    order = np.argsort(pixel_pos, kind='mergesort')
+    pixel_ind = pixel_ind[order]
+
+    offsets = np.zeros(len(labels) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pixel_pos, minlength=len(labels)), out=offsets[1:])
+
+    return pixel_ind, offsets
+
+
+def _segment_sort(values, segment_ids):
+
+    # sort values within each segment
+    return values[np.lexsort((values, segment_ids))]
+
+
+def _segment_quantile(sorted_values, offsets, counts, q):
+
+    # linear interpolation as done by numpy.percentile
+    pos = q * (counts - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, counts - 1)
+    frac = pos - lo
+
+    v_lo = sorted_values[offsets[:-1] + lo]
+    v_hi = sorted_values[offsets[:-1] + hi]
+
+    return v_lo + (v_hi - v_lo) * frac
+
+
+def _segment_histogram(values, segment_ids, vmin, vmax, num_bins):
+
+    # bin edges of numpy.histogram with bins=num_bins for each segment
+    first_edge = vmin.astype(float)
+    last_edge = vmax.astype(float)
+
+    same = first_edge == last_edge
+    first_edge[same] -= 0.5
+    last_edge[same] += 0.5
+
+    step = (last_edge - first_edge) / num_bins
+    edges = np.arange(num_bins + 1) * step[:, None] + first_edge[:, None]
+    edges[:, -1] = last_edge
+
+    # compute bin indices the same way as numpy.histogram
+    norm = num_bins / (last_edge - first_edge)
+    bin_ind = ((values - first_edge[segment_ids]) *
+               norm[segment_ids]).astype(np.intp)
+    bin_ind[bin_ind == num_bins] -= 1
+
+    decrement = values < edges[segment_ids, bin_ind]
+    bin_ind[decrement] -= 1
+
+    increment = ((values >= edges[segment_ids, bin_ind + 1]) &
+                 (bin_ind != num_bins - 1))
+    bin_ind[increment] += 1
+
+    return np.bincount(
+        segment_ids * num_bins + bin_ind,
+        minlength=len(vmin) * num_bins).reshape(len(vmin), num_bins)
+
+
+def compute_label_statistics(values, offsets, stats, num_hist_bins=10):
+    """Compute statistics of the pixel values of all objects at once.
+
+    Parameters
+    ----------
+    values : array_like
+        Pixel values of all objects grouped by object as returned by
+        `label_pixel_index`.
+
+    offsets : array_like
+        A (num_objects + 1) array of the start of the values of each object.
+        Every object must have at least one pixel.
+
+    stats : list of str
+        Statistics to compute among 'Sum', 'Min', 'Max', 'Mean', 'Median',
+        'Std', 'IQR', 'MAD', 'Skewness', 'Kurtosis', 'HistEnergy' and
+        'HistEntropy'.
+
+    num_hist_bins: int, optional
+        Number of bins of the histograms used for the energy and entropy.
+        Default is 10.
+
+    Returns
+    -------
+    stat_values : dict
+        An array of the values of all objects for each requested statistic.
+
+    Notes
+    -----
+    The statistics are those of numpy and scipy.stats, i.e. standard
+    deviation, skewness and kurtosis are biased estimates, the kurtosis is
+    Fisher's definition and the skewness and kurtosis are 0 and -3 when all
+    values of an object are equal. IQR is computed with linear
+    interpolation, MAD is the median absolute deviation from the median and
+    the histogram is that of numpy.histogram over the range of the values of
+    each object.
+
+    """
+    values = np.asarray(values, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+
+    num_objects = len(offsets) - 1
+    counts = np.diff(offsets)
+    segment_ids = np.repeat(np.arange(num_objects), counts)
+
+    out = {}
+
+    if num_objects == 0:
+        return {stat: np.zeros(0) for stat in stats}
+
+    def needs(*names):
+        return any(name in stats for name in names)
+
+    if needs('Sum', 'Mean', 'Std', 'Skewness', 'Kurtosis'):
+
+        out['Sum'] = np.add.reduceat(values, offsets[:-1])
+        out['Mean'] = out['Sum'] / counts
+
+    if needs('Std', 'Skewness', 'Kurtosis'):
+
+        # central moments
+        dev = values - out['Mean'][segment_ids]
+        dev2 = dev * dev
+
+        m2 = np.add.reduceat(dev2, offsets[:-1]) / counts
+        out['Std'] = np.sqrt(m2)
+
+        zero = m2 == 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+
+            if needs('Skewness'):
+                m3 = np.add.reduceat(dev2 * dev, offsets[:-1]) / counts
+                out['Skewness'] = np.where(zero, 0, m3 / m2 ** 1.5)
+
+            if needs('Kurtosis'):
+                m4 = np.add.reduceat(dev2 * dev2, offsets[:-1]) / counts
+                out['Kurtosis'] = np.where(zero, 0, m4 / m2 ** 2.0) - 3
+
+    if needs('Min', 'Max', 'Median', 'IQR', 'MAD', 'HistEnergy',
+             'HistEntropy'):
+
+        sorted_values = _segment_sort(values, segment_ids)
+
+        out['Min'] = sorted_values[offsets[:-1]]
+        out['Max'] = sorted_values[offsets[1:] - 1]
+
+    if needs('Median', 'MAD'):
+
+        out['Median'] = 0.5 * (
+            sorted_values[offsets[:-1] + (counts - 1) // 2] +
+            sorted_values[offsets[:-1] + counts // 2])
+
+    if needs('IQR'):
+
+        out['IQR'] = (
+            _segment_quantile(sorted_values, offsets, counts, 0.75) -
+            _segment_quantile(sorted_values, offsets, counts, 0.25))
+
+    if needs('MAD'):
+
+        abs_dev = _segment_sort(
+            np.abs(sorted_values - out['Median'][segment_ids]), segment_ids)
+
+        out['MAD'] = 0.5 * (
+            abs_dev[offsets[:-1] + (counts - 1) // 2] +
+            abs_dev[offsets[:-1] + counts // 2])
+
+    if needs('HistEnergy', 'HistEntropy'):
+
+        hist = _segment_histogram(sorted_values, segment_ids,
+                                  out['Min'], out['Max'], num_hist_bins)
+        prob = hist / counts[:, None].astype(np.float32)
+
+        out['HistEnergy'] = np.sum(prob ** 2, axis=1)
+
+        # entropy of the normalized probabilities as scipy.stats.entropy
+        prob = prob / np.sum(prob, axis=1, keepdims=True)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['HistEntropy'] = -np.sum(
+                np.where(prob > 0, prob * np.log(prob), 0), axis=1)
+
+    return {stat: out[stat] for stat in stats}
@@ -1,10 +1,11 @@
 import numpy as np
 import pandas as pd
-from skimage.measure import regionprops
-from skimage.segmentation import find_boundaries
 
+from .object_table import ObjectTable
 
-def compute_fsd_features(im_label, K=128, Fs=6, Delta=8, rprops=None):
+
+def compute_fsd_features(im_label, K=128, Fs=6, Delta=8, rprops=None,
+                         object_table=None):
     """
     Calculates `Fourier shape descriptors` for each objects.
 
@@ -27,6 +28,10 @@ def compute_fsd_features(im_label, K=128, Fs=6, Delta=8, rprops=None):
         passed then it will be computed inside which will increase the
         computation time.
 
+    object_table : histomicstk.features.ObjectTable, optional
+        Object table of `im_label` shared with other feature functions. If
+        it is not passed then it will be computed inside from `rprops`.
+
     Returns
     -------
     fdata: Pandas data frame containing the FSD features for each
@@ -44,19 +49,9 @@ def compute_fsd_features(im_label, K=128, Fs=6, Delta=8, rprops=None):
     for i in range(0, Fs):
         feature_list = np.append(feature_list, 'Shape.FSD' + str(i+1))
 
-    # get Label size x
-    sizex = im_label.shape[0]
-    sizey = im_label.shape[1]
-
-    # get the number of objects in Label
-    if rprops is None:
-        rprops = regionprops(im_label)
-
-    # create pandas data frame containing the features for each object
-    numFeatures = len(feature_list)
-    numLabels = len(rprops)
-    fdata = pd.DataFrame(np.zeros((numLabels, numFeatures)),
-                         columns=feature_list)
+    # compute object table if not provided
+    if object_table is None:
+        object_table = ObjectTable(im_label, rprops=rprops)
 
     # fourier descriptors, spaced evenly over the interval 1:K/2
     Interval = np.round(
@@ -65,38 +60,31 @@ def compute_fsd_features(im_label, K=128, Fs=6, Delta=8, rprops=None):
         )
     ).astype(np.uint8)
 
-    for i in range(numLabels):
-        # get bounds of dilated nucleus
-        min_row, max_row, min_col, max_col = \
-            _GetBounds(rprops[i].bbox, Delta, sizex, sizey)
-        # grab label mask
-        lmask = (
-            im_label[min_row:max_row, min_col:max_col] == rprops[i].label
-        ).astype(np.bool)
-        # find boundaries
-        Bounds = np.argwhere(
-            find_boundaries(lmask, mode="inner").astype(np.uint8) == 1
-        )
-        # check length of boundaries
-        if len(Bounds) < 2:
-            fdata.at[i, :] = 0
-        else:
-            # compute fourier descriptors
-            fdata.at[i, :] = _FSDs(Bounds[:, 0], Bounds[:, 1], K, Interval)
+    # find boundaries within the bounds of the dilated nuclei
+    Bounds, offsets = object_table.boundaries(Delta)
+
+    # compute fourier descriptors of all objects at once
+    fdata = pd.DataFrame(
+        _FSDs(Bounds[:, 0], Bounds[:, 1], offsets, K, Interval),
+        columns=feature_list)
 
     return fdata
 
 
-def _InterpolateArcLength(X, Y, K):
+def _InterpolateArcLength(X, Y, offsets, K):
     """
-    Resamples boundary points [X, Y] at L total equal arc-length locations.
+    Resamples the boundary points [X, Y] of each object at K + 1 equal
+    arc-length locations.
 
     Parameters
     ----------
     X : array_like
-        x points of boundaries
+        x points of the boundaries of all objects
     Y : array_like
-        y points of boundaries
+        y points of the boundaries of all objects
+    offsets : array_like
+        A (num_objects + 1) array of the start of the boundary points of each
+        object. Each object must have at least two boundary points.
     K : int
         Number of points for boundary resampling to calculate fourier
         descriptors. Default value = 128.
@@ -104,27 +92,38 @@ def _InterpolateArcLength(X, Y, K):
     Returns
     -------
     iX : array_like
-        L-length vector of horizontal interpolated coordinates with equal
-        arc-length spacing.
+        num_objects x (K + 1) array of horizontal interpolated coordinates
+        with equal arc-length spacing.
     iY : array_like
-        L-length vector of vertical interpolated coordinates with equal
-        arc-length spacing.
+        num_objects x (K + 1) array of vertical interpolated coordinates
+        with equal arc-length spacing.
 
     """
 
+    num_objects = len(offsets) - 1
+    counts = np.diff(offsets)
+
     # generate spaced points 0, 1/k, 1
     interval = np.linspace(0, 1, K+1)
-    # get segment lengths
-    slens = np.sqrt(np.diff(X)**2 + np.diff(Y)**2)
+    # get segment lengths, including the invalid ones between objects
+    slens = np.zeros(len(X))
+    slens[:-1] = np.sqrt(np.diff(X)**2 + np.diff(Y)**2)
+    slens[offsets[1:] - 1] = 0
     # normalize to unit length
-    slens = np.true_divide(slens, slens.sum())
-    # calculate cumulative length along boundary
-    cumulative = np.zeros(len(slens)+1)
-    cumulative[1:] = np.cumsum(slens)
-    # place points in 'Interval' along boundary
-    locations = np.digitize(interval, cumulative)
+    slens /= np.repeat(np.add.reduceat(slens, offsets[:-1]), counts)
+    # calculate cumulative length along each boundary
+    cumulative = np.zeros(len(X))
+    cumulative[1:] = np.cumsum(slens[:-1])
+    cumulative -= np.repeat(cumulative[offsets[:-1]], counts)
+    # place points in 'Interval' along each boundary using a single search
+    # over the cumulative lengths shifted by twice the object index
+    shift = 2 * np.arange(num_objects)
+    locations = np.searchsorted(
+        cumulative + np.repeat(shift, counts),
+        interval + shift[:, None], side='right') - offsets[:-1, None]
     # clip to ends
-    locations[locations > len(slens)] = len(slens)
+    locations = np.minimum(locations, counts[:, None] - 1)
+    locations += offsets[:-1, None]
     # linear interpolation
     Lie = (interval - cumulative[locations-1])/slens[locations-1]
     iX = X[locations-1] + (X[locations]-X[locations-1])*Lie
@@ -133,22 +132,25 @@ def _InterpolateArcLength(X, Y, K):
     return iX, iY
 
 
-def _FSDs(X, Y, K, Intervals):
+def _FSDs(X, Y, offsets, K, Intervals):
     """
-    Calculated FSDs from boundary points X,Y. Boundaries are resampled to have
-    K equally spaced points (arclength) around the shape. The curvature is
-    calculated using the cumulative angular function, measuring the
-    displacement of the tangent angle from the starting point of the boundary.
-    The K-length fft of the cumulative angular function is calculated, and
-    then the elements of 'F' are summed as the spectral energy over
-    'Intervals'.
+    Calculated FSDs from the boundary points X,Y of all objects. Boundaries
+    are resampled to have K equally spaced points (arclength) around the
+    shape. The curvature is calculated using the cumulative angular function,
+    measuring the displacement of the tangent angle from the starting point
+    of the boundary. The K-length fft of the cumulative angular function is
+    calculated, and then the elements of 'F' are summed as the spectral
+    energy over 'Intervals'.
 
     Parameters
     ----------
     X : array_like
-        x points of boundaries
+        x points of the boundaries of all objects
     Y : array_like
-        y points of boundaries
+        y points of the boundaries of all objects
+    offsets : array_like
+        A (num_objects + 1) array of the start of the boundary points of each
+        object.
     K : int
         Number of points for boundary resampling to calculate fourier
         descriptors. Default value = 128.
@@ -158,8 +160,10 @@ def _FSDs(X, Y, K, Intervals):
     Returns
     -------
     F : array_like
-        length(Intervals) vector containing spectral energy of
-        cumulative angular function, summed over defined 'Intervals'.
+        num_objects x (length(Intervals) - 1) array containing the spectral
+        energy of the cumulative angular function of each object, summed
+        over defined 'Intervals'. It is zero for objects with less than two
+        boundary points.
 
     """
 
@@ -168,31 +172,40 @@ def _FSDs(X, Y, K, Intervals):
         Intervals = np.hstack((1., Intervals))
     if Intervals[-1] != (K / 2):
         Intervals = np.hstack((Intervals, float(K)))
+    Intervals = Intervals.astype(int)
     # get length of intervals
     L = len(Intervals)
     # initialize F
-    F = np.zeros((L-1, )).astype(float)
+    F = np.zeros((len(offsets) - 1, L-1))
+    # select objects with enough boundary points
+    counts = np.diff(offsets)
+    valid = np.flatnonzero(counts >= 2)
+    if len(valid) == 0:
+        return F
+    points = np.flatnonzero(np.repeat(counts >= 2, counts))
+    valid_offsets = np.zeros(len(valid) + 1, dtype=np.int64)
+    np.cumsum(counts[valid], out=valid_offsets[1:])
     # interpolate boundaries
-    iX, iY = _InterpolateArcLength(X, Y, K)
-    # check if iXY.iX is not empty
-    if iX.size:
-        # calculate curvature
-        Curvature = np.arctan2(
-            (iY[1:] - iY[:-1]),
-            (iX[1:] - iX[:-1])
-        )
-        # make curvature cumulative
-        Curvature = Curvature - Curvature[0]
-        # calculate FFT
-        fX = np.fft.fft(Curvature).T
-        # spectral energy
-        fX = fX * fX.conj()
-        fX = fX / fX.sum()
-        # calculate 'F' values
-        for i in range(L-1):
-            F[i] = np.round(
-                fX[Intervals[i]-1:Intervals[i+1]].sum(), L
-            ).real.astype(float)
+    iX, iY = _InterpolateArcLength(X[points].astype(float),
+                                   Y[points].astype(float),
+                                   valid_offsets, K)
+    # calculate curvature
+    Curvature = np.arctan2(
+        (iY[:, 1:] - iY[:, :-1]),
+        (iX[:, 1:] - iX[:, :-1])
+    )
+    # make curvature cumulative
+    Curvature = Curvature - Curvature[:, :1]
+    # calculate FFT
+    fX = np.fft.fft(Curvature, axis=1)
+    # spectral energy
+    fX = fX.real**2 + fX.imag**2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fX = fX / fX.sum(axis=1, keepdims=True)
+    # calculate 'F' values
+    for i in range(L-1):
+        F[valid, i] = np.round(
+            fX[:, Intervals[i]-1:Intervals[i+1]].sum(axis=1), L)
 
     return F
 
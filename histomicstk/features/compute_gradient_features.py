@@ -1,12 +1,14 @@
 import numpy as np
 import pandas as pd
-import scipy.stats
 from skimage.feature import canny
-from skimage.measure import regionprops
+
+from ._label_statistics import compute_label_statistics
+from .object_table import ObjectTable
 
 
 def compute_gradient_features(im_label, im_intensity,
-                              num_hist_bins=10, rprops=None):
+                              num_hist_bins=10, rprops=None,
+                              object_table=None):
     """Calculates gradient features from an intensity image.
 
     Parameters
@@ -25,6 +27,10 @@ def compute_gradient_features(im_label, im_intensity,
         passed then it will be computed inside which will increase the
         computation time.
 
+    object_table : histomicstk.features.ObjectTable, optional
+        Object table of `im_label` shared with other feature functions. If
+        it is not passed then it will be computed inside from `rprops`.
+
     Returns
     -------
     fdata: pandas.DataFrame
@@ -78,55 +84,35 @@ def compute_gradient_features(im_label, im_intensity,
         'Gradient.Canny.Mean',
     ]
 
-    # compute object properties if not provided
-    if rprops is None:
-        rprops = regionprops(im_label)
-
-    # create pandas data frame containing the features for each object
-    numFeatures = len(feature_list)
-    numLabels = len(rprops)
-    fdata = pd.DataFrame(np.zeros((numLabels, numFeatures)),
-                         columns=feature_list)
+    # compute object table if not provided
+    if object_table is None:
+        object_table = ObjectTable(im_label, rprops=rprops)
 
     Gx, Gy = np.gradient(im_intensity)
     diffG = np.sqrt(Gx**2 + Gy**2)
     cannyG = canny(im_intensity)
 
-    for i in range(numLabels):
-
-        # get gradients of object pixels
-        pixelGradients = np.sort(
-            diffG[rprops[i].coords[:, 0], rprops[i].coords[:, 1]]
-        )
-
-        # compute mean
-        fdata.at[i, 'Gradient.Mag.Mean'] = np.mean(pixelGradients)
-
-        # compute standard deviation
-        fdata.at[i, 'Gradient.Mag.Std'] = np.std(pixelGradients)
+    # compute the statistics of the gradients of the pixels of all objects
+    pixel_ind, offsets = object_table.pixel_index()
 
-        # compute skewness
-        fdata.at[i, 'Gradient.Mag.Skewness'] = scipy.stats.skew(pixelGradients)
+    stats = compute_label_statistics(
+        np.ravel(diffG)[pixel_ind], offsets,
+        ['Mean', 'Std', 'Skewness', 'Kurtosis', 'HistEntropy', 'HistEnergy'],
+        num_hist_bins=num_hist_bins)
 
-        # compute kurtosis
-        fdata.at[i, 'Gradient.Mag.Kurtosis'] = \
-            scipy.stats.kurtosis(pixelGradients)
+    canny_sum = compute_label_statistics(
+        np.ravel(cannyG)[pixel_ind], offsets, ['Sum'])['Sum']
 
-        # compute intensity histogram
-        hist, bins = np.histogram(pixelGradients, bins=num_hist_bins)
-        prob = hist/np.sum(hist, dtype=np.float32)
-
-        # compute entropy
-        fdata.at[i, 'Gradient.Mag.HistEntropy'] = scipy.stats.entropy(prob)
-
-        # compute energy
-        fdata.at[i, 'Gradient.Mag.HistEnergy'] = np.sum(prob**2)
-
-        bw_canny = cannyG[rprops[i].coords[:, 0], rprops[i].coords[:, 1]]
-        canny_sum = np.sum(bw_canny).astype('float')
-
-        fdata.at[i, 'Gradient.Canny.Sum'] = canny_sum
-
-        fdata.at[i, 'Gradient.Canny.Mean'] = canny_sum / len(pixelGradients)
+    # create pandas data frame containing the features for each object
+    fdata = pd.DataFrame(np.column_stack([
+        stats['Mean'],
+        stats['Std'],
+        stats['Skewness'],
+        stats['Kurtosis'],
+        stats['HistEntropy'],
+        stats['HistEnergy'],
+        canny_sum,
+        canny_sum / np.diff(offsets),
+    ]), columns=feature_list)
 
     return fdata
@@ -1,15 +1,14 @@
 import numpy as np
 import pandas as pd
-from skimage.measure import regionprops
-from .graycomatrixext import graycomatrixext
+from .graycomatrixext import _default_gray_limits
 from .graycomatrixext import _default_num_levels
 from .graycomatrixext import _default_offsets
-
-from ._compute_marginal_glcm_probs_cython import _compute_marginal_glcm_probs_cython
+from .object_table import ObjectTable
 
 
 def compute_haralick_features(im_label, im_intensity, offsets=None,
-                              num_levels=None, gray_limits=None, rprops=None):
+                              num_levels=None, gray_limits=None, rprops=None,
+                              object_table=None):
     r"""
     Calculates 26 Haralick texture features for each object in the given label
     mask.
@@ -52,6 +51,15 @@ def compute_haralick_features(im_label, im_intensity, offsets=None,
         Default: [0, 1] for boolean-valued image, [0, 255] for integer-valued
         image, and [0.0, 1.0] for-real valued image
 
+    rprops : output of skimage.measure.regionprops, optional
+        rprops = skimage.measure.regionprops( im_label ). If rprops is not
+        passed then it will be computed inside which will increase the
+        computation time.
+
+    object_table : histomicstk.features.ObjectTable, optional
+        Object table of `im_label` shared with other feature functions. If
+        it is not passed then it will be computed inside from `rprops`.
+
     Returns
     -------
     fdata: pandas.DataFrame
@@ -204,6 +212,10 @@ def compute_haralick_features(im_label, im_intensity, offsets=None,
 
             HXY2 = -\sum_{i,j=0}^{levels-1} p_x(i) p_y(j) \log(p_x(i) p_y(j))
 
+    The GLCMs of an object are computed from the intensities within its
+    bounding box extended by one row and column. The GLCMs and features of
+    all objects are computed at once using array operations.
+
     References
     ----------
     .. [#] Haralick, et al. "Textural features for image classification,"
@@ -260,115 +272,214 @@ def compute_haralick_features(im_label, im_intensity, offsets=None,
                 'Dimension mismatch between input image and offsets'
             )
 
-    num_offsets = offsets.shape[0]
+    # compute object table if not provided
+    if object_table is None:
+        object_table = ObjectTable(im_label, rprops=rprops)
 
-    # compute object properties if not provided
-    if rprops is None:
-        rprops = regionprops(im_label)
+    # create array containing the features for each object
+    numLabels = len(object_table)
+    fvalues = np.zeros((numLabels, len(agg_feature_list)))
 
-    # create pandas data frame containing the features for each object
-    numLabels = len(rprops)
-    fdata = pd.DataFrame(np.zeros((numLabels, len(agg_feature_list))),
-                         columns=agg_feature_list)
+    if numLabels == 0:
+        return pd.DataFrame(fvalues, columns=agg_feature_list)
 
-    n_Minus = np.arange(num_levels)
-    n_Plus = np.arange(2 * num_levels - 1)
+    # each object is described by the GLCMs of the intensities within its
+    # bounding box extended by one row and column
+    bbox = object_table.bbox
+    bbox_min = bbox[:, :num_dims]
+    bbox_max = np.minimum(bbox[:, num_dims:] + 1, im_intensity.shape)
 
-    x, y = np.mgrid[0:num_levels, 0:num_levels]
-    xy = x * y
-    xy_IDM = 1. / (1 + np.square(x - y))
+    # quantize the whole image at once
+    im_quantized = _quantize_intensity(
+        im_intensity.astype(np.uint8), num_levels, gray_limits)
 
-    e = 0.00001  # small positive constant to avoid log 0
+    # process objects in chunks to bound the memory used by the GLCMs
+    win_size = np.prod(bbox_max - bbox_min, axis=1)
+    cost = np.cumsum(win_size + num_levels ** 2 * len(offsets))
 
-    for i in range(numLabels):
+    chunk_bounds = np.unique(np.concatenate([
+        [0],
+        np.searchsorted(cost, np.arange(_CHUNK_SIZE, cost[-1], _CHUNK_SIZE)),
+        [numLabels]
+    ]))
 
-        # get bounds of an intensity image
-        minr, minc, maxr, maxc = rprops[i].bbox
+    for start, stop in zip(chunk_bounds[:-1], chunk_bounds[1:]):
 
-        # grab nucleus mask
-        subImage = im_intensity[minr:maxr+1, minc:maxc+1].astype(np.uint8)
+        glcm = _compute_object_glcms(
+            im_quantized, bbox_min[start:stop], bbox_max[start:stop],
+            offsets, num_levels)
 
-        # gets GLCM or gray-tone spatial dependence matrix
-        arrayGLCM = graycomatrixext(subImage, offsets=offsets,
-                                    num_levels=num_levels,
-                                    gray_limits=gray_limits,
-                                    symmetric=True, normed=True)
+        ldata = _compute_glcm_haralick_features(glcm)
 
-        # Compute haralick features for each offset
-        ldata = pd.DataFrame(np.zeros((num_offsets, len(feature_list))),
-                             columns=feature_list)
+        fvalues[start:stop, ::2] = np.mean(ldata, axis=1)
+        fvalues[start:stop, 1::2] = np.ptp(ldata, axis=1)
 
-        for r in range(num_offsets):
+    fdata = pd.DataFrame(fvalues, columns=agg_feature_list)
 
-            nGLCM = arrayGLCM[:, :, r]
+    return fdata
 
-            # get marginal-probabilities
-            px, py, pxPlusy, pxMinusy = _compute_marginal_glcm_probs_cython(
-                nGLCM)
 
-            # computes angular second moment
-            ldata.at[r, 'Haralick.ASM'] = np.sum(np.square(nGLCM))
+# Approximate number of array elements processed at once
+_CHUNK_SIZE = 2 ** 22
 
-            # computes contrast
-            ldata.at[r, 'Haralick.Contrast'] = \
-                np.dot(np.square(n_Minus), pxMinusy)
 
-            # computes correlation
-            # gets weighted mean and standard deviation of px and py
-            meanx = np.dot(n_Minus, px)
-            variance = np.dot(px, np.square(n_Minus)) - np.square(meanx)
-            nGLCMr = np.ravel(nGLCM)
-            ldata.at[r, 'Haralick.Correlation'] = \
-                (np.dot(np.ravel(xy), nGLCMr) - np.square(meanx)) / variance
+def _quantize_intensity(im_input, num_levels, gray_limits=None):
+    """Scales intensities to gray levels the same way as graycomatrixext."""
+    if gray_limits is None:
+        gray_limits = _default_gray_limits(im_input)
 
-            # computes sum of squares : variance
-            ldata.at[r, 'Haralick.SumOfSquares'] = variance
+    assert len(gray_limits) == 2 and gray_limits[0] < gray_limits[1]
 
-            # computes inverse difference moment
-            ldata.at[r, 'Haralick.IDM'] = \
-                np.dot(np.ravel(xy_IDM), nGLCMr)
+    im_input = im_input.astype('float')
+    im_input -= gray_limits[0]
+    im_input /= float(gray_limits[1] - gray_limits[0])
+    im_input *= (num_levels - 1)
 
-            # computes sum average
-            ldata.at[r, 'Haralick.SumAverage'] = \
-                np.dot(n_Plus, pxPlusy)
+    return np.round(im_input).astype('int')
 
-            # computes sum variance
-            # [1] uses sum entropy, but we use sum average
-            ldata.at[r, 'Haralick.SumVariance'] = \
-                np.dot(np.square(n_Plus), pxPlusy) - \
-                np.square(ldata.at[r, 'Haralick.SumAverage'])
 
-            # computes sum entropy
-            ldata.at[r, 'Haralick.SumEntropy'] = \
-                -np.dot(pxPlusy, np.log2(pxPlusy+e))
+def _compute_object_glcms(im_quantized, win_min, win_max, offsets,
+                          num_levels):
+    """Computes the symmetric normalized GLCMs of the windows of all objects
+    with a single bincount over object x level x level indices.
 
-            # computes entropy
-            ldata.at[r, 'Haralick.Entropy'] = \
-                -np.dot(nGLCMr, np.log2(nGLCMr+e))
+    Returns a (num_objects, num_offsets, num_levels, num_levels) array.
 
-            # computes variance px-y
-            ldata.at[r, 'Haralick.DifferenceVariance'] = np.var(pxMinusy)
+    """
+    num_objects, num_dims = win_min.shape
+    win_shape = win_max - win_min
+    win_size = np.prod(win_shape, axis=1)
 
-            # computes difference entropy px-y
-            ldata.at[r, 'Haralick.DifferenceEntropy'] = \
-                -np.dot(pxMinusy, np.log2(pxMinusy+e))
+    # local coordinates of all window pixels of all objects
+    obj_ind = np.repeat(np.arange(num_objects), win_size)
+    local_ind = np.arange(obj_ind.size) - np.repeat(
+        np.cumsum(win_size) - win_size, win_size)
 
-            # computes information measures of correlation
-            # gets entropies of px and py
-            HX = -np.dot(px, np.log2(px+e))
-            HY = -np.dot(py, np.log2(py+e))
-            HXY = ldata.at[r, 'Haralick.Entropy']
-            pxy_ij = np.outer(px, py)
-            pxy_ijr = np.ravel(pxy_ij)
-            HXY1 = -np.dot(nGLCMr, np.log2(pxy_ijr+e))
-            HXY2 = -np.dot(pxy_ijr, np.log2(pxy_ijr+e))
-            ldata.at[r, 'Haralick.IMC1'] = (HXY-HXY1)/max(HX, HY)
+    coords = np.empty((num_dims, obj_ind.size), dtype=np.int64)
 
-            # computes information measures of correlation
-            ldata.at[r, 'Haralick.IMC2'] = \
-                np.sqrt(1 - np.exp(-2.0*(HXY2-HXY)))
+    for d in range(num_dims - 1, -1, -1):
+        dim_size = win_shape[obj_ind, d]
+        coords[d] = local_ind % dim_size
+        local_ind //= dim_size
 
-        fdata.values[i, ::2] = np.mean(ldata.values, axis=0)
-        fdata.values[i, 1::2] = np.ptp(ldata.values, axis=0)
+    # gray levels of all window pixels
+    im_flat = im_quantized.ravel()
+    strides = np.cumprod((im_quantized.shape[1:] + (1,))[::-1])[::-1]
+    pixel_ind = np.dot(strides, coords + win_min[obj_ind].T)
+    levels = im_flat[pixel_ind]
 
-    return fdata
+    num_offsets = len(offsets)
+    glcm = np.zeros((num_objects, num_offsets, num_levels, num_levels))
+
+    for i in range(num_offsets):
+
+        offset = np.asarray(offsets[i], dtype=np.int64)
+
+        # keep pixels whose neighbor lies within the window of the object
+        valid = np.ones(obj_ind.size, dtype=bool)
+
+        for d in range(num_dims):
+            neigh = coords[d] + offset[d]
+            valid &= (neigh >= 0) & (neigh < win_shape[obj_ind, d])
+
+        p1 = levels[valid]
+        p2 = im_flat[pixel_ind[valid] + np.dot(strides, offset)]
+
+        pind = np.ravel_multi_index(
+            (obj_ind[valid], p1, p2),
+            (num_objects, num_levels, num_levels))
+
+        cur_glcm = np.bincount(
+            pind, minlength=num_objects * num_levels ** 2
+        ).reshape(num_objects, num_levels, num_levels).astype(float)
+
+        # symmetricize and normalize
+        cur_glcm += cur_glcm.transpose(0, 2, 1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cur_glcm /= cur_glcm.sum(axis=(1, 2))[:, None, None]
+
+        glcm[:, i] = cur_glcm
+
+    return glcm
+
+
+def _compute_glcm_haralick_features(glcm):
+    """Computes the 13 haralick features of every GLCM of an array of
+    normalized GLCMs of shape (..., num_levels, num_levels).
+
+    Returns an array of shape (..., 13).
+
+    """
+    num_levels = glcm.shape[-1]
+
+    n_Minus = np.arange(num_levels)
+    n_Plus = np.arange(2 * num_levels - 1)
+
+    x, y = np.mgrid[0:num_levels, 0:num_levels]
+    xy = x * y
+    xy_IDM = 1. / (1 + np.square(x - y))
+
+    e = 0.00001  # small positive constant to avoid log 0
+
+    nGLCMr = glcm.reshape(glcm.shape[:-2] + (-1,))
+
+    # marginal probabilities
+    px = glcm.sum(axis=-1)
+    py = glcm.sum(axis=-2)
+    pxPlusy = np.dot(nGLCMr, np.ravel(x + y)[:, None] == n_Plus)
+    pxMinusy = np.dot(nGLCMr, np.ravel(np.abs(x - y))[:, None] == n_Minus)
+
+    feats = np.empty(glcm.shape[:-2] + (13,))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        # angular second moment
+        feats[..., 0] = np.sum(np.square(nGLCMr), axis=-1)
+
+        # contrast
+        feats[..., 1] = np.dot(pxMinusy, np.square(n_Minus))
+
+        # correlation
+        meanx = np.dot(px, n_Minus)
+        variance = np.dot(px, np.square(n_Minus)) - np.square(meanx)
+        feats[..., 2] = \
+            (np.dot(nGLCMr, np.ravel(xy)) - np.square(meanx)) / variance
+
+        # sum of squares : variance
+        feats[..., 3] = variance
+
+        # inverse difference moment
+        feats[..., 4] = np.dot(nGLCMr, np.ravel(xy_IDM))
+
+        # sum average
+        feats[..., 5] = np.dot(pxPlusy, n_Plus)
+
+        # sum variance, [1] uses sum entropy, but we use sum average
+        feats[..., 6] = \
+            np.dot(pxPlusy, np.square(n_Plus)) - np.square(feats[..., 5])
+
+        # sum entropy
+        feats[..., 7] = -np.sum(pxPlusy * np.log2(pxPlusy + e), axis=-1)
+
+        # entropy
+        HXY = -np.sum(nGLCMr * np.log2(nGLCMr + e), axis=-1)
+        feats[..., 8] = HXY
+
+        # variance px-y
+        feats[..., 9] = np.var(pxMinusy, axis=-1)
+
+        # difference entropy px-y
+        feats[..., 10] = -np.sum(pxMinusy * np.log2(pxMinusy + e), axis=-1)
+
+        # information measures of correlation
+        HX = -np.sum(px * np.log2(px + e), axis=-1)
+        HY = -np.sum(py * np.log2(py + e), axis=-1)
+        pxy_ijr = (px[..., :, None] * py[..., None, :]).reshape(
+            nGLCMr.shape)
+        HXY1 = -np.sum(nGLCMr * np.log2(pxy_ijr + e), axis=-1)
+        HXY2 = -np.sum(pxy_ijr * np.log2(pxy_ijr + e), axis=-1)
+        feats[..., 11] = (HXY - HXY1) / np.maximum(HX, HY)
+        feats[..., 12] = np.sqrt(1 - np.exp(-2.0 * (HXY2 - HXY)))
+
+    return feats
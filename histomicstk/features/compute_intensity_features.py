@@ -1,13 +1,14 @@
 """Compute intensity features in labeled image."""
 import numpy as np
 import pandas as pd
-import scipy.stats
-from skimage.measure import regionprops
+
+from ._label_statistics import compute_label_statistics
+from .object_table import ObjectTable
 
 
 def compute_intensity_features(
         im_label, im_intensity, num_hist_bins=10,
-        rprops=None, feature_list=None):
+        rprops=None, feature_list=None, object_table=None):
     """Calculate intensity features from an intensity image.
 
     Parameters
@@ -33,6 +34,10 @@ def compute_intensity_features(
         list of intensity features to return.
         If none, all intensity features are returned.
 
+    object_table : histomicstk.features.ObjectTable, optional
+        Object table of `im_label` shared with other feature functions. If
+        it is not passed then it will be computed inside from `rprops`.
+
     Returns
     -------
     fdata: pandas.DataFrame
@@ -109,85 +114,30 @@ def compute_intensity_features(
         assert all(j in default_feature_list for j in feature_list), \
             "Some feature names are not recognized."
 
-    # compute object properties if not provided
-    if rprops is None:
-        rprops = regionprops(im_label)
-
-    # create pandas data frame containing the features for each object
-    numFeatures = len(feature_list)
-    numLabels = len(rprops)
-    fdata = pd.DataFrame(np.zeros((numLabels, numFeatures)),
-                         columns=feature_list)
-
-    # conditionally execute calculations if x in the features list
-    def _conditional_execution(feature, func, *args, **kwargs):
-        if feature in feature_list:
-            fdata.at[i, feature] = func(*args, **kwargs)
-
-    def _return_input(x):
-        return x
-
-    for i in range(numLabels):
-
-        # get intensities of object pixels
-        pixelIntensities = np.sort(
-            im_intensity[rprops[i].coords[:, 0], rprops[i].coords[:, 1]]
-        )
-
-        # compute min
-        _conditional_execution('Intensity.Min', np.min, pixelIntensities)
+    # compute object table if not provided
+    if object_table is None:
+        object_table = ObjectTable(im_label, rprops=rprops)
 
-        # compute max
-        _conditional_execution('Intensity.Max', np.max, pixelIntensities)
+    # compute the statistics of the intensities of the pixels of all objects
+    stat_names = [name.split('.', 1)[1] for name in feature_list]
 
-        # compute mean
-        meanIntensity = np.mean(pixelIntensities)
-        _conditional_execution('Intensity.Mean', _return_input, meanIntensity)
+    if 'MeanMedianDiff' in stat_names:
+        stat_names.remove('MeanMedianDiff')
+        stat_names += ['Mean', 'Median']
 
-        # compute median
-        medianIntensity = np.median(pixelIntensities)
-        _conditional_execution(
-            'Intensity.Median', _return_input, medianIntensity)
+    values, offsets = object_table.pixel_values(im_intensity)
 
-        # compute mean median differnece
-        _conditional_execution(
-            'Intensity.MeanMedianDiff', _return_input,
-            meanIntensity - medianIntensity)
+    stats = compute_label_statistics(
+        values, offsets, stat_names,
+        num_hist_bins=num_hist_bins)
 
-        # compute standard deviation
-        _conditional_execution('Intensity.Std', np.std, pixelIntensities)
+    if 'Intensity.MeanMedianDiff' in feature_list:
+        stats['MeanMedianDiff'] = stats['Mean'] - stats['Median']
 
-        # compute inter-quartile range
-        _conditional_execution(
-            'Intensity.IQR', scipy.stats.iqr, pixelIntensities)
-
-        # compute median absolute deviation
-        _conditional_execution(
-            'Intensity.MAD', np.median,
-            np.abs(pixelIntensities - medianIntensity))
-
-        # compute skewness
-        _conditional_execution(
-            'Intensity.Skewness', scipy.stats.skew, pixelIntensities)
-
-        # compute kurtosis
-        _conditional_execution(
-            'Intensity.Kurtosis', scipy.stats.kurtosis, pixelIntensities)
-
-        # histogram-based features
-        if any(j in feature_list for j in [
-                'Intensity.HistEntropy', 'Intensity.HistEnergy']):
-
-            # compute intensity histogram
-            hist, bins = np.histogram(pixelIntensities, bins=num_hist_bins)
-            prob = hist/np.sum(hist, dtype=np.float32)
-
-            # compute entropy
-            _conditional_execution(
-                'Intensity.HistEntropy', scipy.stats.entropy, prob)
-
-            # compute energy
-            _conditional_execution(
-                'Intensity.HistEnergy', np.sum, prob**2)
+    # create pandas data frame containing the features for each object
+    fdata = pd.DataFrame(
+        np.column_stack([stats[name.split('.', 1)[1]]
+                         for name in feature_list]),
+        columns=feature_list)
 
     return fdata
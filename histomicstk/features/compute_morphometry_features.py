@@ -1,9 +1,9 @@
 import numpy as np
 import pandas as pd
-from skimage.measure import regionprops
+from .object_table import ObjectTable
 
 
-def compute_morphometry_features(im_label, rprops=None):
+def compute_morphometry_features(im_label, rprops=None, object_table=None):
     """
     Calculates morphometry features for each object
 
@@ -19,6 +19,10 @@ def compute_morphometry_features(im_label, rprops=None):
         passed then it will be computed inside which will increase the
         computation time.
 
+    object_table : histomicstk.features.ObjectTable, optional
+        Object table of `im_label` shared with other feature functions. If
+        it is not passed then it will be computed inside from `rprops`.
+
     Returns
     -------
     fdata: pandas.DataFrame
@@ -84,9 +88,11 @@ def compute_morphometry_features(im_label, rprops=None):
         'Shape.Solidity',
     ]
 
-    # compute object properties if not provided
-    if rprops is None:
-        rprops = regionprops(im_label)
+    # compute object table if not provided
+    if object_table is None:
+        object_table = ObjectTable(im_label, rprops=rprops)
+
+    rprops = object_table.rprops
 
     # create pandas data frame containing the features for each object
     numFeatures = len(feature_list)
@@ -1,11 +1,14 @@
+import functools
+from multiprocessing.pool import ThreadPool
+
 import pandas as pd
-from skimage.measure import regionprops
 
 from .compute_fsd_features import compute_fsd_features
 from .compute_gradient_features import compute_gradient_features
 from .compute_haralick_features import compute_haralick_features
 from .compute_intensity_features import compute_intensity_features
 from .compute_morphometry_features import compute_morphometry_features
+from .object_table import ObjectTable
 
 from histomicstk.segmentation import label as htk_label
 
@@ -17,7 +20,8 @@ def compute_nuclei_features(im_label, im_nuclei, im_cytoplasm=None,
                             fsd_features_flag=True,
                             intensity_features_flag=True,
                             gradient_features_flag=True,
-                            haralick_features_flag=True
+                            haralick_features_flag=True,
+                            num_threads=1
                             ):
     """
     Calculates features for nuclei classification
@@ -79,6 +83,11 @@ def compute_nuclei_features(im_label, im_nuclei, im_cytoplasm=None,
         haralick features from intensity and cytoplasm channels.
         See `histomicstk.features.compute_haralick_features` for more details.
 
+    num_threads : int, optional
+        Number of threads used to compute the feature families in parallel.
+        The object tables of the nuclei and cytoplasm are computed once and
+        shared by all feature families. Default value = 1.
+
     Returns
     -------
     fdata : pandas.DataFrame
@@ -122,100 +131,98 @@ def compute_nuclei_features(im_label, im_nuclei, im_cytoplasm=None,
 
     """
 
-    feature_list = []
-
-    # get the number of objects in im_label
-    nuclei_props = regionprops(im_label)
+    # compute the object tables shared by all feature families
+    nuclei_table = ObjectTable(im_label)
 
     # compute cytoplasm mask
     if im_cytoplasm is not None:
 
         cyto_mask = htk_label.dilate_xor(im_label, neigh_width=cyto_width)
 
-        cytoplasm_props = regionprops(cyto_mask)
+        cytoplasm_table = ObjectTable(cyto_mask)
+
+    # list the feature families as (prefix, function) pairs
+    feature_funcs = []
 
     # compute morphometry features
     if morphometry_features_flag:
 
-        fmorph = compute_morphometry_features(im_label, rprops=nuclei_props)
-
-        feature_list.append(fmorph)
+        feature_funcs.append(('', functools.partial(
+            compute_morphometry_features, im_label,
+            object_table=nuclei_table)))
 
     # compute FSD features
     if fsd_features_flag:
 
-        ffsd = compute_fsd_features(im_label, fsd_bnd_pts, fsd_freq_bins,
-                                    cyto_width, rprops=nuclei_props)
-
-        feature_list.append(ffsd)
+        feature_funcs.append(('', functools.partial(
+            compute_fsd_features, im_label, fsd_bnd_pts, fsd_freq_bins,
+            cyto_width, object_table=nuclei_table)))
 
     # compute nuclei intensity features
     if intensity_features_flag:
 
-        fint_nuclei = compute_intensity_features(im_label, im_nuclei,
-                                                 rprops=nuclei_props)
-        fint_nuclei.columns = ['Nucleus.' + col
-                               for col in fint_nuclei.columns]
-
-        feature_list.append(fint_nuclei)
+        feature_funcs.append(('Nucleus.', functools.partial(
+            compute_intensity_features, im_label, im_nuclei,
+            object_table=nuclei_table)))
 
     # compute cytoplasm intensity features
     if intensity_features_flag and im_cytoplasm is not None:
 
-        fint_cytoplasm = compute_intensity_features(cyto_mask, im_cytoplasm,
-                                                    rprops=cytoplasm_props)
-        fint_cytoplasm.columns = ['Cytoplasm.' + col
-                                  for col in fint_cytoplasm.columns]
-
-        feature_list.append(fint_cytoplasm)
+        feature_funcs.append(('Cytoplasm.', functools.partial(
+            compute_intensity_features, cyto_mask, im_cytoplasm,
+            object_table=cytoplasm_table)))
 
     # compute nuclei gradient features
     if gradient_features_flag:
 
-        fgrad_nuclei = compute_gradient_features(im_label, im_nuclei,
-                                                 rprops=nuclei_props)
-        fgrad_nuclei.columns = ['Nucleus.' + col
-                                for col in fgrad_nuclei.columns]
-
-        feature_list.append(fgrad_nuclei)
+        feature_funcs.append(('Nucleus.', functools.partial(
+            compute_gradient_features, im_label, im_nuclei,
+            object_table=nuclei_table)))
 
     # compute cytoplasm gradient features
     if gradient_features_flag and im_cytoplasm is not None:
 
-        fgrad_cytoplasm = compute_gradient_features(cyto_mask, im_cytoplasm,
-                                                    rprops=cytoplasm_props)
-        fgrad_cytoplasm.columns = ['Cytoplasm.' + col
-                                   for col in fgrad_cytoplasm.columns]
-
-        feature_list.append(fgrad_cytoplasm)
+        feature_funcs.append(('Cytoplasm.', functools.partial(
+            compute_gradient_features, cyto_mask, im_cytoplasm,
+            object_table=cytoplasm_table)))
 
     # compute nuclei haralick features
     if haralick_features_flag:
 
-        fharalick_nuclei = compute_haralick_features(
-            im_label, im_nuclei,
-            num_levels=num_glcm_levels,
-            rprops=nuclei_props
-        )
-
-        fharalick_nuclei.columns = ['Nucleus.' + col
-                                    for col in fharalick_nuclei.columns]
-
-        feature_list.append(fharalick_nuclei)
+        feature_funcs.append(('Nucleus.', functools.partial(
+            compute_haralick_features, im_label, im_nuclei,
+            num_levels=num_glcm_levels, object_table=nuclei_table)))
 
     # compute cytoplasm haralick features
     if haralick_features_flag and im_cytoplasm is not None:
 
-        fharalick_cytoplasm = compute_haralick_features(
-            cyto_mask, im_cytoplasm,
-            num_levels=num_glcm_levels,
-            rprops=cytoplasm_props
-        )
+        feature_funcs.append(('Cytoplasm.', functools.partial(
+            compute_haralick_features, cyto_mask, im_cytoplasm,
+            num_levels=num_glcm_levels, object_table=cytoplasm_table)))
+
+    def compute_features(prefix_func):
+
+        prefix, func = prefix_func
+
+        fdata = func()
+        fdata.columns = [prefix + col for col in fdata.columns]
+
+        return fdata
+
+    # compute the feature families, in parallel threads if asked
+    if num_threads > 1 and len(feature_funcs) > 1:
+
+        pool = ThreadPool(min(num_threads, len(feature_funcs)))
+
+        try:
+            feature_list = pool.map(compute_features, feature_funcs)
+        finally:
+            pool.close()
 
-        fharalick_cytoplasm.columns = ['Cytoplasm.' + col
-                                       for col in fharalick_cytoplasm.columns]
+    else:
 
-        feature_list.append(fharalick_cytoplasm)
+        feature_list = [compute_features(prefix_func)
+                        for prefix_func in feature_funcs]
 
     # Merge all features
     fdata = pd.concat(feature_list, axis=1)
@@ -1,5 +1,11 @@
 import numpy as np
 
+try:
+    from ._graycomatrixext_cython import _graycomatrixext_cython
+except ImportError:
+    # fall back to the pure numpy implementation
+    _graycomatrixext_cython = None
+
 
 def graycomatrixext(im_input, im_roi_mask=None,
                     offsets=None, num_levels=None, gray_limits=None,
@@ -92,6 +98,14 @@ def graycomatrixext(im_input, im_roi_mask=None,
         num_levels x num_levels x num_offsets array containing the GLCM
         for each offset.
 
+    Notes
+    -----
+    The GLCMs of 2D images are accumulated for all offsets at once by a
+    compiled kernel that releases the GIL, such that it scales with the
+    number of threads of a thread pool. A pure numpy implementation is used
+    for images of other dimensions or if the compiled kernel is not
+    available.
+
     References
     ----------
     .. [#] Haralick, R.M., K. Shanmugan, and I. Dinstein, "Textural Features
@@ -140,8 +154,6 @@ def graycomatrixext(im_input, im_roi_mask=None,
                 'Dimension mismatch between input image and offsets'
             )
 
-    num_offsets = offsets.shape[0]
-
     # scale input intensity image
     im_input = im_input.astype('float')
     im_input -= gray_limits[0]
@@ -149,6 +161,24 @@ def graycomatrixext(im_input, im_roi_mask=None,
     im_input *= (num_levels - 1)
     im_input = np.round(im_input).astype('int')
 
+    if _graycomatrixext_cython is not None and num_dims == 2:
+
+        return _graycomatrixext_cython(
+            np.ascontiguousarray(im_input, dtype=np.int64),
+            np.ascontiguousarray(im_roi_mask, dtype=np.uint8),
+            np.ascontiguousarray(offsets, dtype=np.int64),
+            num_levels, symmetric, normed, exclude_boundary)
+
+    return _graycomatrixext_numpy(im_input, im_roi_mask, offsets, num_levels,
+                                  symmetric, normed, exclude_boundary)
+
+
+def _graycomatrixext_numpy(im_input, im_roi_mask, offsets, num_levels,
+                           symmetric, normed, exclude_boundary):
+
+    num_dims = len(im_input.shape)
+    num_offsets = offsets.shape[0]
+
     # compute glcm for each offset
     glcm = np.zeros((num_levels, num_levels, num_offsets))
 
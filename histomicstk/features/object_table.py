@@ -0,0 +1,246 @@
+import threading
+
+import numpy as np
+from skimage.measure import regionprops
+from skimage.segmentation import find_boundaries
+
+from ._label_statistics import label_pixel_index
+
+
+class ObjectTable(object):
+    """Per-image index of the objects of a labeled mask image.
+
+    The properties of the objects needed by the feature functions, i.e.
+    bounding boxes, the pixels of each object and the boundaries of each
+    object, are derived once and shared by all feature functions that are
+    given the same object table. Properties other than the bounding boxes
+    are computed on first use and cached, such that the object table can be
+    shared by feature functions running in parallel threads.
+
+    Parameters
+    ----------
+    im_label : array_like
+        A labeled mask image wherein intensity of a pixel is the ID of the
+        object it belongs to. Non-zero values are considered to be foreground
+        objects.
+
+    rprops : output of skimage.measure.regionprops, optional
+        rprops = skimage.measure.regionprops( im_label ). If rprops is not
+        passed then it will be computed inside.
+
+    Attributes
+    ----------
+    im_label : array_like
+        The labeled mask image.
+
+    rprops : output of skimage.measure.regionprops
+        The region properties of the objects. Features of the objects are
+        computed in this order.
+
+    labels : array_like
+        A num_objects array of the label of each object.
+
+    bbox : array_like
+        A num_objects x (2 * num_dims) array of the bounding box of each
+        object as (min_row, min_col, max_row, max_col) for 2D images.
+
+    See Also
+    --------
+    histomicstk.features.compute_nuclei_features
+
+    """
+
+    def __init__(self, im_label, rprops=None):
+
+        if rprops is None:
+            rprops = regionprops(im_label)
+
+        self.im_label = im_label
+        self.rprops = rprops
+
+        self.labels = np.array([prop.label for prop in rprops],
+                               dtype=np.int64)
+
+        self.bbox = np.array([prop.bbox for prop in rprops],
+                             dtype=np.int64).reshape(
+                                 len(rprops), 2 * im_label.ndim)
+
+        self._lock = threading.Lock()
+        self._pixel_index = None
+        self._boundaries = {}
+
+    def __len__(self):
+
+        return len(self.rprops)
+
+    def pixel_index(self):
+        """Get the linear indices of the pixels of all objects.
+
+        Returns
+        -------
+        pixel_ind : array_like
+            Linear indices into `im_label` of the pixels of all objects. The
+            pixels of the i-th object are
+            `pixel_ind[offsets[i]:offsets[i+1]]`.
+
+        offsets : array_like
+            A (num_objects + 1) array of the start of the pixels of each
+            object.
+
+        """
+        with self._lock:
+
+            if self._pixel_index is None:
+                self._pixel_index = label_pixel_index(self.im_label,
+                                                      self.rprops)
+
+            return self._pixel_index
+
+    def pixel_values(self, im_input):
+        """Get the values of an image at the pixels of all objects.
+
+        Parameters
+        ----------
+        im_input : array_like
+            An image of the same shape as `im_label`.
+
+        Returns
+        -------
+        values : array_like
+            Values of the pixels of all objects grouped by object.
+
+        offsets : array_like
+            A (num_objects + 1) array of the start of the values of each
+            object.
+
+        """
+        pixel_ind, offsets = self.pixel_index()
+
+        return np.ravel(im_input)[pixel_ind], offsets
+
+    def crop(self, i, delta=0):
+        """Get the slices of the bounding box of an object.
+
+        Parameters
+        ----------
+        i : int
+            Position of the object.
+
+        delta : int, optional
+            Number of pixels by which the bounding box is extended on each
+            side. The bounding box is clipped to the image. Default is 0.
+
+        Returns
+        -------
+        slices : tuple of slice
+            Slices of the bounding box such that `im[slices]` is a view of
+            the bounding box of the object in an image `im`.
+
+        """
+        num_dims = self.im_label.ndim
+
+        bbox_min = np.maximum(self.bbox[i, :num_dims] - delta, 0)
+        bbox_max = np.minimum(self.bbox[i, num_dims:] + delta,
+                              self.im_label.shape)
+
+        return tuple(slice(start, stop)
+                     for start, stop in zip(bbox_min, bbox_max))
+
+    def crop_mask(self, i, delta=0):
+        """Get the mask of an object within its bounding box.
+
+        Parameters
+        ----------
+        i : int
+            Position of the object.
+
+        delta : int, optional
+            Number of pixels by which the bounding box is extended on each
+            side. Default is 0.
+
+        Returns
+        -------
+        mask : array_like
+            A boolean mask of the pixels of the object within the slices
+            returned by `crop`.
+
+        """
+        return self.im_label[self.crop(i, delta)] == self.labels[i]
+
+    def boundaries(self, delta=0):
+        """Get the inner boundary pixels of all objects of a 2D image.
+
+        The boundary of each object is found within its bounding box extended
+        by `delta` pixels on each side and clipped to all but the last row and
+        column of the image, as done by
+        `histomicstk.features.compute_fsd_features`.
+
+        Parameters
+        ----------
+        delta : int, optional
+            Number of pixels by which the bounding boxes are extended.
+            Default is 0.
+
+        Returns
+        -------
+        bounds : array_like
+            A num_boundary_points x 2 array of the (row, column) coordinates
+            of the boundary pixels of all objects relative to their extended
+            bounding boxes. The boundary pixels of the i-th object are
+            `bounds[offsets[i]:offsets[i+1]]` in raster order.
+
+        offsets : array_like
+            A (num_objects + 1) array of the start of the boundary pixels of
+            each object.
+
+        """
+        with self._lock:
+
+            if delta not in self._boundaries:
+                self._boundaries[delta] = self._find_boundaries(delta)
+
+            return self._boundaries[delta]
+
+    def _find_boundaries(self, delta):
+
+        sizex, sizey = self.im_label.shape[:2]
+
+        crop_min = np.maximum(self.bbox[:, :2] - delta, 0)
+        crop_max = np.minimum(self.bbox[:, 2:] + delta, [sizex - 1, sizey - 1])
+
+        # an inner boundary pixel of an object has a 4-neighbor outside of
+        # the object, hence the boundaries of all objects can be found at
+        # once in the whole image
+        im_bounds = find_boundaries(self.im_label, mode="inner")
+
+        bound_ind, offsets = label_pixel_index(
+            np.where(im_bounds, self.im_label, 0), self.rprops)
+
+        counts = np.diff(offsets)
+
+        bounds = np.column_stack(np.unravel_index(bound_ind, (sizex, sizey)))
+        bounds -= np.repeat(crop_min, counts, axis=0)
+
+        # the boundaries found in the whole image are those found in the crop
+        # unless the object touches an edge of the crop within the image
+        no_margin = (
+            np.any((crop_min > 0) & (crop_min >= self.bbox[:, :2]), axis=1) |
+            np.any(crop_max <= self.bbox[:, 2:], axis=1))
+
+        if not np.any(no_margin):
+            return bounds, offsets
+
+        bounds = np.split(bounds, offsets[1:-1])
+
+        for i in np.flatnonzero(no_margin):
+
+            lmask = self.im_label[crop_min[i, 0]:crop_max[i, 0],
+                                  crop_min[i, 1]:crop_max[i, 1]]
+
+            bounds[i] = np.argwhere(
+                find_boundaries(lmask == self.labels[i], mode="inner"))
+
+        offsets = np.zeros(len(bounds) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in bounds], out=offsets[1:])
+
+        return np.concatenate(bounds).astype(np.int64), offsets
@@ -1,9 +1,15 @@
+import collections
+from multiprocessing.pool import ThreadPool
+import threading
+
 import numpy as np
 import scipy.ndimage as ndi
+from scipy.fftpack import next_fast_len
 from skimage import morphology
 
 
-def glog(im_input, alpha=1, range=None, theta=np.pi/4, tau=0.6, eps=0.6):
+def glog(im_input, alpha=1, range=None, theta=np.pi/4, tau=0.6, eps=0.6,
+         num_threads=1):
     """Performs generalized Laplacian of Gaussian blob detection.
 
     Parameters
@@ -22,6 +28,9 @@ def glog(im_input, alpha=1, range=None, theta=np.pi/4, tau=0.6, eps=0.6):
         Tolerance for counting pixels in determining optimal scale SigmaC
     eps : double
         range to define SigmaX surrounding SigmaC
+    num_threads : int, optional
+        Number of threads across which the circular LoG responses and the
+        gLoG kernels are computed. Default value = 1.
 
     Returns
     -------
@@ -34,6 +43,10 @@ def glog(im_input, alpha=1, range=None, theta=np.pi/4, tau=0.6, eps=0.6):
     -----
     Return values are returned as a namedtuple
 
+    The sum of the filter responses is the response of the sum of the
+    filters, which is computed once per filter bank and cached, and applied
+    by FFT.
+
     References
     ----------
     .. [#] H. Kong, H.C. Akakin, S.E. Sarma, "A Generalized Laplacian of
@@ -42,60 +55,54 @@ def glog(im_input, alpha=1, range=None, theta=np.pi/4, tau=0.6, eps=0.6):
 
     """
     range = np.linspace(1.5, 3, int(np.round((3 - 1.5) / 0.2)) + 1) if range is None else range
+    range = np.asarray(range, dtype=float)
+
+    im_input = np.asarray(im_input, dtype=float)
 
     # initialize sigma
     Sigma = np.exp(range)
 
     # generate circular LoG scale-space to determine range of SigmaX
-    l_g = 0
-    H = []
-    Bins = []
-    Min = np.zeros((len(Sigma), 1))
-    Max = np.zeros((len(Sigma), 1))
-    for i, s in enumerate(Sigma):
+    def scale_histogram(s):
+
         Response = s**2 * ndi.filters.gaussian_laplace(im_input, s, output=None,
                                                        mode='constant',
                                                        cval=0.0)
-        Min[i] = Response.min()
-        Max[i] = Response.max()
-        Bins.append(np.arange(0.01 * np.floor(Min[i] / 0.01),
-                    0.01 * np.ceil(Max[i] / 0.01) + 0.01, 0.01))
-        Hist = np.histogram(Response, Bins[i])
-        H.append(Hist[0])
-        if Max[i] > l_g:
-            l_g = Max[i]
+        Min = Response.min()
+        Max = Response.max()
+        Bins = np.arange(0.01 * np.floor(Min / 0.01),
+                         0.01 * np.ceil(Max / 0.01) + 0.01, 0.01)
+        Hist = np.histogram(Response, Bins)
+
+        return Min, Max, Bins, Hist[0]
+
+    Scales = _map(scale_histogram, Sigma, num_threads)
+
+    l_g = max(0, max(Max for Min, Max, Bins, H in Scales))
 
     # re-normalized based on global max and local min, count threshold pixels
     Zeta = np.zeros((len(Sigma), 1))
-    for i, s in enumerate(Sigma):
-        Bins[i] = (Bins[i] - Min[i]) / (l_g - Min[i])
-        Zeta[i] = np.sum(H[i][Bins[i][0:-1] > tau])
+    for i, (Min, Max, Bins, H) in enumerate(Scales):
+        Bins = (Bins - Min) / (l_g - Min)
+        Zeta[i] = np.sum(H[Bins[0:-1] > tau])
 
     # identify best scale SigmaC based on maximum circular response
     Index = np.argmax(Zeta)
 
     # define range for SigmaX
-    XRange = range(max(Index-2, 0), min(len(range), Index + 2) + 1)
-    SigmaX = np.exp(range[XRange])
+    XRange = np.arange(max(Index - 2, 0), min(len(range), Index + 3))
 
     # define rotation angles
     Thetas = np.linspace(0, np.pi - theta, int(np.round(np.pi / theta)))
 
-    # loop over SigmaX, SigmaY and then angle, summing up filter responses
-    Rsum = np.zeros(im_input.shape)
-    for i, Sx in enumerate(SigmaX):
-        YRange = range(0, XRange[i])
-        SigmaY = np.exp(range[YRange])
-        for Sy in SigmaY:
-            for Th in Thetas:
-                Kernel = glogkernel(Sx, Sy, Th)
-                Kernel *= (1 + np.log(Sx) ** alpha) * (1 + np.log(Sy) ** alpha)
-                Rsum += ndi.convolve(im_input, Kernel, mode='constant', cval=0.0)
-                print(Sx, Sy, Th)
-        Kernel = glogkernel(Sx, Sx, 0)
-        Kernel *= (1 + np.log(Sx) ** alpha) * (1 + np.log(Sx) ** alpha)
-        Rsum += ndi.convolve(im_input, Kernel, mode='constant', cval=0.0)
-        print(Sx, Sx, 0)
+    # sum up filter responses over SigmaX, SigmaY and angle, as the response
+    # of the sum of the filters
+    key = (tuple(range), tuple(XRange), tuple(Thetas), alpha)
+
+    Kernel = _glog_bank_kernel(key, range, XRange, Thetas, alpha,
+                               num_threads)
+
+    Rsum = _fft_convolve(im_input, Kernel, key)
 
     # detect local maxima
     Disk = morphology.disk(3 * np.exp(range[Index]))
@@ -121,3 +128,122 @@ def glogkernel(sigma_x, sigma_y, theta):
     Gaussian = np.exp(-(a*X**2 + 2*b*X*Y + c*Y**2))
     Kernel = (D2Gxx + D2Gyy) / np.sum(Gaussian.flatten())
     return Kernel
+
+
+def _map(func, iterable, num_threads=1):
+    """Map a function over an iterable, in parallel threads if asked."""
+
+    iterable = list(iterable)
+
+    if num_threads > 1 and len(iterable) > 1:
+
+        pool = ThreadPool(min(num_threads, len(iterable)))
+
+        try:
+            return pool.map(func, iterable)
+        finally:
+            pool.close()
+
+    return [func(item) for item in iterable]
+
+
+# summed kernels of the filter banks most recently used in this process,
+# and their spectra for the padded image shapes they were applied to, up to
+# a total size in bytes as the spectra of large tiles take hundreds of MB
+_bank_cache = collections.OrderedDict()
+_bank_cache_lock = threading.Lock()
+_bank_cache_nbytes = 0
+_BANK_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+
+def _cached(key, func):
+    """Get a value of the filter bank cache, computing it on a miss.
+
+    The least recently used values are evicted once the cache holds more
+    than _BANK_CACHE_MAX_BYTES, such that values larger than that are not
+    cached at all.
+    """
+    global _bank_cache_nbytes
+
+    with _bank_cache_lock:
+
+        if key in _bank_cache:
+
+            value = _bank_cache.pop(key)
+            _bank_cache[key] = value
+
+            return value
+
+    value = func()
+
+    with _bank_cache_lock:
+
+        if key in _bank_cache:
+            _bank_cache_nbytes -= _bank_cache.pop(key).nbytes
+
+        _bank_cache[key] = value
+        _bank_cache_nbytes += value.nbytes
+
+        while _bank_cache_nbytes > _BANK_CACHE_MAX_BYTES:
+            _bank_cache_nbytes -= _bank_cache.popitem(last=False)[1].nbytes
+
+    return value
+
+
+def _glog_bank_kernel(key, range, XRange, Thetas, alpha, num_threads=1):
+    """Sum of the weighted gLoG kernels of all (SigmaX, SigmaY, Theta)
+    triples of glog, centered in an odd-sized array and cached under
+    `key`.
+    """
+
+    def build():
+
+        # weighted kernels of all triples, the circular one last for each
+        # SigmaX
+        params = []
+        for Xi in XRange:
+            Sx = np.exp(range[Xi])
+            for Sy in np.exp(range[0:Xi]):
+                params.extend((Sx, Sy, Th) for Th in Thetas)
+            params.append((Sx, Sx, 0))
+
+        def weighted_kernel(param):
+            Sx, Sy, Th = param
+            Kernel = glogkernel(Sx, Sy, Th)
+            Kernel *= (1 + np.log(Sx) ** alpha) * (1 + np.log(Sy) ** alpha)
+            return Kernel
+
+        Kernels = _map(weighted_kernel, params, num_threads)
+
+        # align the centers of the kernels, as used by ndi.convolve
+        size = max(K.shape[0] for K in Kernels) // 2 * 2 + 1
+        Bank = np.zeros((size, size))
+        for K in Kernels:
+            start = size // 2 - K.shape[0] // 2
+            Bank[start:start + K.shape[0], start:start + K.shape[1]] += K
+
+        return Bank
+
+    return _cached(('kernel', key), build)
+
+
+def _fft_convolve(im_input, Kernel, key):
+    """Convolve an image with an odd-sized kernel by FFT, with zero padding
+    like ndi.convolve with mode='constant' and cval=0.
+
+    The spectrum of the kernel is cached under `key` for the padded shape,
+    such that only the image is transformed when tiles of the same size are
+    filtered.
+
+    """
+    half = Kernel.shape[0] // 2
+
+    shape = tuple(next_fast_len(n + 2 * half) for n in im_input.shape)
+
+    Spectrum = _cached(('spectrum', key, shape),
+                       lambda: np.fft.rfft2(Kernel, shape))
+
+    Response = np.fft.irfft2(np.fft.rfft2(im_input, shape) * Spectrum, shape)
+
+    return Response[half:half + im_input.shape[0],
+                    half:half + im_input.shape[1]]
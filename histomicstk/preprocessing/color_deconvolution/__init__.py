@@ -19,6 +19,10 @@ from .color_deconvolution import color_deconvolution
 from .color_deconvolution import stain_unmixing_routine
 from .color_deconvolution import color_deconvolution_routine
 from .color_deconvolution import _reorder_stains
+from .fused_color_deconvolution import fused_color_deconvolution
+from .slide_separate_stains import compute_slide_sda_statistics
+from .slide_separate_stains import slide_separate_stains_macenko_pca
+from .slide_separate_stains import slide_separate_stains_xu_snmf
 
 #: A dictionary of names for reference stain vectors
 stain_color_map = _stain_color_map.stain_color_map
@@ -29,6 +33,7 @@ __all__ = (
     # functions, classes, and constants of this package
     'color_convolution',
     'color_deconvolution',
+    'fused_color_deconvolution',
     'stain_unmixing_routine',
     'color_deconvolution_routine',
     'complement_stain_matrix',
@@ -37,6 +42,9 @@ __all__ = (
     'separate_stains_xu_snmf',
     'rgb_separate_stains_macenko_pca',
     'rgb_separate_stains_xu_snmf',
+    'compute_slide_sda_statistics',
+    'slide_separate_stains_macenko_pca',
+    'slide_separate_stains_xu_snmf',
     'stain_color_map',
     '_reorder_stains',
 )
@@ -0,0 +1,137 @@
+import numpy as np
+
+from histomicstk.preprocessing import color_conversion
+from ._linalg import normalize
+from .complement_stain_matrix import complement_stain_matrix
+
+
+def fused_color_deconvolution(im_rgb, w, I_0=None, channels=None,
+                              dtype=np.uint8, out=None, block_size=65536):
+    """Perform color deconvolution of selected stains of an 8-bit RGB image.
+
+    Computes the same stain images as
+    `histomicstk.preprocessing.color_deconvolution.color_deconvolution`
+    but fuses all steps in a single pass over blocks of rows of the image in
+    single precision. The optical density of each channel is looked up in a
+    256-entry table premultiplied by the inverse stain matrix, hence only the
+    requested stains are computed and no full-size floating point copy of the
+    image is allocated.
+
+    Parameters
+    ----------
+    im_rgb : array_like
+        Input RGB image of type uint8 that needs to be deconvolved.
+    w : array_like
+        A 3x3 matrix containing the color vectors in columns.
+        For two stain images the third column is zero and will be
+        complemented using cross-product. Atleast two of the three
+        columns must be non-zero.
+    I_0 : float or array_like, optional
+        A float a 3-vector containing background RGB intensities.
+        If unspecified, use the old OD conversion.
+    channels : list of int, optional
+        Indices of the columns of the stain matrix `w` of the stains to
+        compute, e.g. [0] for the first stain only. Default is all stains.
+    dtype : {np.uint8, np.float32}, optional
+        Type of the output. If np.uint8, the stain images are clipped to
+        [0, 255] as the `Stains` output of `color_deconvolution`. If
+        np.float32, they are unbounded as its `StainsFloat` output. Default
+        is np.uint8.
+    out : array_like, optional
+        An m x n x len(channels) array of type `dtype` in which the stain
+        images are stored, e.g. to reuse the output buffer across tiles.
+    block_size : int, optional
+        Approximate number of pixels processed at once, which bounds the
+        size of the temporary buffers. Default is 65536.
+
+    Returns
+    -------
+    im_stains : array_like
+        An m x n x len(channels) image where each channel contains the image
+        of the corresponding stain in `channels`.
+
+    Notes
+    -----
+    The stain images are computed in single precision, such that pixels
+    close to an integer intensity may differ by one intensity level from
+    the `Stains` output of `color_deconvolution`.
+
+    See Also
+    --------
+    histomicstk.preprocessing.color_deconvolution.color_deconvolution
+
+    """
+    im_rgb = np.asarray(im_rgb)
+
+    if im_rgb.dtype != np.uint8:
+        raise ValueError('im_rgb must be of type uint8')
+
+    dtype = np.dtype(dtype)
+
+    if dtype not in (np.uint8, np.float32):
+        raise ValueError('dtype must be np.uint8 or np.float32')
+
+    if channels is None:
+        channels = [0, 1, 2]
+
+    height, width = im_rgb.shape[:2]
+
+    if out is None:
+        out = np.empty((height, width, len(channels)), dtype=dtype)
+    elif out.shape != (height, width, len(channels)) or out.dtype != dtype:
+        raise ValueError('out must be a %d x %d x %d array of type %s' % (
+            height, width, len(channels), dtype))
+
+    # complement stain matrix if needed
+    if np.linalg.norm(w[:, 2]) <= 1e-16:
+        wc = complement_stain_matrix(w)
+    else:
+        wc = w
+
+    # normalize stains to unit-norm and invert stain matrix
+    Q = np.linalg.inv(normalize(wc))
+
+    # SDA value of each 8-bit intensity of each channel
+    im_levels = np.repeat(np.arange(256), 3).reshape(256, 1, 3)
+
+    with np.errstate(divide='ignore'):
+        sda_lut = color_conversion.rgb_to_sda(im_levels, I_0).reshape(256, 3)
+
+    # sda_to_rgb computes I ** (1 - sda / 255) - od, which is evaluated as
+    # exp(log(I) - sum_c Q[k, c] * sda_c * log(I) / 255) - od
+    od = I_0 is None
+    log_I = np.log(256 if od else 255)
+
+    stain_luts = [
+        (-log_I / 255.0 * Q[k] * sda_lut).T.astype(np.float32)
+        for k in channels]
+
+    block_rows = max(1, block_size // max(width, 1))
+
+    buf = np.empty((block_rows, width), dtype=np.float32)
+
+    for start in range(0, height, block_rows):
+
+        stop = min(start + block_rows, height)
+
+        im_block = im_rgb[start:stop]
+        acc = buf[:stop - start]
+
+        for j, lut in enumerate(stain_luts):
+
+            np.take(lut[0], im_block[..., 0], out=acc, mode='clip')
+            acc += np.take(lut[1], im_block[..., 1], mode='clip')
+            acc += np.take(lut[2], im_block[..., 2], mode='clip')
+
+            acc += log_I
+            np.exp(acc, out=acc)
+
+            if od:
+                acc -= 1
+
+            if dtype == np.uint8:
+                np.clip(acc, 0, 255, out=acc)
+
+            out[start:stop, :, j] = acc
+
+    return out
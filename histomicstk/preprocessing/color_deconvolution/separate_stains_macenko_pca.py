@@ -81,6 +81,17 @@ def separate_stains_macenko_pca(
 
     # Principal components matrix
     pcs = linalg.get_principal_components(m)
+
+    return _get_stain_matrix(pcs, m, minimum_magnitude,
+                             min_angle_percentile, max_angle_percentile)
+
+
+def _get_stain_matrix(pcs, m, minimum_magnitude,
+                      min_angle_percentile, max_angle_percentile):
+    """Compute the stain matrix from the principal components `pcs` and the
+    angle distribution of the pixels of the 3xN SDA matrix `m`.
+    """
+
     # Input pixels projected into the PCA plane
     proj = pcs.T[:-1].dot(m)
     # Pixels above the magnitude threshold
@@ -0,0 +1,293 @@
+import dask
+import numpy
+
+import histomicstk.utils as utils
+from histomicstk.utils.sample_pixels import (
+    _broadcast_to_workers, _get_foreground_tiles, _get_tile_fgnd_mask)
+from ..color_conversion import rgb_to_sda
+from .separate_stains_macenko_pca import _get_stain_matrix
+from .separate_stains_xu_snmf import separate_stains_xu_snmf
+
+
+def compute_slide_sda_statistics(slide_path, I_0, magnification=None,
+                                 tissue_seg_mag=1.25, min_coverage=0.1,
+                                 sample_fraction=1.0, sample_size=100000,
+                                 tile_grouping=256, seed=None):
+    """Compute statistics of the SDA values of the tissue pixels of a slide.
+
+    The tiles of the slide that contain tissue are streamed in groups, and
+    the statistics of each group are merged pairwise in a tree, such that
+    only the statistics, and never the pixels of the whole slide, are held
+    in memory.
+
+    Parameters
+    ----------
+    slide_path : str
+        path and filename of slide.
+    I_0 : float or array_like
+        Per-channel background intensities, or one intensity to use for all
+        channels if a float.
+    magnification : double, optional
+        Desired magnification for sampling.
+        Default value : None (for native scan magnification).
+    tissue_seg_mag : double, optional
+        low resolution magnification at which foreground will be segmented.
+        Default value = 1.25.
+    min_coverage : double, optional
+        minimum fraction of tile covered by tissue for it to be included.
+        Ranges between [0,1). Default value = 0.1.
+    sample_fraction : double, optional
+        Fraction of the tissue pixels of each tile that are used. Must be in
+        the range (0, 1]. Default value = 1.
+    sample_size : int, optional
+        Number of pixels kept in the uniform random sample of the used
+        pixels. Default value = 100000.
+    tile_grouping : int, optional
+        Number of tiles to process as part of a single task.
+    seed : int, optional
+        Seed of the random number generator used for the foreground
+        segmentation and for sampling.
+
+    Returns
+    -------
+    num_pixels : int
+        Number of used pixels with finite SDA values.
+    scatter : array_like
+        A 3x3 matrix of the sum of the outer products of the SDA values of
+        the used pixels with themselves.
+    sample : array_like
+        A 3xK matrix of the SDA values of a uniform random sample of
+        K = min(sample_size, num_pixels) of the used pixels.
+
+    Notes
+    -----
+    If Dask is configured, it is used to distribute the computation.
+
+    See Also
+    --------
+    histomicstk.preprocessing.color_deconvolution.slide_separate_stains_macenko_pca,
+    histomicstk.preprocessing.color_deconvolution.slide_separate_stains_xu_snmf,
+    histomicstk.utils.sample_pixels
+
+    """
+    rng = numpy.random.RandomState(seed)
+
+    iter_args, tile_positions, im_fgnd_mask_lres = _get_foreground_tiles(
+        slide_path, magnification, tissue_seg_mag, min_coverage,
+        seed=rng.randint(2 ** 31))
+
+    im_fgnd_mask_lres = _broadcast_to_workers(im_fgnd_mask_lres)
+
+    num_tasks = -(-len(tile_positions) // tile_grouping)
+
+    # seeds of the tasks computing and merging statistics
+    seeds = iter(rng.randint(2 ** 31, size=2 * num_tasks))
+
+    stats = [
+        dask.delayed(_compute_tiles_sda_statistics)(
+            slide_path, iter_args, tile_positions[i:i + tile_grouping],
+            I_0, sample_fraction, sample_size, tissue_seg_mag,
+            im_fgnd_mask_lres, next(seeds))
+        for i in range(0, len(tile_positions), tile_grouping)
+    ]
+
+    # merge the statistics in a tree
+    while len(stats) > 1:
+
+        merged = [
+            dask.delayed(_merge_sda_statistics)(
+                stats[i], stats[i + 1], sample_size, next(seeds))
+            for i in range(0, len(stats) - 1, 2)
+        ]
+
+        if len(stats) % 2:
+            merged.append(stats[-1])
+
+        stats = merged
+
+    if not stats:
+        print("Sampling could not identify any foreground regions.")
+        return _empty_sda_statistics()
+
+    return stats[0].compute()
+
+
+def slide_separate_stains_macenko_pca(
+        slide_path, I_0, minimum_magnitude=16, min_angle_percentile=0.01,
+        max_angle_percentile=0.99, **kwargs):
+    """Compute the stain matrix of a slide with the Macenko method.
+
+    The principal components are those of all used tissue pixels of the
+    slide and the angle distribution is that of a random sample of them, as
+    computed by `compute_slide_sda_statistics`.
+
+    Parameters
+    ----------
+    slide_path : str
+        path and filename of slide.
+    I_0 : float or array_like
+        Per-channel background intensities, or one intensity to use for all
+        channels if a float.
+    minimum_magnitude : float
+        The magnitude below which vectors will be excluded from the computation
+        of the angle distribution.
+    min_angle_percentile : float
+        The smaller percentile of one of the vectors to pick from the angle
+        distribution
+    max_angle_percentile : float
+        The larger percentile of one of the vectors to pick from the angle
+        distribution
+    kwargs : k,v pairs
+        Passed as-is to compute_slide_sda_statistics().
+
+    Returns
+    -------
+    w : array_like
+        A 3x3 matrix of stain column vectors
+
+    See Also
+    --------
+    histomicstk.preprocessing.color_deconvolution.separate_stains_macenko_pca,
+    histomicstk.preprocessing.color_deconvolution.compute_slide_sda_statistics
+
+    """
+    _, scatter, sample = _compute_nonempty_sda_statistics(
+        slide_path, I_0, **kwargs)
+
+    # the principal components are the eigenvectors of the scatter matrix
+    pcs = numpy.linalg.svd(scatter)[0]
+
+    return _get_stain_matrix(pcs, sample, minimum_magnitude,
+                             min_angle_percentile, max_angle_percentile)
+
+
+def slide_separate_stains_xu_snmf(slide_path, I_0, w_init=None, beta=0.2,
+                                  **kwargs):
+    """Compute the stain matrix of a slide with SNMF.
+
+    The factorization is computed on a random sample of the tissue pixels of
+    the slide, as computed by `compute_slide_sda_statistics`.
+
+    Parameters
+    ----------
+    slide_path : str
+        path and filename of slide.
+    I_0 : float or array_like
+        Per-channel background intensities, or one intensity to use for all
+        channels if a float.
+    w_init : array_like, default is None
+        Initial value for the stain matrix.  if not provided, default
+        initialization is used.
+    beta : float
+        Regularization factor for the sparsity of the deconvolved pixels
+    kwargs : k,v pairs
+        Passed as-is to compute_slide_sda_statistics().
+
+    Returns
+    -------
+    w : array_like
+        A 3x3 matrix of stain column vectors
+
+    See Also
+    --------
+    histomicstk.preprocessing.color_deconvolution.separate_stains_xu_snmf,
+    histomicstk.preprocessing.color_deconvolution.compute_slide_sda_statistics
+
+    """
+    _, _, sample = _compute_nonempty_sda_statistics(slide_path, I_0, **kwargs)
+
+    return separate_stains_xu_snmf(sample, w_init=w_init, beta=beta)
+
+
+def _compute_nonempty_sda_statistics(slide_path, I_0, **kwargs):
+    """Call compute_slide_sda_statistics and check that its sample is not
+    empty.
+    """
+    stats = compute_slide_sda_statistics(slide_path, I_0, **kwargs)
+
+    if stats[2].shape[1] == 0:
+        raise ValueError('No foreground pixels sampled.')
+
+    return stats
+
+
+def _empty_sda_statistics():
+
+    return 0, numpy.zeros((3, 3)), numpy.zeros((3, 0))
+
+
+def _compute_tiles_sda_statistics(slide_path, iter_args, positions, I_0,
+                                  sample_fraction, sample_size,
+                                  tissue_seg_mag, im_fgnd_mask_lres, seed):
+    """Compute the SDA statistics of the tissue pixels of a group of
+    tiles.
+    """
+
+    rng = numpy.random.RandomState(seed)
+
+    stats = _empty_sda_statistics()
+
+    ts = utils.get_tile_source(slide_path)
+
+    for position in positions:
+
+        tile = ts.getSingleTile(tile_position=position, **iter_args)
+
+        im_tile = tile['tile'][:, :, :3]
+
+        tile_fgnd_mask = _get_tile_fgnd_mask(
+            ts, tile, im_tile.shape[:2], tissue_seg_mag, im_fgnd_mask_lres)
+
+        # RGB values of the used tissue pixels
+        pixels = im_tile[tile_fgnd_mask.astype(bool)]
+
+        if sample_fraction < 1 and len(pixels):
+
+            num_used = int(round(sample_fraction * len(pixels)))
+
+            # sample with replacement like sample_pixels, which does not
+            # permute all the pixels of the tile
+            pixels = pixels[rng.randint(len(pixels), size=num_used)]
+
+        m = utils.exclude_nonfinite(rgb_to_sda(pixels.T, I_0))
+
+        num_pixels = m.shape[1]
+
+        tile_sample = m[:, rng.choice(num_pixels, min(sample_size, num_pixels),
+                                      replace=False)]
+
+        stats = _merge_sda_statistics(
+            stats, (num_pixels, m.dot(m.T), tile_sample), sample_size, rng)
+
+    return stats
+
+
+def _merge_sda_statistics(stats1, stats2, sample_size, seed):
+    """Merge the SDA statistics of two disjoint sets of pixels.
+
+    The sample of the merged statistics is a uniform random sample of the
+    union of the pixels, drawn by choosing how many of its pixels come from
+    each set from the hypergeometric distribution.
+
+    """
+    rng = (seed if isinstance(seed, numpy.random.RandomState)
+           else numpy.random.RandomState(seed))
+
+    num1, scatter1, sample1 = stats1
+    num2, scatter2, sample2 = stats2
+
+    num_sample = min(sample_size, num1 + num2)
+
+    if num_sample == 0:
+        return num1 + num2, scatter1 + scatter2, sample1[:, :0]
+
+    num_sample1 = rng.hypergeometric(num1, num2, num_sample) \
+        if num1 and num2 else min(num1, num_sample)
+
+    sample = numpy.concatenate([
+        sample1[:, rng.choice(sample1.shape[1], num_sample1, replace=False)],
+        sample2[:, rng.choice(sample2.shape[1], num_sample - num_sample1,
+                              replace=False)],
+    ], axis=1)
+
+    return num1 + num2, scatter1 + scatter2, sample
@@ -4,6 +4,8 @@
 # since we mostly have one function per file
 from .background_intensity import background_intensity
 from .reinhard import reinhard
+from .reinhard_lut import (
+    reinhard_lut, apply_reinhard_lut, reinhard_lut_accuracy)
 from .reinhard_stats import reinhard_stats
 from .deconvolution_based_normalization import (
     deconvolution_based_normalization)
@@ -14,6 +16,9 @@ __all__ = (
     # functions and classes of this package
     'background_intensity',
     'reinhard',
+    'reinhard_lut',
+    'apply_reinhard_lut',
+    'reinhard_lut_accuracy',
     'reinhard_stats',
     'deconvolution_based_normalization',
 )
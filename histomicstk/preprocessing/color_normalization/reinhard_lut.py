@@ -0,0 +1,347 @@
+import collections
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from histomicstk.preprocessing import color_conversion
+
+# LUTs most recently used in this process
+_lut_cache = collections.OrderedDict()
+_lut_cache_lock = threading.Lock()
+_LUT_CACHE_SIZE = 4
+
+# version of the LUT layout, part of the key of LUTs cached on disk
+_LUT_VERSION = 1
+
+
+def reinhard_lut(target_mu, target_sigma, src_mu, src_sigma,
+                 grid_size=256, cache_dir=None):
+    """Precompute Reinhard color normalization as a 3D RGB lookup table.
+
+    Once the LAB statistics of the source and target images are fixed,
+    Reinhard color normalization is a function of the RGB value of a pixel
+    only. This function evaluates it at the nodes of a regular grid over the
+    RGB cube such that normalizing an image with `apply_reinhard_lut` is a
+    table lookup instead of a round trip through LAB color space.
+
+    Parameters
+    ----------
+    target_mu : array_like
+        A 3-element array containing the means of the target image channels
+        in LAB color space.
+
+    target_sigma : array_like
+        A 3-element array containing the standard deviations of the target
+        image channels in LAB color space.
+
+    src_mu : array_like
+        A 3-element array containing the means of the source image channels
+        in LAB color space.
+
+    src_sigma : array_like
+        A 3-element array containing the standard deviations of the source
+        image channels in LAB color space.
+
+    grid_size : int, optional
+        Number of grid nodes along each RGB axis. The default value of 256
+        tabulates every 8-bit RGB value, which takes 48 MB and reproduces
+        `reinhard` exactly. Smaller values, e.g. 33, give a quantized table
+        whose nodes are evenly spaced between 0 and 255 and which is
+        trilinearly interpolated by `apply_reinhard_lut`.
+
+    cache_dir : str, optional
+        If given, the table is cached in this directory in a file named
+        after a hash of the parameters, such that processes sharing the
+        directory compute it only once. Tables are also cached in memory.
+
+    Returns
+    -------
+    lut : array_like
+        A grid_size x grid_size x grid_size x 3 array of the normalized RGB
+        value of each grid node, indexed by the red, green and blue grid
+        indices. The array is of type uint8 if `grid_size` is 256 and of type
+        float32 otherwise.
+
+    See Also
+    --------
+    histomicstk.preprocessing.color_normalization.reinhard,
+    histomicstk.preprocessing.color_normalization.apply_reinhard_lut,
+    histomicstk.preprocessing.color_normalization.reinhard_lut_accuracy
+
+    """
+    grid_size = int(grid_size)
+
+    if not 2 <= grid_size <= 256:
+        raise ValueError('grid_size must be between 2 and 256')
+
+    params = [np.asarray(p, dtype=np.float64).reshape(3)
+              for p in (target_mu, target_sigma, src_mu, src_sigma)]
+
+    key = hashlib.sha1(
+        np.array([_LUT_VERSION, grid_size], dtype=np.int64).tobytes() +
+        b''.join(p.tobytes() for p in params)).hexdigest()
+
+    with _lut_cache_lock:
+
+        if key in _lut_cache:
+
+            lut = _lut_cache.pop(key)
+            _lut_cache[key] = lut
+
+            return lut
+
+    lut = None
+
+    if cache_dir is not None:
+
+        lut_file = os.path.join(cache_dir, 'reinhard_lut_%s.npy' % key)
+
+        if os.path.isfile(lut_file):
+            lut = np.load(lut_file, mmap_mode='r')
+
+    if lut is None:
+
+        lut = _compute_reinhard_lut(grid_size, *params)
+
+        if cache_dir is not None:
+            _save_lut(lut, cache_dir, lut_file)
+
+    with _lut_cache_lock:
+
+        _lut_cache[key] = lut
+
+        while len(_lut_cache) > _LUT_CACHE_SIZE:
+            _lut_cache.popitem(last=False)
+
+    return lut
+
+
+def apply_reinhard_lut(im_src, lut):
+    """Perform Reinhard color normalization with a precomputed lookup table.
+
+    Parameters
+    ----------
+    im_src : array_like
+        An RGB image of type uint8.
+
+    lut : array_like
+        A lookup table computed by `reinhard_lut`.
+
+    Returns
+    -------
+    im_normalized : array_like
+        Color Normalized RGB image of type uint8.
+
+    See Also
+    --------
+    histomicstk.preprocessing.color_normalization.reinhard_lut
+
+    """
+    im_src = np.asarray(im_src)[..., :3]
+
+    if im_src.dtype != np.uint8:
+        raise ValueError('im_src must be of type uint8')
+
+    grid_size = lut.shape[0]
+
+    lut_flat = lut.reshape(-1, 3)
+
+    if grid_size == 256:
+
+        ind = ((im_src[..., 0].astype(np.intp) << 16) |
+               (im_src[..., 1].astype(np.intp) << 8) |
+               im_src[..., 2])
+
+        return np.take(lut_flat, ind, axis=0)
+
+    # position of the pixels in grid units and their lower grid node
+    pos = im_src.astype(np.float32) * np.float32((grid_size - 1) / 255.0)
+
+    node = np.minimum(pos.astype(np.intp), grid_size - 2)
+
+    frac = pos - node
+
+    ind = (node[..., 0] * grid_size + node[..., 1]) * grid_size + node[..., 2]
+
+    # weights of the lower and upper grid node along each axis
+    weights = [(1 - frac[..., i], frac[..., i]) for i in range(3)]
+
+    # trilinear interpolation between the 8 surrounding grid nodes
+    im_normalized = np.zeros(im_src.shape, dtype=np.float32)
+
+    for dr in (0, 1):
+        for dg in (0, 1):
+
+            weight_rg = weights[0][dr] * weights[1][dg]
+
+            for db in (0, 1):
+
+                offset = (dr * grid_size + dg) * grid_size + db
+
+                im_normalized += (weight_rg * weights[2][db])[..., None] * \
+                    np.take(lut_flat, ind + offset, axis=0)
+
+    np.clip(im_normalized, 0, 255, out=im_normalized)
+
+    return im_normalized.astype(np.uint8)
+
+
+def reinhard_lut_accuracy(lut, target_mu, target_sigma, src_mu, src_sigma,
+                          im_src=None):
+    """Compare Reinhard color normalization with a lookup table to `reinhard`.
+
+    Parameters
+    ----------
+    lut : array_like
+        A lookup table computed by `reinhard_lut`.
+
+    target_mu, target_sigma, src_mu, src_sigma : array_like
+        The LAB statistics the lookup table was computed with.
+
+    im_src : array_like, optional
+        An RGB image of type uint8 on which the two are compared. If not
+        given, they are compared on all 256^3 RGB values.
+
+    Returns
+    -------
+    report : dict
+        A dictionary with the following keys
+
+        num_values : int
+            Number of RGB values compared.
+        max_abs_error : int
+            Maximum absolute difference of a channel.
+        mean_abs_error : float
+            Mean absolute difference of the channels.
+        rmse : float
+            Root mean squared difference of the channels.
+        exact_fraction : float
+            Fraction of RGB values normalized to the same RGB value.
+
+    See Also
+    --------
+    histomicstk.preprocessing.color_normalization.reinhard_lut
+
+    """
+    if im_src is not None:
+        chunks = [np.asarray(im_src)[..., :3].reshape(1, -1, 3)]
+    else:
+        chunks = (_rgb_cube(range(r, r + 16))
+                  for r in range(0, 256, 16))
+
+    num_values = 0
+    max_abs_error = 0
+    sum_abs_error = 0.0
+    sum_sq_error = 0.0
+    num_exact = 0
+
+    for im_chunk in chunks:
+
+        im_float = _reinhard_float(im_chunk, target_mu, target_sigma,
+                                   src_mu, src_sigma).astype(np.uint8)
+
+        im_lut = apply_reinhard_lut(im_chunk, lut)
+
+        err = np.abs(im_float.astype(np.int64) - im_lut)
+
+        num_values += err.shape[0] * err.shape[1]
+        max_abs_error = max(max_abs_error, int(err.max()))
+        sum_abs_error += err.sum()
+        sum_sq_error += (err ** 2).sum()
+        num_exact += np.count_nonzero(~np.any(err, axis=-1))
+
+    return {
+        'num_values': num_values,
+        'max_abs_error': max_abs_error,
+        'mean_abs_error': sum_abs_error / (3.0 * num_values),
+        'rmse': np.sqrt(sum_sq_error / (3.0 * num_values)),
+        'exact_fraction': num_exact / float(num_values),
+    }
+
+
+def _reinhard_float(im_src, target_mu, target_sigma, src_mu, src_sigma):
+    """Reinhard color normalization as done by `reinhard` before the
+    conversion to uint8.
+    """
+
+    im_lab = color_conversion.rgb_to_lab(im_src)
+
+    for i in range(3):
+        im_lab[:, :, i] = (im_lab[:, :, i] - src_mu[i]) / src_sigma[i]
+
+    for i in range(3):
+        im_lab[:, :, i] = im_lab[:, :, i] * target_sigma[i] + target_mu[i]
+
+    im_normalized = color_conversion.lab_to_rgb(im_lab)
+    im_normalized[im_normalized > 255] = 255
+    im_normalized[im_normalized < 0] = 0
+
+    return im_normalized
+
+
+def _rgb_cube(red_values, values=None):
+    """Get an image of all RGB values with the given red values and green and
+    blue values in `values`, in the order of the grid of `reinhard_lut`.
+    `values` defaults to all 256 values.
+    """
+    if values is None:
+        values = np.arange(256)
+
+    r, g, b = np.meshgrid(np.asarray(red_values), values, values,
+                          indexing='ij')
+
+    return np.stack([r, g, b], axis=-1).reshape(len(r), -1, 3).astype(
+        np.uint8 if values.dtype.kind in 'iu' else np.float64)
+
+
+def _compute_reinhard_lut(grid_size, target_mu, target_sigma,
+                          src_mu, src_sigma):
+
+    if grid_size == 256:
+
+        # evaluate the float path slab by slab to bound memory usage
+        lut = np.zeros((256, 256 * 256, 3), dtype=np.uint8)
+
+        for r in range(0, 256, 16):
+
+            lut[r:r + 16] = _reinhard_float(
+                _rgb_cube(range(r, r + 16)),
+                target_mu, target_sigma, src_mu, src_sigma)
+
+    else:
+
+        nodes = np.linspace(0, 255, grid_size)
+
+        lut = _reinhard_float(
+            _rgb_cube(nodes, nodes),
+            target_mu, target_sigma, src_mu, src_sigma).astype(np.float32)
+
+    return lut.reshape(grid_size, grid_size, grid_size, 3)
+
+
+def _save_lut(lut, cache_dir, lut_file):
+    """Save a LUT such that concurrent readers never see a partial file."""
+
+    tmp_file = None
+
+    try:
+
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.npy',
+                                         delete=False) as f:
+            tmp_file = f.name
+            np.save(f, lut)
+
+        os.rename(tmp_file, lut_file)
+
+    except OSError:
+
+        # caching is best effort, e.g. if the directory is not writable or
+        # another process cached the same LUT concurrently
+        if tmp_file is not None and os.path.isfile(tmp_file):
+            os.remove(tmp_file)
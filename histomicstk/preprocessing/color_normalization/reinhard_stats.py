@@ -1,11 +1,16 @@
 import collections
+import dask
 import numpy as np
 from histomicstk.utils import sample_pixels
+from histomicstk.utils.sample_pixels import (
+    _broadcast_to_workers, _get_foreground_tiles, _get_tile_fgnd_mask)
+from histomicstk.utils.tile_source_pool import get_tile_source
 from histomicstk.preprocessing import color_conversion
 
 
 def reinhard_stats(slide_path, sample_fraction, magnification=None,
-                   tissue_seg_mag=1.25):
+                   tissue_seg_mag=1.25, method='sample', tile_grouping=256,
+                   min_coverage=0.1, mask_method='histogram', seed=None):
     """Samples a whole-slide-image to determine colorspace statistics (mean,
     variance) needed to perform global Reinhard color normalization.
 
@@ -29,6 +34,28 @@ def reinhard_stats(slide_path, sample_fraction, magnification=None,
     tissue_seg_mag: double, optional
         low resolution magnification at which foreground will be segmented.
         Default value = 1.25.
+    method : {'sample', 'moments'}, optional
+        With 'sample', the sampled pixels are gathered and their statistics
+        are computed at once. With 'moments', the counts, means and sums of
+        squared deviations of the sampled pixels are computed by the tasks
+        processing the tiles and merged, such that no pixel is gathered.
+        The 'moments' method is deterministic, samples each tile with a
+        random generator seeded by `seed` and its position, and uses all
+        foreground pixels if `sample_fraction` is 1. Default value = 'sample'.
+    tile_grouping: int, optional
+        Number of tiles to process as part of a single task.
+    min_coverage: double, optional
+        minimum fraction of tile covered by tissue for it to be included
+        in sampling. Ranges between [0,1). Default value = 0.1.
+    mask_method : {'histogram', 'kde'}, optional
+        Method of `simple_mask` used to segment the foreground with the
+        'moments' method. The 'sample' method always uses 'kde'.
+        Default value = 'histogram'.
+    seed: int, optional
+        Seed of the random generators of the foreground segmentation and of
+        the tiles. With the 'moments' method, None seeds the generator of
+        each tile by its position only. With the 'sample' method, None draws
+        a seed from numpy's global random generator.
 
     Returns
     -------
@@ -50,23 +77,149 @@ def reinhard_stats(slide_path, sample_fraction, magnification=None,
 
     """
 
-    # generate a sampling of sample_pixels_rgb pixels from whole-slide image
-    sample_pixels_rgb = sample_pixels(
-        slide_path,
-        sample_fraction=sample_fraction,
-        magnification=magnification,
-        tissue_seg_mag=tissue_seg_mag
-    )
+    if method == 'sample':
 
-    # reshape the Nx3 pixel array into a 1 x N x 3 image for lab_mean_std
-    sample_pixels_rgb = np.reshape(sample_pixels_rgb,
-                                   (1, sample_pixels_rgb.shape[0], 3))
+        # generate a sampling of sample_pixels_rgb pixels from whole-slide
+        # image
+        sample_pixels_rgb = sample_pixels(
+            slide_path,
+            sample_fraction=sample_fraction,
+            magnification=magnification,
+            tissue_seg_mag=tissue_seg_mag,
+            min_coverage=min_coverage,
+            tile_grouping=tile_grouping,
+            seed=seed
+        )
 
-    # compute mean and stddev of sample pixels in Lab space
-    Mu, Sigma = color_conversion.lab_mean_std(sample_pixels_rgb)
+        # reshape the Nx3 pixel array into a 1 x N x 3 image for lab_mean_std
+        sample_pixels_rgb = np.reshape(sample_pixels_rgb,
+                                       (1, sample_pixels_rgb.shape[0], 3))
+
+        # compute mean and stddev of sample pixels in Lab space
+        Mu, Sigma = color_conversion.lab_mean_std(sample_pixels_rgb)
+
+    elif method == 'moments':
+
+        iter_args, tile_positions, im_fgnd_mask_lres = _get_foreground_tiles(
+            slide_path, magnification, tissue_seg_mag, min_coverage,
+            mask_method=mask_method, seed=seed)
+
+        im_fgnd_mask_lres = _broadcast_to_workers(im_fgnd_mask_lres)
+
+        moments = [
+            dask.delayed(_lab_moments_tiles)(
+                slide_path, iter_args, tile_positions[i:i + tile_grouping],
+                sample_fraction, tissue_seg_mag, im_fgnd_mask_lres, seed)
+            for i in range(0, len(tile_positions), tile_grouping)
+        ]
+
+        # merge the moments in a tree
+        while len(moments) > 1:
+
+            merged = [
+                dask.delayed(_merge_moments)(moments[i], moments[i + 1])
+                for i in range(0, len(moments) - 1, 2)
+            ]
+
+            if len(moments) % 2:
+                merged.append(moments[-1])
+
+            moments = merged
+
+        if moments:
+            count, Mu, M2 = moments[0].compute()
+        else:
+            print("Sampling could not identify any foreground regions.")
+            count, Mu, M2 = _empty_moments()
+
+        with np.errstate(invalid='ignore'):
+            Sigma = np.sqrt(M2 / count)
+
+    else:
+
+        raise ValueError('Invalid value for method. Must be sample or moments')
 
     # build named tuple for output
     ReinhardStats = collections.namedtuple('ReinhardStats', ['Mu', 'Sigma'])
     stats = ReinhardStats(Mu, Sigma)
 
     return stats
+
+
+def _empty_moments():
+
+    return 0, np.full(3, np.nan), np.zeros(3)
+
+
+def _merge_moments(moments1, moments2):
+    """Merge the count, mean and sum of squared deviations of two disjoint
+    sets of values as described by Chan et al.
+    """
+
+    count1, mean1, m2_1 = moments1
+    count2, mean2, m2_2 = moments2
+
+    count = count1 + count2
+
+    if count1 == 0 or count2 == 0:
+        return moments2 if count1 == 0 else moments1
+
+    delta = mean2 - mean1
+
+    mean = mean1 + delta * (float(count2) / count)
+    m2 = m2_1 + m2_2 + delta ** 2 * (float(count1) * count2 / count)
+
+    return count, mean, m2
+
+
+def _lab_moments_tiles(slide_path, iter_args, positions, sample_fraction,
+                       tissue_seg_mag, im_fgnd_mask_lres, seed=None):
+    """Compute the moments of the LAB values of the sampled foreground pixels
+    of a group of tiles.
+    """
+
+    moments = _empty_moments()
+
+    ts = get_tile_source(slide_path)
+
+    for position in positions:
+
+        tile = ts.getSingleTile(tile_position=position, **iter_args)
+
+        im_tile = tile['tile'][:, :, :3]
+
+        tile_fgnd_mask = _get_tile_fgnd_mask(
+            ts, tile, im_tile.shape[:2], tissue_seg_mag, im_fgnd_mask_lres)
+
+        pixels = im_tile[tile_fgnd_mask.astype(bool)]
+
+        if len(pixels) == 0:
+            continue
+
+        if sample_fraction < 1:
+
+            rng = np.random.RandomState(
+                position if seed is None else [seed, position])
+
+            # Handle fractions in the desired sample size by rounding up
+            # or down, weighted by the fractional amount.
+            float_samples = sample_fraction * len(pixels)
+            num_samples = int(np.floor(float_samples))
+            num_samples += rng.binomial(1, float_samples - num_samples)
+
+            # sample with replacement like sample_pixels, which does not
+            # permute all the pixels of the tile
+            pixels = pixels[rng.randint(len(pixels), size=num_samples)]
+
+            if len(pixels) == 0:
+                continue
+
+        im_lab = color_conversion.rgb_to_lab(
+            pixels.reshape(1, -1, 3)).reshape(-1, 3)
+
+        mean = im_lab.mean(axis=0)
+
+        moments = _merge_moments(
+            moments, (len(im_lab), mean, ((im_lab - mean) ** 2).sum(axis=0)))
+
+    return moments
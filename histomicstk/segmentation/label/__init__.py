@@ -11,7 +11,9 @@ from .condense import condense
 from .delete import delete
 from .delete_border import delete_border
 from .perimeter import perimeter
+from .relabel import relabel
 from .shuffle import shuffle
+from .trace_object_boundaries import trace_label_boundaries
 from .trace_object_boundaries import trace_object_boundaries
 
 # must be imported after CondenseLabel
@@ -30,8 +32,10 @@ __all__ = (
     'delete',
     'delete_border',
     'perimeter',
+    'relabel',
     'shuffle',
     'split',
+    'trace_label_boundaries',
     'trace_object_boundaries',
     'width_open',
 )
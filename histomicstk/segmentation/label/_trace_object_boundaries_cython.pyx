@@ -3,7 +3,7 @@ cimport numpy as np
 cimport cython
 
 from libcpp.vector cimport vector
-from libc.math cimport sin, cos, M_PI, round
+from libc.math cimport sin, cos, fabs, M_PI, round
 
 @cython.cdivision(True)
 @cython.boundscheck(False)
@@ -450,3 +450,410 @@ def _isbf(long[:, :] mask, long[:, :] mask_90, long[:, :] mask_180, long[:, :] m
                             DY = -1
 
     return list_bx, list_by
+
+
+ctypedef fused label_t:
+    np.uint8_t
+    np.uint16_t
+    np.uint32_t
+    np.uint64_t
+    np.int8_t
+    np.int16_t
+    np.int32_t
+    np.int64_t
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _trace_label_boundaries_cython(label_t[:, ::1] im_label not None, long connectivity, double max_length, bint simplify_colinear_spurs, double eps_colinear_area):
+    """Traces the boundaries of all objects of a label image.
+
+    The objects are traced in order of their label directly on the label
+    image, where the pixels of other objects and outside of the image are
+    background, with the GIL released.  Returns the concatenated row and
+    column coordinates of the boundaries, the offsets of the boundary of each
+    object in them and the label of each object.  Objects whose boundary is
+    empty are dropped.  The labels must not exceed the number of pixels.
+
+    """
+
+    cdef long nrows = im_label.shape[0]
+    cdef long ncols = im_label.shape[1]
+
+    cdef vector[long] rows, cols, offsets, labels
+    cdef vector[long] start_x, start_y, counts
+    cdef vector[long] bx, by
+
+    cdef long i, j, l, max_label = 0
+
+    with nogil:
+
+        for i in range(nrows):
+            for j in range(ncols):
+                if im_label[i, j] > max_label:
+                    max_label = <long>im_label[i, j]
+
+        start_x.resize(max_label + 1, -1)
+        start_y.resize(max_label + 1, -1)
+        counts.resize(max_label + 1, 0)
+
+        # the starting point of each object is its first pixel in raster
+        # order with a right, lower or upper right neighbor in the object
+        for i in range(nrows):
+            for j in range(ncols):
+
+                l = <long>im_label[i, j]
+
+                if l <= 0:
+                    continue
+
+                counts[l] += 1
+
+                if (start_x[l] == -1) and (
+                        _in_object(im_label, i, j + 1, l) or
+                        _in_object(im_label, i + 1, j, l) or
+                        _in_object(im_label, i + 1, j + 1, l) or
+                        _in_object(im_label, i - 1, j + 1, l)):
+                    start_x[l] = j
+                    start_y[l] = i
+
+        offsets.push_back(0)
+
+        for l in range(1, max_label + 1):
+
+            # objects without a starting point are single pixels or have no
+            # pixels
+            if start_x[l] == -1:
+                continue
+
+            bx.clear()
+            by.clear()
+
+            if connectivity == 4:
+                _isbf_label(im_label, l, start_x[l], start_y[l],
+                            max_length, bx, by)
+            elif counts[l] > 1:
+                _moore_label(im_label, l, start_x[l], start_y[l],
+                             max_length, bx, by)
+            else:
+                bx.push_back(start_x[l])
+                by.push_back(start_y[l])
+
+            if simplify_colinear_spurs:
+                _remove_thin_colinear_spurs_inplace(bx, by, eps_colinear_area)
+
+            if bx.size() == 0:
+                continue
+
+            for i in range(<long>bx.size()):
+                rows.push_back(by[i])
+                cols.push_back(bx[i])
+
+            offsets.push_back(rows.size())
+            labels.push_back(l)
+
+    return (np.asarray(<long[:rows.size()]>rows.data()).copy() if rows.size() else np.zeros(0, dtype=np.int_),
+            np.asarray(<long[:cols.size()]>cols.data()).copy() if cols.size() else np.zeros(0, dtype=np.int_),
+            np.asarray(<long[:offsets.size()]>offsets.data()).copy(),
+            np.asarray(<long[:labels.size()]>labels.data()).copy() if labels.size() else np.zeros(0, dtype=np.int_))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline bint _in_object(label_t[:, ::1] im_label, long i, long j, long l) nogil:
+    """Whether pixel i, j is in object l, pixels outside of the image being
+    background."""
+
+    if (i < 0) or (j < 0) or (i >= im_label.shape[0]) or (j >= im_label.shape[1]):
+        return False
+
+    return <long>im_label[i, j] == l
+
+
+cdef inline bint _window(label_t[:, ::1] im_label, long l, long x, long y, long DX, long DY, long a, long b) nogil:
+    """Element a, b of the neighborhood of pixel x, y rotated such that the
+    direction DX, DY points up, as read from the rotated masks by _isbf and
+    _moore."""
+
+    if (DX == 1) & (DY == 0):
+        return _in_object(im_label, y - 1 + b, x + 1 - a, l)
+    elif (DX == 0) & (DY == -1):
+        return _in_object(im_label, y - 1 + a, x - 1 + b, l)
+    elif (DX == -1) & (DY == 0):
+        return _in_object(im_label, y + 1 - b, x - 1 + a, l)
+    else:
+        return _in_object(im_label, y + 1 - a, x + 1 - b, l)
+
+
+cdef inline void _rotate(long DX, long DY, long x, long y, long *p, long *q) nogil:
+    """Rotates x, y by the angle of the direction DX, DY, as done with sin and
+    cos by _isbf and _moore."""
+
+    if (DX == 1) & (DY == 0):
+        # M_PI/2
+        p[0] = -y
+        q[0] = x
+    elif (DX == 0) & (DY == -1):
+        # 0
+        p[0] = x
+        q[0] = y
+    elif (DX == -1) & (DY == 0):
+        # 3*M_PI/2
+        p[0] = y
+        q[0] = -x
+    else:
+        # M_PI
+        p[0] = -x
+        q[0] = -y
+
+
+# clockwise ordered window indices, directions and offsets of Moore tracing
+cdef long _moore_row[8]
+cdef long _moore_col[8]
+cdef long _moore_dX[8]
+cdef long _moore_dY[8]
+cdef long _moore_oX[8]
+cdef long _moore_oY[8]
+
+_moore_row[:] = [2, 1, 0, 0, 0, 1, 2, 2]
+_moore_col[:] = [0, 0, 0, 1, 2, 2, 2, 1]
+_moore_dX[:] = [-1, 0, 0, 1, 1, 0, 0, -1]
+_moore_dY[:] = [0, -1, -1, 0, 0, 1, 1, 0]
+_moore_oX[:] = [-1, -1, -1, 0, 1, 1, 1, 0]
+_moore_oY[:] = [1, 0, -1, -1, -1, 0, 1, 1]
+
+
+cdef void _moore_label(label_t[:, ::1] im_label, long l, long x_start, long y_start, double max_length, vector[long] &list_bx, vector[long] &list_by) nogil:
+    """Moore tracing of object l, equivalent to _moore."""
+
+    # clockwise ordered indices
+    cdef long *row = _moore_row
+    cdef long *col = _moore_col
+    cdef long *dX = _moore_dX
+    cdef long *dY = _moore_dY
+    cdef long *oX = _moore_oX
+    cdef long *oY = _moore_oY
+
+    cdef long DX = 1
+    cdef long DY = 0
+
+    cdef long i, move, x, y, p, q, size_boundary
+
+    list_bx.push_back(x_start)
+    list_by.push_back(y_start)
+
+    while True:
+
+        x = list_bx.back()
+        y = list_by.back()
+
+        move = 0
+
+        for i in range(8):
+            if _window(im_label, l, x, y, DX, DY, row[i], col[i]):
+                move = i
+                break
+
+        # transform points by incoming directions and add to contours
+        _rotate(DX, DY, oX[move], oY[move], &p, &q)
+
+        list_bx.push_back(x + p)
+        list_by.push_back(y + q)
+
+        _rotate(DX, DY, dX[move], dY[move], &DX, &DY)
+
+        size_boundary = list_bx.size()
+
+        if size_boundary > 3:
+
+            # check if the first and the last x and y are equal
+            if (size_boundary > max_length) or (
+                    (list_bx[size_boundary - 1] == list_bx[1]) and
+                    (list_bx[size_boundary - 2] == list_bx[0]) and
+                    (list_by[size_boundary - 1] == list_by[1]) and
+                    (list_by[size_boundary - 2] == list_by[0])):
+                # remove the last element
+                list_bx.pop_back()
+                list_by.pop_back()
+                break
+
+
+cdef void _isbf_label(label_t[:, ::1] im_label, long l, long x_start, long y_start, double max_length, vector[long] &list_bx, vector[long] &list_by) nogil:
+    """ISBF tracing of object l, equivalent to _isbf."""
+
+    cdef long DX = 1
+    cdef long DY = 0
+
+    cdef long cX[2]
+    cdef long cY[2]
+    cdef long num_moves
+
+    cdef long t, x, y, p, q, size_boundary
+    cdef long fx1, fx2, fy1, fy2
+    cdef long lx1, lx2, ly1, ly2
+    cdef long lx3, lx4, ly3, ly4
+
+    cdef bint h00, h01, h10, h20, h21
+
+    list_bx.push_back(x_start)
+    list_by.push_back(y_start)
+
+    while True:
+
+        x = list_bx.back()
+        y = list_by.back()
+
+        h00 = _window(im_label, l, x, y, DX, DY, 0, 0)
+        h01 = _window(im_label, l, x, y, DX, DY, 0, 1)
+        h10 = _window(im_label, l, x, y, DX, DY, 1, 0)
+        h20 = _window(im_label, l, x, y, DX, DY, 2, 0)
+        h21 = _window(im_label, l, x, y, DX, DY, 2, 1)
+
+        num_moves = 1
+        cX[0] = 0
+        cY[0] = 0
+
+        # the new direction is given relative to the incoming direction and
+        # rotated with the moves
+        if h10:
+            # 'left' neighbor
+            cX[0] = -1
+            cY[0] = 0
+            p = -1
+            q = 0
+        elif h20 and not h21:
+            # inner-outer corner at left-rear
+            cX[0] = -1
+            cY[0] = 1
+            p = 0
+            q = 1
+        elif h00:
+            if h01:
+                # inner corner at front
+                cX[0] = 0
+                cY[0] = -1
+                cX[1] = -1
+                cY[1] = 0
+                num_moves = 2
+                p = 0
+                q = -1
+            else:
+                # inner-outer corner at front-left
+                cX[0] = -1
+                cY[0] = -1
+                p = 0
+                q = -1
+        elif h01:
+            # front neighbor
+            cX[0] = 0
+            cY[0] = -1
+            p = 1
+            q = 0
+        else:
+            # outer corner
+            p = 0
+            q = 1
+
+        # transform points by incoming directions and add to contours
+        if (cX[0] != 0) or (cY[0] != 0):
+            for t in range(num_moves):
+                _rotate(DX, DY, cX[t], cY[t], &x, &y)
+                list_bx.push_back(list_bx.back() + x)
+                list_by.push_back(list_by.back() + y)
+
+        _rotate(DX, DY, p, q, &DX, &DY)
+
+        size_boundary = list_bx.size()
+
+        if size_boundary > 3:
+
+            fx1 = list_bx[0]
+            fx2 = list_bx[1]
+            fy1 = list_by[0]
+            fy2 = list_by[1]
+            lx1 = list_bx[size_boundary-1]
+            ly1 = list_by[size_boundary-1]
+            lx2 = list_bx[size_boundary-2]
+            ly2 = list_by[size_boundary-2]
+            lx3 = list_bx[size_boundary-3]
+            ly3 = list_by[size_boundary-3]
+            lx4 = list_bx[size_boundary-4]
+            ly4 = list_by[size_boundary-4]
+
+            # check if the first and the last x and y are equal
+            if (size_boundary > max_length) or \
+                    ((lx1 == fx2) and (lx2 == fx1) and (ly1 == fy2) and (ly2 == fy1)):
+                # remove the last element
+                list_bx.pop_back()
+                list_by.pop_back()
+                break
+            if num_moves == 2:
+                if (lx2 == fx2) and (lx3 == fx1) and (ly2 == fy2) and (ly3 == fy1):
+                    list_bx.pop_back()
+                    list_by.pop_back()
+                    list_bx.pop_back()
+                    list_by.pop_back()
+                    break
+            # detect cycle
+            if (lx1 == lx3) and (ly1 == ly3) and (lx2 == lx4) and (ly2 == ly4):
+                list_bx.pop_back()
+                list_by.pop_back()
+                list_bx.pop_back()
+                list_by.pop_back()
+                # change direction from M_PI to 3*M_PI/2
+                if (DX == 0) and (DY == 1):
+                    DX = -1
+                    DY = 0
+                # from M_PI/2 to M_PI
+                elif (DX == 1) and (DY == 0):
+                    DX = 0
+                    DY = 1
+                # from 0 to M_PI/2
+                elif (DX == 0) and (DY == -1):
+                    DX = 1
+                    DY = 0
+                else:
+                    DX = 0
+                    DY = -1
+
+
+cdef void _remove_thin_colinear_spurs_inplace(vector[long] &px, vector[long] &py, double eps_colinear_area) nogil:
+    """Simplifies the given points by removing colinear spurs, equivalent to
+    _remove_thin_colinear_spurs."""
+
+    cdef vector[long] keep
+
+    cdef long n = px.size()
+    cdef long anchor = n - 1
+    cdef long testpos = 0
+    cdef long nextpos, k
+    cdef double area
+
+    while testpos < n:
+
+        # get coords of next triplet of points to test
+        if testpos == n - 1:
+            if keep.size() == 0:
+                break
+            nextpos = keep[0]
+        else:
+            nextpos = testpos + 1
+
+        # compute area of triangle formed by triplet
+        area = 0.5 * (px[anchor] * (py[testpos] - py[nextpos]) -
+                      px[testpos] * (py[anchor] - py[nextpos]) +
+                      px[nextpos] * (py[anchor] - py[testpos]))
+
+        # if area > cutoff, add testpos to keep and move anchor to testpos
+        if fabs(area) > eps_colinear_area:
+            keep.push_back(testpos)
+            anchor = testpos
+
+        testpos += 1
+
+    for k in range(<long>keep.size()):
+        px[k] = px[keep[k]]
+        py[k] = py[keep[k]]
+
+    px.resize(keep.size())
+    py.resize(keep.size())
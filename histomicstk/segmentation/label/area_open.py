@@ -1,10 +1,7 @@
-import numpy as np
-import scipy.ndimage.measurements as ms
+from .relabel import _condense_remap, _label_counts, relabel
 
-from .condense import condense
 
-
-def area_open(im_label, min_area):
+def area_open(im_label, min_area, out=None):
     """Removes small objects from label image.
 
     Parameters
@@ -14,6 +11,9 @@ def area_open(im_label, min_area):
     min_area : int
         minimum area threshold for objects. Objects with fewer than 'min_area'
         pixels will be zeroed to merge with background.
+    out : array_like, optional
+        An array of the shape of `im_label` in which the output is stored.
+        It can be `im_label` itself to remove the objects in place.
 
     Returns
     -------
@@ -22,42 +22,24 @@ def area_open(im_label, min_area):
 
     Notes
     -----
-    Objects are assumed to have positive nonzero values. im_label image will be
-    condensed during processing.
+    Objects are assumed to have positive nonzero values. The output is
+    condensed. The area of all objects is computed at once and the label image
+    is relabeled with a single lookup.
 
     See Also
     --------
     histomicstk.segmentation.label.condense,
+    histomicstk.segmentation.label.relabel,
     histomicstk.segmentation.label.shuffle,
     histomicstk.segmentation.label.split,
     histomicstk.segmentation.label.width_open
 
     """
 
-    # copy input image
-    im_open = im_label.copy()
-
-    # condense label image
-    if np.unique(im_open).size-1 != im_open.max():
-        im_open = condense(im_open)
-
     # count pixels in each object
-    Counts, Edges = np.histogram(im_open, bins=im_open.max()+1)
-
-    # get locations of objects in initial image
-    Locations = ms.find_objects(im_open)
-
-    # iterate through objects, zeroing where needed
-    for i in np.arange(1, Counts.size):
-        if Counts[i] < min_area:
-
-            # extract object from label image
-            Template = im_open[Locations[i-1]]
-
-            # label mask of object 'i'
-            Template[Template == i] = 0
+    counts = _label_counts(im_label)
 
-    # condense to fill gaps
-    im_open = condense(im_open)
+    # zero small objects and condense to fill gaps
+    remap = _condense_remap(counts >= min_area, im_label.dtype)
 
-    return im_open
+    return relabel(im_label, remap, out)
@@ -1,8 +1,7 @@
-import numpy as np
-import scipy.ndimage.measurements as ms
+from .relabel import _condense_remap, _label_counts, relabel
 
 
-def condense(im_label):
+def condense(im_label, out=None):
     """
     Shifts labels in a label image to fill in gaps corresponding to missing
     values.
@@ -11,6 +10,9 @@ def condense(im_label):
     ----------
     im_label : array_like
         A label image generated by segmentation methods.
+    out : array_like, optional
+        An array of the shape of `im_label` in which the output is stored.
+        It can be `im_label` itself to condense it in place.
 
     Returns
     -------
@@ -19,24 +21,12 @@ def condense(im_label):
 
     See Also
     --------
+    histomicstk.segmentation.label.relabel,
     histomicstk.segmentation.label.shuffle
 
     """
 
-    # initialize output
-    Condensed = im_label.copy()
+    # shift the labels of the objects that are present
+    remap = _condense_remap(_label_counts(im_label) > 0, im_label.dtype)
 
-    # get extent of each object
-    Locations = ms.find_objects(Condensed)
-
-    # initialize counter
-    Counter = 1
-
-    # fill in new values
-    for i in np.arange(1, len(Locations)+1):
-        if Locations[i-1] is not None:
-            Patch = Condensed[Locations[i-1]]
-            Patch[Patch == i] = Counter
-            Counter += 1
-
-    return Condensed
+    return relabel(im_label, remap, out)
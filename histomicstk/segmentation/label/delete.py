@@ -1,8 +1,9 @@
 import numpy as np
-import scipy.ndimage.measurements as ms
 
+from .relabel import relabel
 
-def delete(im_label, indices):
+
+def delete(im_label, indices, out=None):
     """
     Deletes objects with values in 'indices' from label image, writing them over
     with zeros to assimilate with background.
@@ -14,6 +15,9 @@ def delete(im_label, indices):
     indices : array_like
         An n-length array of strictly positive integer values to delete from
         'im_label'.
+    out : array_like, optional
+        An array of the shape of `im_label` in which the output is stored.
+        It can be `im_label` itself to delete the objects in place.
 
     Returns
     -------
@@ -27,20 +31,15 @@ def delete(im_label, indices):
 
     See Also
     --------
-    histomicstk.segmentation.label.condense
+    histomicstk.segmentation.label.condense,
+    histomicstk.segmentation.label.relabel
 
     """
 
-    # initialize output
-    Deleted = im_label.copy()
-
-    # get extent of each object
-    Locations = ms.find_objects(Deleted)
+    # map the deleted values to zero
+    remap = np.arange(im_label.max() + 1, dtype=im_label.dtype)
 
-    # fill in new values
-    for i in np.arange(indices.size):
-        if Locations[indices[i]-1] is not None:
-            Patch = Deleted[Locations[indices[i] - 1]]
-            Patch[Patch == indices[i]] = 0
+    indices = np.asarray(indices)
+    remap[indices[indices < remap.size]] = 0
 
-    return Deleted
+    return relabel(im_label, remap, out)
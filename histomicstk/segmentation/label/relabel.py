@@ -0,0 +1,55 @@
+import numpy as np
+
+
+def relabel(im_label, remap, out=None):
+    """Relabels the objects of a label image with a lookup table.
+
+    Parameters
+    ----------
+    im_label : array_like
+        A label image generated by segmentation methods, with nonnegative
+        integer values.
+    remap : array_like
+        A 1D array of length greater than `im_label.max()` of the new value of
+        each label, e.g. 0 to delete an object.  remap[0] is normally 0 to
+        keep the background.
+    out : array_like, optional
+        An array of the shape of `im_label` in which the output is stored.
+        It can be `im_label` itself to relabel it in place.
+
+    Returns
+    -------
+    im_relabeled : array_like
+        A label image where every pixel with value i is set to remap[i], of
+        the type of `out`, or of `remap` if `out` is not given.
+
+    Notes
+    -----
+    The label image is relabeled with a single gather, such that the cost is
+    linear in the number of pixels regardless of the number of objects.
+
+    See Also
+    --------
+    histomicstk.segmentation.label.condense,
+    histomicstk.segmentation.label.delete
+
+    """
+
+    return np.take(remap, im_label, out=out)
+
+
+def _label_counts(im_label):
+    """Number of pixels of each label of a label image."""
+
+    return np.bincount(im_label.ravel())
+
+
+def _condense_remap(keep, dtype):
+    """Lookup table that deletes the labels i where keep[i] is False and
+    shifts the remaining labels down to fill gaps, preserving their order.
+    """
+
+    keep = np.array(keep, dtype=bool)
+    keep[0] = False
+
+    return (np.cumsum(keep) * keep).astype(dtype)
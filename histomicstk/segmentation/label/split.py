@@ -1,10 +1,10 @@
 import numpy as np
-import scipy.ndimage.measurements as ms
+import skimage.measure
 
-from .condense import condense
+from .relabel import _condense_remap, _label_counts, relabel
 
 
-def split(im_label, conn=8):
+def split(im_label, conn=8, out=None):
     """Re-labels objects that have multiple non-contiguous portions to create
     a new label image where each object is contiguous.
 
@@ -15,10 +15,19 @@ def split(im_label, conn=8):
     conn : int
         Neighborhood connectivity to define contiguity. Valid values are 4 or
         8. Default value = 4.
+    out : array_like, optional
+        An array of the shape of `im_label` in which the output is stored.
+        It can be `im_label` itself to split the objects in place.
 
     Notes
     -----
-    Objects are assumed to have positive nonzero values.
+    Objects are assumed to have positive nonzero values. The output is
+    condensed. The first contiguous portion of an object in raster order keeps
+    its label, and the other portions are given new labels after the largest
+    label, in order of their object and then raster order.
+
+    The contiguous portions of all objects are labeled at once, and mapped to
+    their output labels with a single lookup.
 
     Returns
     -------
@@ -29,47 +38,38 @@ def split(im_label, conn=8):
     --------
     histomicstk.segmentation.label.area_open,
     histomicstk.segmentation.label.condense,
+    histomicstk.segmentation.label.relabel,
     histomicstk.segmentation.label.shuffle
 
     """
 
-    # copy input image
-    Split = im_label.copy()
-
-    # define kernel for neighborhood
+    # define neighborhood
     if conn == 8:
-        Kernel = np.ones((3, 3), dtype=np.bool)
+        connectivity = 2
     elif conn == 4:
-        Kernel = np.zeros((3, 3), dtype=np.bool)
-        Kernel[1, :] = True
-        Kernel[:, 1] = True
+        connectivity = 1
     else:
         raise ValueError("Input 'conn' must be 4 or 8")
 
-    # condense label image
-    if np.unique(Split).size-1 != Split.max():
-        Split = condense(Split)
-
-    # get locations of objects in initial image
-    Locations = ms.find_objects(Split)
-
-    # initialize number of labeled objects
-    Total = Split.max()
+    # condensed label of each object
+    condensed = _condense_remap(_label_counts(im_label) > 0, im_label.dtype)
 
-    # iterate through objects, replicating where needed
-    for i in np.arange(1, len(Locations)+1):
+    # label contiguous portions of each object, in raster order
+    im_portions, num_portions = skimage.measure.label(
+        im_label, background=0, connectivity=connectivity, return_num=True)
 
-        # extract object from label image
-        Template = Split[Locations[i-1]]
+    # condensed label of the object of each portion
+    labels = np.zeros(num_portions + 1, dtype=im_label.dtype)
+    labels[im_portions.ravel()] = condensed[im_label.ravel()]
 
-        # label mask of object 'i'
-        L, Count = ms.label(Template == i, Kernel)
+    # the first portion of each object keeps its label, and the others are
+    # numbered after the largest label
+    order = np.argsort(labels[1:], kind='mergesort') + 1
+    is_first = np.ones(num_portions, dtype=bool)
+    is_first[1:] = labels[order[1:]] != labels[order[:-1]]
 
-        # relabel if necessary
-        if(Count > 1):
-            Template[L == 1] = i
-            for i in np.arange(2, Count+1):
-                Template[L == i] = Total + 1
-                Total += 1
+    remap = labels.copy()
+    remap[order[~is_first]] = condensed[-1] + np.arange(
+        1, np.count_nonzero(~is_first) + 1, dtype=im_label.dtype)
 
-    return Split
+    return relabel(im_portions, remap, out)
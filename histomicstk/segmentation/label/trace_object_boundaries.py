@@ -2,6 +2,7 @@ import numpy as np
 from skimage.measure import regionprops
 
 from ._trace_object_boundaries_cython import _trace_object_boundaries_cython
+from ._trace_object_boundaries_cython import _trace_label_boundaries_cython
 
 
 def trace_object_boundaries(im_label,
@@ -47,6 +48,9 @@ def trace_object_boundaries(im_label,
     competitive execution times. 8-connected tracing is implemented using the
     Moore tracing algorithm.
 
+    If trace_all is True, all objects are traced at once by
+    trace_label_boundaries.
+
     Returns
     -------
     X : array_like
@@ -56,6 +60,10 @@ def trace_object_boundaries(im_label,
         A set of 1D array of the vertical coordinates of seed pixels for
         tracing.
 
+    See Also
+    --------
+    histomicstk.segmentation.label.trace_label_boundaries
+
     References
     ----------
     .. [#] J. Seo et al "Fast Contour-Tracing Algorithm Based on a Pixel-
@@ -72,45 +80,13 @@ def trace_object_boundaries(im_label,
 
     if trace_all:
 
-        rprops = regionprops(im_label)
-        numLabels = len(rprops)
-
-        x_start = -1
-        y_start = -1
-
-        for i in range(numLabels):
-
-            # get bounds of label mask
-            min_row, min_col, max_row, max_col = rprops[i].bbox
-
-            # grab label mask
-            lmask = (
-                im_label[
-                    min_row:max_row, min_col:max_col
-                ] == rprops[i].label
-            ).astype(np.bool)
+        bx, by, offsets, _ = trace_label_boundaries(
+            im_label, conn, max_length, simplify_colinear_spurs,
+            eps_colinear_area)
 
-            mrows = max_row - min_row + 2
-            mcols = max_col - min_col + 2
-
-            mask = np.zeros((mrows, mcols))
-            mask[1:mrows-1, 1:mcols-1] = lmask
-
-            by, bx = _trace_object_boundaries_cython(
-                np.ascontiguousarray(
-                    mask, dtype=np.int), conn, x_start, y_start, max_length
-            )
-
-            bx = bx + min_row - 1
-            by = by + min_col - 1
-
-            if simplify_colinear_spurs:
-                bx, by = _remove_thin_colinear_spurs(bx, by,
-                                                     eps_colinear_area)
-
-            if len(bx) > 0:
-                X.append(bx)
-                Y.append(by)
+        for i in range(len(offsets) - 1):
+            X.append(bx[offsets[i]:offsets[i + 1]])
+            Y.append(by[offsets[i]:offsets[i + 1]])
 
     else:
 
@@ -144,6 +120,92 @@ def trace_object_boundaries(im_label,
     return X, Y
 
 
+def trace_label_boundaries(im_label, conn=4, max_length=None,
+                           simplify_colinear_spurs=True,
+                           eps_colinear_area=0.01):
+    """Performs exterior boundary tracing of all objects in a label mask at
+    once.
+
+    The boundaries are traced in a single call directly on the label mask,
+    without copying the mask of each object, and the GIL is released while
+    tracing such that the masks of several tiles can be traced concurrently
+    by threads.
+
+    Parameters
+    ----------
+    im_label : array_like
+        A label mask, where objects have positive integer values.
+    conn : int
+        Neighborhood connectivity to evaluate. Valid values are 4 or 8.
+        Default value = 4.
+    max_length : int
+        Maximum boundary length to trace before terminating. Default value =
+        None.
+    simplify_colinear_spurs : bool
+        If True colinear streaks/spurs in the object boundary will be
+        simplified/removed. Note that if the object boundary is entirely
+        colinear then the object itself will be removed. Default = True
+    eps_colinear_area : int
+        Minimum area of triangle formed by three consecutive points on the
+        contour for them to be considered as non-colinear. Default value =
+        0.01.
+
+    Returns
+    -------
+    X : array_like
+        A 1D array of the concatenated X coordinates of the boundaries of all
+        objects, as returned by trace_object_boundaries.
+    Y : array_like
+        A 1D array of the concatenated Y coordinates of the boundaries of all
+        objects, as returned by trace_object_boundaries.
+    offsets : array_like
+        A 1D array of length n + 1, where the boundary of the i-th of the n
+        traced objects is X[offsets[i]:offsets[i + 1]] and
+        Y[offsets[i]:offsets[i + 1]].
+    labels : array_like
+        A 1D array of the label of each traced object, in increasing order.
+        Objects whose boundary is empty, e.g. single pixels, are not traced.
+
+    See Also
+    --------
+    histomicstk.segmentation.label.trace_object_boundaries
+
+    """
+
+    if max_length is None:
+        max_length = float('inf')
+
+    im_label = np.asarray(im_label)
+
+    if im_label.dtype == np.bool_:
+        im_label = im_label.view(np.uint8)
+    elif im_label.dtype not in _label_dtypes:
+        im_label = im_label.astype(np.int64)
+
+    labels = None
+
+    # the tracer allocates memory proportional to the largest label
+    if im_label.size and im_label.max() > im_label.size:
+        labels = np.unique(im_label[im_label > 0])
+        im_label = np.where(im_label > 0,
+                            np.searchsorted(labels, im_label) + 1, 0)
+
+    X, Y, offsets, traced = _trace_label_boundaries_cython(
+        np.ascontiguousarray(im_label), conn, max_length,
+        simplify_colinear_spurs, eps_colinear_area)
+
+    if labels is not None:
+        traced = labels[traced - 1]
+
+    return X, Y, offsets, traced
+
+
+# label types supported by the tracer without conversion
+_label_dtypes = [np.dtype(t) for t in (
+    np.uint8, np.uint16, np.uint32, np.uint64,
+    np.int8, np.int16, np.int32, np.int64)]
+
+
 def _remove_thin_colinear_spurs(px, py, eps_colinear_area=0):
     """Simplifies the given list of points by removing colinear spurs
     """
@@ -1,11 +1,11 @@
 import numpy as np
-import scipy.ndimage.morphology as mp
 import scipy.ndimage.measurements as ms
+import scipy.ndimage.morphology as mp
 
-from .condense import condense
+from .relabel import _condense_remap, _label_counts, relabel
 
 
-def width_open(im_label, width):
+def width_open(im_label, width, out=None):
     """Removes thin objects from label image using maximum of distance
     transform values within each object.
 
@@ -16,13 +16,22 @@ def width_open(im_label, width):
     width : int
         width threshold for objects. Objects with fewer than 'Area' pixels will
         be zeroed to merge with background.
+    out : array_like, optional
+        An array of the shape of `im_label` in which the output is stored.
+        It can be `im_label` itself to remove the objects in place.
 
     Notes
     -----
     Objects are assumed to have positive nonzero values. A binary mask is
     generated for each object setting all other objects to the background value
     (0). The maximum chamfered distance transform value of this mask is used
-    to represent the object width.
+    to represent the object width. The output is condensed.
+
+    The distance transforms of all objects are computed at once: the taxicab
+    distance of a pixel to the nearest pixel outside of its object is one
+    more than its distance to the nearest object pixel that is 4-adjacent
+    to another object or to the background, hence a single distance
+    transform of the image of these boundary pixels is used.
 
     Returns
     -------
@@ -32,43 +41,38 @@ def width_open(im_label, width):
     See Also
     --------
     histomicstk.segmentation.label.condense,
+    histomicstk.segmentation.label.relabel,
     histomicstk.segmentation.label.shuffle,
     histomicstk.segmentation.label.split,
     histomicstk.segmentation.label.area_open
 
     """
 
-    # copy input image
-    im_thinned = im_label.copy()
-
-    # condense label image
-    if np.unique(im_thinned).size-1 != im_thinned.max():
-        im_thinned = condense(im_thinned)
-
-    # get locations of objects in initial label image
-    Locations = ms.find_objects(im_thinned)
-
-    # iterate through objects, calculating distances where needed
-    for i in np.arange(1, len(Locations)+1):
+    counts = _label_counts(im_label)
 
-        # extract object from label image
-        W = im_thinned[Locations[i-1]]
+    # no objects
+    if counts.size == 1:
+        return relabel(im_label, np.zeros(1, im_label.dtype), out)
 
-        # embed into mask with boundary
-        Mask = np.zeros((W.shape[0]+2, W.shape[1]+2), dtype=np.bool)
-        Mask[1:-1, 1:-1] = W == i
+    # mark object pixels whose 4-neighbors include another label, with the
+    # outside of the image as background
+    im_padded = np.pad(im_label, 1, mode='constant')
+    center = im_padded[1:-1, 1:-1]
 
-        # calculate distance transform of mask
-        D = mp.distance_transform_cdt(Mask, metric='taxicab')
+    im_boundary = (
+        (center != im_padded[:-2, 1:-1]) | (center != im_padded[2:, 1:-1]) |
+        (center != im_padded[1:-1, :-2]) | (center != im_padded[1:-1, 2:])
+    ) & (im_label > 0)
 
-        # get max distance
-        Max = D.max()
+    # distance of every pixel to the outside of its object
+    D = mp.distance_transform_cdt(~im_boundary, metric='taxicab') + 1
 
-        # zero label mask of object 'i'
-        if Max < width:
-            W[W == i] = 0
+    # get max distance within each object
+    labels = np.arange(1, counts.size)
+    Max = np.zeros(counts.size)
+    Max[1:] = ms.maximum(D, im_label, labels)
 
-    # condense to fill gaps
-    im_thinned = condense(im_thinned)
+    # zero thin objects and condense to fill gaps
+    remap = _condense_remap((counts > 0) & (Max >= width), im_label.dtype)
 
-    return im_thinned
+    return relabel(im_label, remap, out)
@@ -5,14 +5,18 @@ segmenting nuclei from histopathology images.
 
 from .gaussian_voting import gaussian_voting
 from .gvf_tracking import gvf_tracking
+from .gvf_tracking import merge_sinks
 from .max_clustering import max_clustering
 from .min_model import min_model
 from .detect_nuclei_kofahi import detect_nuclei_kofahi
+from .detect_nuclei_gvf import detect_nuclei_gvf
 
 __all__ = (
+    'detect_nuclei_gvf',
     'detect_nuclei_kofahi',
     'gaussian_voting',
     'gvf_tracking',
     'max_clustering',
+    'merge_sinks',
     'min_model'
 )
@@ -0,0 +1,162 @@
+import numpy as np
+cimport numpy as np
+cimport cython
+
+from libcpp.vector cimport vector
+from libc.math cimport acos, ceil, M_PI
+
+@cython.cdivision(True)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _gvf_tracking_cython(double[:, ::1] dx not None, double[:, ::1] dy not None, np.uint8_t[:, ::1] mask not None):
+
+    cdef long sy = dx.shape[0]
+    cdef long sx = dx.shape[1]
+
+    # label of each pixel, flattened
+    cdef long[::1] im_label = np.zeros(sy * sx, dtype=np.int_)
+
+    # pixels of the trajectories that created a sink
+    cdef np.uint8_t[::1] mapped = np.zeros(sy * sx, dtype=np.uint8)
+
+    # for the other pixels of tracked trajectories, the mapped pixel their
+    # trajectory ends at, or -1, and the number of pixels of tracked
+    # trajectories mapped so far when it was recorded, since such a pixel can
+    # end a trajectory before its recorded end
+    cdef long[::1] terminal = np.full(sy * sx, -1, dtype=np.int_)
+    cdef long[::1] terminal_events = np.zeros(sy * sx, dtype=np.int_)
+    cdef long events = 0
+
+    # last trajectory each pixel was added to, used to detect cycles
+    cdef long[::1] stamp = np.full(sy * sx, -1, dtype=np.int_)
+
+    # a trajectory has no repeated pixel, plus its last point
+    cdef long[::1] trajectory = np.zeros(sy * sx + 1, dtype=np.int_)
+
+    cdef vector[long] sinks
+
+    cdef long x, y, cx, cy, nx, ny, p, t, k, points, end, label
+    cdef int novel
+    cdef double phi
+
+    with nogil:
+
+        for y in range(sy):
+            for x in range(sx):
+
+                if mask[y, x] == 0:
+                    continue
+
+                t = y * sx + x
+
+                trajectory[0] = t
+                stamp[t] = t
+                points = 1
+
+                novel = 1
+                end = -1
+
+                cx = x
+                cy = y
+
+                while True:
+
+                    nx = cx + _round_step(dx[cy, cx])
+                    ny = cy + _round_step(dy[cy, cx])
+
+                    # check image edge
+                    if nx < 0 or nx > sx - 1 or ny < 0 or ny > sy - 1:
+                        break
+
+                    p = ny * sx + nx
+
+                    # check mapping
+                    if mapped[p]:
+                        trajectory[points] = p
+                        points += 1
+                        novel = 0
+                        end = p
+                        break
+
+                    if mask[ny, nx] == 0:
+                        trajectory[points] = p
+                        points += 1
+                        break
+
+                    # check angle between successive steps
+                    phi = acos(dy[cy, cx] * dy[ny, nx] + dx[cy, cx] * dx[ny, nx])
+
+                    if not phi < M_PI / 2:
+                        trajectory[points] = p
+                        points += 1
+                        break
+
+                    # the trajectory is periodic from its first repeated pixel
+                    if stamp[p] == t:
+                        break
+
+                    # the rest of the trajectory is that of an earlier one,
+                    # whose pixels still have the label of its end
+                    if (terminal[p] >= 0 and terminal_events[p] == events and
+                            im_label[terminal[p]] == im_label[p]):
+                        trajectory[points] = p
+                        points += 1
+                        novel = 0
+                        end = terminal[p]
+                        break
+
+                    trajectory[points] = p
+                    stamp[p] = t
+                    points += 1
+
+                    cx = nx
+                    cy = ny
+
+                if novel:
+
+                    # record sink and map trajectory with the new label
+                    sinks.push_back(trajectory[points - 1])
+                    label = sinks.size()
+
+                    for k in range(points):
+                        if terminal[trajectory[k]] >= 0:
+                            events += 1
+                            terminal[trajectory[k]] = -1
+                        im_label[trajectory[k]] = label
+                        mapped[trajectory[k]] = 1
+
+                else:
+
+                    # label trajectory with the label of its end
+                    label = im_label[end]
+
+                    for k in range(points):
+                        im_label[trajectory[k]] = label
+                        if not mapped[trajectory[k]]:
+                            terminal[trajectory[k]] = end
+                            terminal_events[trajectory[k]] = events
+
+    cdef np.ndarray sink_points = np.zeros((sinks.size(), 2))
+
+    for k in range(sinks.size()):
+        sink_points[k, 0] = sinks[k] % sx
+        sink_points[k, 1] = sinks[k] // sx
+
+    return np.asarray(im_label).reshape(sy, sx), sink_points
+
+
+cdef inline long _round_step(double v) nogil:
+
+    # round half away from zero
+    cdef double t
+
+    if v >= 0.0:
+        t = ceil(v)
+        if t - v > 0.5:
+            t -= 1.0
+        return <long>t
+    else:
+        t = ceil(-v)
+        if t + v > 0.5:
+            t -= 1.0
+        return -<long>t
@@ -0,0 +1,85 @@
+import numpy as np
+import histomicstk.filters.shape as htk_shape_filters
+import histomicstk as htk
+
+from .detect_nuclei_kofahi import _smooth_nuclei_fgnd_mask
+from .gvf_tracking import gvf_tracking, merge_sinks
+
+
+def detect_nuclei_gvf(im_nuclei_stain, im_nuclei_fgnd_mask, min_radius,
+                      max_radius, min_nucleus_area, merge_radius):
+
+    """Performs a nuclear segmentation using gradient flow tracking.
+
+    This method uses the same scale-adaptive multi-scale Difference of
+    Gaussian filtering for blob enhancement as `detect_nuclei_kofahi`, but
+    groups the foreground pixels by tracking the diffused gradient of the
+    filter response to its sinks, and merges sinks that are close to one
+    another.
+
+    Parameters
+    ----------
+    im_nuclei_stain : array_like
+        A hematoxylin intensity image obtained from ColorDeconvolution.
+    im_nuclei_fgnd_mask: array_like
+        A binary mask of the nuclear foreground typically obtained by applying
+        a threshold on the hematoxylin/nuclei stain image
+    min_radius : float
+        Minimum nuclear radius (used to set min sigma of the multiscale DoG filter)
+    max_radius : float
+        Maximum nuclear radius (used to set max sigma of the multiscale DoG filter)
+    min_nucleus_area : int
+        Minimum area that each nucleus should have
+    merge_radius : float
+        Radius within which the sinks of the gradient flow are merged
+
+    Returns
+    -------
+    im_nuclei_seg_mask : array_like
+        A 2D array mask of the nuclei segmentation.
+
+    See Also
+    --------
+    histomicstk.segmentation.nuclear.detect_nuclei_kofahi,
+    histomicstk.segmentation.nuclear.gvf_tracking,
+    histomicstk.segmentation.nuclear.merge_sinks
+
+    References
+    ----------
+    .. [#] G. Li et al "3D cell nuclei segmentation based on gradient flow
+       tracking" in BMC Cell Biology,vol.40,no.8, 2007.
+
+    """
+
+    # smooth foreground mask with closing and opening
+    im_nuclei_fgnd_mask = _smooth_nuclei_fgnd_mask(im_nuclei_fgnd_mask)
+
+    if not np.any(im_nuclei_fgnd_mask):
+        return im_nuclei_fgnd_mask
+
+    # run adaptive multi-scale DoG filter
+    im_log_max, im_sigma_max = htk_shape_filters.cdog(
+        im_nuclei_stain, im_nuclei_fgnd_mask,
+        sigma_min=min_radius / np.sqrt(2),
+        sigma_max=max_radius / np.sqrt(2)
+    )
+
+    # track the gradient of the response to its sinks and merge close sinks
+    im_nuclei_seg_mask, sinks = gvf_tracking(im_log_max, im_nuclei_fgnd_mask)
+
+    im_nuclei_seg_mask = merge_sinks(
+        im_nuclei_seg_mask, sinks, merge_radius).astype(int)
+
+    # trajectories may end on a background pixel
+    im_nuclei_seg_mask[~im_nuclei_fgnd_mask] = 0
+
+    # split any objects with disconnected fragments
+    im_nuclei_seg_mask = htk.segmentation.label.split(im_nuclei_seg_mask,
+                                                      conn=8)
+
+    # filter out small objects in place
+    im_nuclei_seg_mask = htk.segmentation.label.area_open(
+        im_nuclei_seg_mask, min_nucleus_area,
+        out=im_nuclei_seg_mask).astype(int)
+
+    return im_nuclei_seg_mask
@@ -46,14 +46,7 @@ def detect_nuclei_kofahi(im_nuclei_stain, im_nuclei_fgnd_mask, min_radius,
     """
 
     # smooth foreground mask with closing and opening
-    im_nuclei_fgnd_mask = skimage.morphology.closing(
-        im_nuclei_fgnd_mask, skimage.morphology.disk(3))
-
-    im_nuclei_fgnd_mask = skimage.morphology.opening(
-        im_nuclei_fgnd_mask, skimage.morphology.disk(3))
-
-    im_nuclei_fgnd_mask = sp.ndimage.morphology.binary_fill_holes(
-        im_nuclei_fgnd_mask)
+    im_nuclei_fgnd_mask = _smooth_nuclei_fgnd_mask(im_nuclei_fgnd_mask)
 
     if not np.any(im_nuclei_fgnd_mask):
         return im_nuclei_fgnd_mask
@@ -76,8 +69,23 @@ def detect_nuclei_kofahi(im_nuclei_stain, im_nuclei_fgnd_mask, min_radius,
     im_nuclei_seg_mask = htk.segmentation.label.split(im_nuclei_seg_mask,
                                                       conn=8)
 
-    # filter out small objects
+    # filter out small objects in place
     im_nuclei_seg_mask = htk.segmentation.label.area_open(
-        im_nuclei_seg_mask, min_nucleus_area).astype(np.int)
+        im_nuclei_seg_mask, min_nucleus_area,
+        out=im_nuclei_seg_mask).astype(np.intp)
 
     return im_nuclei_seg_mask
+
+
+def _smooth_nuclei_fgnd_mask(im_nuclei_fgnd_mask):
+    """Smooth a nuclear foreground mask with a closing and an opening, and
+    fill its holes.
+    """
+
+    im_nuclei_fgnd_mask = skimage.morphology.closing(
+        im_nuclei_fgnd_mask, skimage.morphology.disk(3))
+
+    im_nuclei_fgnd_mask = skimage.morphology.opening(
+        im_nuclei_fgnd_mask, skimage.morphology.disk(3))
+
+    return sp.ndimage.morphology.binary_fill_holes(im_nuclei_fgnd_mask)
@@ -1,7 +1,7 @@
 import collections
 import numpy as np
 import sklearn.cluster as cl
-import scipy.signal as signal
+import scipy.ndimage as ndi
 
 import histomicstk as htk
 
@@ -13,8 +13,9 @@ def gaussian_voting(I, rmax=35, rmin=10, sSigma=5, Tau=5, bw=15, Psi=0.3):
     as input a hematoxylin-deconvolved image and uses the gradient signal to
     cast directed votes towards the center of cell nuclei. These votes are
     blurred by a gaussian kernel, and are spatially clustered using the
-    mean-shift algorithm. Convolutions are performed separably to reduce
-    compute time.
+    mean-shift algorithm. Votes are accumulated at once and convolutions are
+    performed separably to reduce compute time, such that the function can be
+    applied to each tile of a whole-slide image.
 
     Parameters
     ----------
@@ -45,7 +46,9 @@ def gaussian_voting(I, rmax=35, rmin=10, sSigma=5, Tau=5, bw=15, Psi=0.3):
 
     Notes
     -----
-    Return values are returned as a namedtuple
+    Return values are returned as a namedtuple. The voting kernel has unit
+    sum, and each seed point is used once in the mean-shift clustering,
+    whatever the number of vote fractions it is above.
 
     See Also
     --------
@@ -61,67 +64,54 @@ def gaussian_voting(I, rmax=35, rmin=10, sSigma=5, Tau=5, bw=15, Psi=0.3):
     """
 
     # calculate standard deviation of voting kernel
-    vSigma = (rmax - rmin) / 3
+    vSigma = (rmax - rmin) / 3.0
 
     # calculate voting radius
-    r = (rmax + rmin) / 2
+    r = (rmax + rmin) / 2.0
 
     # generate separable gaussian derivative kernels
     Grad = htk.filters.edge.gaussian_grad(I, sSigma)
-    dMag = (Grad.dX**2 + Grad.dY**2)**0.5
+    dMag = (Grad.dx**2 + Grad.dy**2)**0.5
 
     # threshold gradient image to identify voting pixels
     dMask = dMag >= Tau
     Voting = dMask.nonzero()
 
-    # initialize voting field - pad by 'r' along each edge
-    Votes = np.zeros((I.shape[0] + 2 * r, I.shape[1] + 2 * r))
-    for i in range(Voting[0].size):
-
-        # calculate center point of voting region
-        mux = round(Voting[1][i] + r * Grad.dX[Voting[0][i]][Voting[1][i]] /
-                    dMag[Voting[0][i]][Voting[1][i]])
-        muy = round(Voting[0][i] + r * Grad.dY[Voting[0][i]][Voting[1][i]] /
-                    dMag[Voting[0][i]][Voting[1][i]])
-
-        # enter weighted votes at these locations
-        Votes[r+muy, r+mux] = Votes[r+muy, r+mux] + \
-            dMag[Voting[0][i]][Voting[1][i]]
-
-    # create voting kernel
-    x = np.linspace(0, np.ceil(2*3*vSigma), int(np.ceil(2*3*vSigma) + 1))
-    y = np.linspace(0, np.ceil(2*3*vSigma), int(np.ceil(2*3*vSigma) + 1))
-    x -= np.ceil(2*3*vSigma)/2  # center at zero
-    y -= np.ceil(2*3*vSigma)/2
-    x = np.reshape(x, (1, x.size))  # reshape to 2D row and column vectors
-    y = np.reshape(y, (y.size, 1))
-    xK = np.exp(-x**2 / (2 * vSigma**2)) / (sSigma * (2 * np.pi) ** 0.5)
-    yK = np.exp(-y**2 / (2 * vSigma**2)) / (sSigma * (2 * np.pi) ** 0.5)
-
-    # perform convolutions with voting kernel for vote-smoothing
-    Votes = signal.convolve2d(Votes, xK, mode='full', boundary='fill')
-    Votes = signal.convolve2d(Votes, yK, mode='full', boundary='fill')
+    # build output tuple
+    Output = collections.namedtuple('Output', ['X', 'Y'])
 
-    # crop voting image to size of original input image
-    Votes = Votes[r+np.floor(x.size/2):-(r+np.ceil(x.size/2)),
-                  r+np.floor(x.size/2):-(r+np.ceil(x.size/2))]
+    if Voting[0].size == 0:
+        return Output(np.zeros(0), np.zeros(0)), np.zeros(I.shape)
+
+    # calculate center point of voting region of all voting pixels
+    Weights = dMag[Voting]
+    mux = np.round(Voting[1] + r * Grad.dx[Voting] / Weights).astype(np.intp)
+    muy = np.round(Voting[0] + r * Grad.dy[Voting] / Weights).astype(np.intp)
+
+    # accumulate weighted votes in a voting field padded by 'r' along each
+    # edge
+    pad = int(np.ceil(r))
+    shape = (I.shape[0] + 2 * pad, I.shape[1] + 2 * pad)
 
-    # generate sets of potential seed points
-    Seeds = [None]*np.arange(np.floor(10 * Psi) / 10, 0.9, 0.1).size
-    for i, p in enumerate(np.arange(np.floor(10 * Psi) / 10, 0.9, 0.1)):
-        Points = np.nonzero(Votes >= p * Votes.max())
-        Seeds[i] = np.column_stack((Points[0].transpose(),
-                                    Points[1].transpose()))
+    Votes = np.bincount(
+        np.ravel_multi_index((muy + pad, mux + pad), shape),
+        weights=Weights, minlength=shape[0] * shape[1]).reshape(shape)
 
-    # concatenate seed point lists
-    Seeds = np.vstack(Seeds)
+    # smooth votes with separable gaussian voting kernel 6 * vSigma wide
+    Votes = ndi.gaussian_filter(Votes, vSigma, mode='constant', truncate=3.0)
+
+    # crop voting image to size of original input image
+    Votes = Votes[pad:pad + I.shape[0], pad:pad + I.shape[1]]
+
+    # potential seed points are the points whose votes are above fractions
+    # of the maximum vote, from Psi to 0.9 in steps of 0.1. These sets are
+    # nested, hence their union is the set of the lowest fraction.
+    Seeds = np.argwhere(Votes >= np.floor(10 * Psi) / 10 * Votes.max())
 
     # run mean-shift algorithm to collect
     ms = cl.MeanShift(bandwidth=bw, bin_seeding=True)
     ms.fit(Seeds)
 
-    # build output tuple
-    Output = collections.namedtuple('Output', ['X', 'Y'])
     Nuclei = Output(ms.cluster_centers_[:, 1], ms.cluster_centers_[:, 0])
 
     return Nuclei, Votes
@@ -3,6 +3,10 @@ import numpy as np
 import skimage.morphology as mp
 from skimage import measure as ms
 
+from histomicstk.segmentation.label import relabel
+
+from ._gvf_tracking_cython import _gvf_tracking_cython
+
 
 def gvf_tracking(I, Mask, K=1000, Diffusions=10, Mu=5, Lambda=5, Iterations=10,
                  dT=0.05):
@@ -24,7 +28,9 @@ def gvf_tracking(I, Mask, K=1000, Diffusions=10, Mu=5, Lambda=5, Iterations=10,
         objects have value 0. Used to restrict influence of background vectors
         on diffusion process and to reduce tracking computations.
     K : float
-        Number of steps to check for tracking cycle. Default value = 1000.
+        Number of steps to check for tracking cycle. Unused, tracking cycles
+        are detected as soon as a trajectory revisits one of its pixels.
+        Default value = 1000.
     Mu : float
         Weight parmeter from Navier-Stokes diffusion - weights divergence and
         Laplacian terms. Default value = 5.
@@ -46,8 +52,15 @@ def gvf_tracking(I, Mask, K=1000, Diffusions=10, Mu=5, Lambda=5, Iterations=10,
         N x 2 array containing the (x,y) locations of the tracking sinks. Each
         row is an (x,y) pair - in that order.
 
+    Notes
+    -----
+    The tracking is compiled and runs without the GIL. A trajectory stops as
+    soon as it reaches a pixel of an earlier trajectory whose remainder is
+    known, rather than following it again to its sink.
+
     See Also
     --------
+    histomicstk.segmentation.nuclear.merge_sinks,
     histomicstk.utils.gradient_diffusion,
     histomicstk.segmentation.label.shuffle
 
@@ -58,10 +71,6 @@ def gvf_tracking(I, Mask, K=1000, Diffusions=10, Mu=5, Lambda=5, Iterations=10,
 
     """
 
-    # get image shape
-    M = I.shape[0]
-    N = I.shape[1]
-
     # calculate gradient
     dy, dx = np.gradient(I)
 
@@ -75,115 +84,13 @@ def gvf_tracking(I, Mask, K=1000, Diffusions=10, Mu=5, Lambda=5, Iterations=10,
     dy = dy / Mag
     dx = dx / Mag
 
-    # define mask to track pixels that are mapped to a sink
-    Mapped = np.zeros(I.shape)
-
-    # define label image
-    Segmentation = np.zeros(I.shape)
-
-    # initialize lists of sinks
-    Sinks = []
-
-    # define coordinates for foreground pixels (Mask == 1)
-    i, j = np.nonzero(Mask)
-
-    # track pixels
-    for index, (x, y) in enumerate(zip(j, i)):
-
-        # initialize angle, trajectory length, novel flag, and allocation count
-        phi = 0
-        points = 1
-        novel = 1
-        alloc = 1
-
-        # initialize trajectory
-        Trajectory = np.zeros((K, 2))
-        Trajectory[0, 0] = x
-        Trajectory[0, 1] = y
-
-        # track while angle defined by successive steps is < np.pi / 2
-        while(phi < np.pi / 2):
-
-            # calculate step
-            xStep = round_float(dx[Trajectory[points-1, 1],
-                                Trajectory[points-1, 0]])
-            yStep = round_float(dy[Trajectory[points-1, 1],
-                                Trajectory[points-1, 0]])
-
-            # check image edge
-            if ((Trajectory[points-1, 0] + xStep < 0) or
-                    (Trajectory[points-1, 0] + xStep > N-1) or
-                    (Trajectory[points-1, 1] + yStep < 0) or
-                    (Trajectory[points-1, 1] + yStep > M-1)):
-                break
-
-            # add new point to trajectory list
-            if points < K:  # buffer is not overrun
-                Trajectory[points, 0] = Trajectory[points-1, 0] + xStep
-                Trajectory[points, 1] = Trajectory[points-1, 1] + yStep
-
-            else:  # buffer overrun
-
-                # check for cycle
-                cycle = detect_cycle(Trajectory, points)
-
-                if cycle == points:  # no cycle, simple overflow. grow buffer.
-
-                    # copy and reallocate
-                    temp = Trajectory
-                    Trajectory = np.zeros((K*alloc, 2))
-                    Trajectory[K*(alloc-1):K*alloc, ] = temp
-                    alloc += 1
-
-                    # add new point
-                    Trajectory[points, 0] = Trajectory[points-1, 0] + xStep
-                    Trajectory[points, 1] = Trajectory[points-1, 1] + yStep
-
-                else:  # overflow due to cycle, terminate tracking
-                    points = cycle
-
-            # check mapping
-            if Mapped[Trajectory[points, 1], Trajectory[points, 0]] == 1:
-                novel = 0
-                phi = np.pi
-            elif Mask[Trajectory[points, 1], Trajectory[points, 0]] == 0:
-                phi = np.pi
-            else:
-                phi = np.arccos(dy[Trajectory[points-1, 1],
-                                   Trajectory[points-1, 0]] *
-                                dy[Trajectory[points, 1],
-                                   Trajectory[points, 0]] +
-                                dx[Trajectory[points-1, 1],
-                                   Trajectory[points-1, 0]] *
-                                dx[Trajectory[points, 1],
-                                   Trajectory[points, 0]])
-
-            # increment trajectory length counter
-            points += 1
+    # track foreground pixels to their sinks
+    Segmentation, Sinks = _gvf_tracking_cython(
+        np.ascontiguousarray(dx, dtype=np.float64),
+        np.ascontiguousarray(dy, dtype=np.float64),
+        np.ascontiguousarray(Mask != 0, dtype=np.uint8))
 
-        # determine if sink is novel
-        if novel == 1:
-
-            # record sinks
-            Sinks.append(Trajectory[points-1, ])
-
-            # add trajectory to label image with new sink value, add mapping
-            for j in range(points):
-                Segmentation[Trajectory[j, 1], Trajectory[j, 0]] = len(Sinks)
-                Mapped[Trajectory[j, 1], Trajectory[j, 0]] = 1
-
-        else:
-
-            # add trajectory to label image with sink value of final point
-            for j in range(points):
-                Segmentation[Trajectory[j, 1], Trajectory[j, 0]] = \
-                    Segmentation[Trajectory[points-1, 1],
-                                 Trajectory[points-1, 0]]
-
-    # convert Sinks to numpy array
-    Sinks = np.asarray(Sinks)
-
-    return Segmentation, Sinks
+    return Segmentation.astype(float), Sinks
 
 
 def merge_sinks(Label, Sinks, Radius=5):
@@ -209,72 +116,32 @@ def merge_sinks(Label, Sinks, Radius=5):
     Merged : array_like
         Label image where attraction regions are merged.
 
+    Notes
+    -----
+    The basins are relabeled with a single lookup table of the merged label
+    of each sink.
+
+    See Also
+    --------
+    histomicstk.segmentation.nuclear.gvf_tracking
+
     """
 
+    rows = Sinks[:, 1].astype(np.intp)
+    cols = Sinks[:, 0].astype(np.intp)
+
     # build seed image
-    SeedImage = np.zeros(Label.shape)
-    for i in range(Sinks.shape[0]):
-        SeedImage[Sinks[i, 1], Sinks[i, 0]] = i+1
+    SeedImage = np.zeros(Label.shape, dtype=bool)
+    SeedImage[rows, cols] = True
 
     # dilate sink image
     Dilated = mp.binary_dilation(SeedImage, mp.disk(Radius))
 
     # generate new labels for merged seeds, define memberships
     Labels = ms.label(Dilated)
-    New = Labels[Sinks[:, 1].astype(np.int), Sinks[:, 0].astype(np.int)]
-
-    # get unique list of seed clusters
-    Unique = np.arange(1, New.max()+1)
-
-    # generate new seed list
-    Merged = np.zeros(Label.shape)
-
-    # get pixel list for each sink object
-    Props = ms.regionprops(Label.astype(np.int))
-
-    # fill in new values
-    for i in Unique:
-        Indices = np.nonzero(New == i)[0]
-        for j in Indices:
-            Coords = Props[j].coords
-            Merged[Coords[:, 0], Coords[:, 1]] = i
-
-    return Merged
-
-
-def detect_cycle(Trajectory, points):
-
-    # initialize trajectory length
-    length = 0
-
-    # identify trajectory bounding box
-    xMin = np.min(Trajectory[0:points, 0])
-    xMax = np.max(Trajectory[0:points, 0])
-    xRange = xMax - xMin + 1
-    yMin = np.min(Trajectory[0:points, 1])
-    yMax = np.max(Trajectory[0:points, 1])
-    yRange = yMax - yMin + 1
-
-    # fill in trajectory map
-    Map = np.zeros((yRange, xRange))
-    for i in range(points):
-        if Map[Trajectory[i, 1]-yMin, Trajectory[i, 0]-xMin] == 1:
-            break
-        else:
-            Map[Trajectory[i, 1]-yMin, Trajectory[i, 0]-xMin] = 1
-        length += 1
-
-    return length
 
+    # merged label of each basin, basin i + 1 being that of sink i
+    New = np.zeros(Sinks.shape[0] + 1)
+    New[1:] = Labels[rows, cols]
 
-def round_float(x):
-    if x >= 0.0:
-        t = np.ceil(x)
-        if t - x > 0.5:
-            t -= 1.0
-        return t
-    else:
-        t = np.ceil(-x)
-        if t + x > 0.5:
-            t -= 1.0
-        return -t
+    return relabel(Label.astype(int), New)
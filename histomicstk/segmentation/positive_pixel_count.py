@@ -1,12 +1,21 @@
 from __future__ import division
 
-from collections import namedtuple
-
+from collections import namedtuple, OrderedDict
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+
+import dask
 from dask import delayed
 import large_image
 import numpy as np
 
 from ..preprocessing.color_conversion import rgb_to_hsi
+from ..utils.foreground_tile_iterator import foreground_tile_iterator
+from ..utils.simple_mask import simple_mask
+from ..utils.tile_source_pool import get_tile_source
 
 
 # This can be an enum in Python >= 3.4
@@ -76,7 +85,9 @@ Output = namedtuple('Output', OutputTotals._fields + (
 
 
 def count_slide(slide_path, params, region=None,
-                tile_grouping=256, make_label_image=False):
+                tile_grouping=256, make_label_image=False,
+                tissue_seg_mag=None, label_image_path=None,
+                label_image_colors=None):
     """Compute a count of positive pixels in the slide at slide_path.
     This routine can also create a label image.
 
@@ -93,6 +104,20 @@ def count_slide(slide_path, params, region=None,
         The number of tiles to process as part of a single task
     make_label_image : bool, default=False
         Whether to make a label image.  See also "Notes"
+    tissue_seg_mag : float, optional
+        If set, the tissue of the slide is segmented at this low
+        magnification and tiles without any tissue are neither decoded
+        nor counted.  Only used if make_label_image is reset and
+        label_image_path is not set.
+    label_image_path : string (path), optional
+        If set, the label image is computed tile by tile along with the
+        statistics and streamed to this file with pyvips, e.g. a tiled
+        TIFF, instead of being held in memory.  The format is given by
+        the extension, defaulting to PNG.  make_label_image is ignored.
+    label_image_colors : array-like, optional
+        A 4x3 array of the RGB color of each label, indexed by the values
+        of Labels, with which the label image written to label_image_path
+        is colorized.  By default the labels are written.
 
     Returns
     -------
@@ -109,20 +134,29 @@ def count_slide(slide_path, params, region=None,
     single-threaded manner.
 
     """
-    ts = large_image.getTileSource(slide_path)
+    ts = get_tile_source(slide_path)
     kwargs = dict(format=large_image.tilesource.TILE_FORMAT_NUMPY)
     if region is not None:
         kwargs['region'] = region
-    if make_label_image:
+    if label_image_path is not None:
+        results = _count_tiles_to_label_image(
+            ts, slide_path, params, kwargs, tile_grouping,
+            label_image_path, label_image_colors)
+    elif make_label_image:
         tile = ts.getRegion(**kwargs)[0]
         return count_image(tile, params)
     else:
         results = []
-        total_tiles = ts.getSingleTile(**kwargs)['iterator_range']['position']
-        for position in range(0, total_tiles, tile_grouping):
+        if tissue_seg_mag is None:
+            total_tiles = ts.getSingleTile(**kwargs)['iterator_range']['position']
+            tile_positions = list(range(total_tiles))
+        else:
+            tile_positions = _tissue_tile_positions(ts, slide_path, kwargs,
+                                                    tissue_seg_mag)
+        for i in range(0, len(tile_positions), tile_grouping):
             results.append(delayed(_count_tiles)(
-                slide_path, params, kwargs, position,
-                min(tile_grouping, total_tiles - position)))
+                slide_path, params, kwargs,
+                tile_positions[i:i + tile_grouping]))
         results = delayed(_combine)(results).compute()
     return _totals_to_stats(results),
 
@@ -132,11 +166,26 @@ def _combine(results):
                               for i in range(len(OutputTotals._fields)))
 
 
-def _count_tiles(slide_path, params, kwargs, position, count):
-    ts = large_image.getTileSource(slide_path)
+def _tissue_tile_positions(ts, slide_path, kwargs, tissue_seg_mag):
+    # segment the tissue at low resolution
+    scale_lres = {'magnification': tissue_seg_mag}
+    im_lres, _ = ts.getRegion(
+        format=large_image.tilesource.TILE_FORMAT_NUMPY,
+        scale=scale_lres
+    )
+    im_fgnd_mask_lres = simple_mask(im_lres[:, :, :3], method='histogram')
+    # tiles with tissue, in hilbert order for the locality of the tile cache
+    return [tile['tile_position']['position']
+            for tile in foreground_tile_iterator(
+                slide_path, im_fgnd_mask_lres, scale_lres, kwargs,
+                order='hilbert')]
+
+
+def _count_tiles(slide_path, params, kwargs, positions):
+    ts = get_tile_source(slide_path)
     lpotf = len(OutputTotals._fields)
     total = [0] * lpotf
-    for pos in range(position, position + count):
+    for pos in positions:
         tile = ts.getSingleTile(tile_position=pos, **kwargs)['tile']
         subtotal = _count_image(tile, params)[0]
         for k in range(lpotf):
@@ -163,24 +212,47 @@ def count_image(image, params):
         NxM array of pixel types.  See Labels for the different values.
 
     """
-    total, masks = _count_image(image, params)
-    mask_all_positive, mask_weak, mask_pos, mask_strong = masks
-    label_image = np.full(image.shape[:-1], Labels.NEGATIVE, dtype=np.uint8)
-    label_image[mask_all_positive] = (
-        mask_weak * Labels.WEAK +
-        mask_pos * Labels.PLAIN +
-        mask_strong * Labels.STRONG
-    )
+    total, label_image = _count_image(image, params)
     return _totals_to_stats(total), label_image
 
 
 def _count_image(image, params):
-    """A version of count_image that doesn't compute the label image and
-    only computes the sums.
+    """A version of count_image that only computes the sums, and returns
+    an OutputTotals and the label image.
 
     """
+    if image.dtype == np.uint8:
+        # the labels of 8-bit RGB values are looked up in a table, and the
+        # intensity of a pixel is the sum of its RGB values over 3 * 255
+        image = image[..., :3]
+        label_image = _label_rgb_uint8(image, params)
+        intensity_sum = image.sum(-1, dtype=np.int32)
+        scale = 1.0 / (3 * 255)
+    else:
+        image_hsi = rgb_to_hsi(image / 255)
+        label_image = _classify_hsi(image_hsi, params)
+        intensity_sum = image_hsi[..., 2]
+        scale = 1.0
+    counts = np.bincount(label_image.ravel(), minlength=5)
+    sums = np.bincount(label_image.ravel(), weights=intensity_sum.ravel(),
+                       minlength=5) * scale
+    # label 4 is only possible if intensity_weak_threshold is below
+    # intensity_strong_threshold, in which case a pixel is both weak and
+    # strong
+    total = OutputTotals(
+        NumberWeakPositive=counts[Labels.WEAK] + counts[4],
+        NumberPositive=counts[Labels.PLAIN],
+        NumberStrongPositive=counts[Labels.STRONG] + counts[4],
+        IntensitySumWeakPositive=sums[Labels.WEAK] + sums[4],
+        IntensitySumPositive=sums[Labels.PLAIN],
+        IntensitySumStrongPositive=sums[Labels.STRONG] + sums[4],
+    )
+    return total, label_image
+
+
+def _classify_hsi(image_hsi, params):
+    """Compute the label image of an image in HSI space."""
     p = params
-    image_hsi = rgb_to_hsi(image / 255)
     mask_all_positive = (
         (np.abs((image_hsi[..., 0] - p.hue_value + 0.5 % 1) - 0.5) <=
          p.hue_width / 2) &
@@ -190,20 +262,221 @@ def _count_image(image, params):
     )
     all_positive_i = image_hsi[mask_all_positive, 2]
     mask_weak = all_positive_i >= p.intensity_weak_threshold
-    nw, iw = np.count_nonzero(mask_weak), np.sum(all_positive_i[mask_weak])
     mask_strong = all_positive_i < p.intensity_strong_threshold
-    ns, is_ = np.count_nonzero(mask_strong), np.sum(all_positive_i[mask_strong])
     mask_pos = ~(mask_weak | mask_strong)
-    np_, ip = np.count_nonzero(mask_pos), np.sum(all_positive_i[mask_pos])
-    total = OutputTotals(
-        NumberWeakPositive=nw,
-        NumberPositive=np_,
-        NumberStrongPositive=ns,
-        IntensitySumWeakPositive=iw,
-        IntensitySumPositive=ip,
-        IntensitySumStrongPositive=is_,
+    label_image = np.full(image_hsi.shape[:-1], Labels.NEGATIVE,
+                          dtype=np.uint8)
+    label_image[mask_all_positive] = (
+        mask_weak * Labels.WEAK +
+        mask_pos * Labels.PLAIN +
+        mask_strong * Labels.STRONG
     )
-    return total, (mask_all_positive, mask_weak, mask_pos, mask_strong)
+    return label_image
+
+
+# number of pixels of an 8-bit image above which the label table of its
+# parameters is built, which costs as much as classifying that many colors
+_LABEL_LUT_MIN_PIXELS = 1 << 22
+
+# label tables most recently used in this process, and the locks under
+# which the table of each parameters is built
+_LABEL_LUT_CACHE_SIZE = 4
+_label_luts = OrderedDict()
+_label_lut_locks = {}
+_label_luts_lock = threading.Lock()
+
+
+def _label_rgb_uint8(image, params):
+    """Compute the label image of an 8-bit RGB image.
+
+    Large images, or any image once the table of `params` is built, are
+    labeled by a lookup in the table of _get_label_lut.  The distinct colors
+    of smaller images are classified instead, which gives the same labels.
+
+    """
+    index = _rgb_index(image)
+    with _label_luts_lock:
+        lut = _label_luts.get(params)
+    if lut is None and index.size >= _LABEL_LUT_MIN_PIXELS:
+        lut = _get_label_lut(params)
+    if lut is not None:
+        return np.take(lut, index)
+    colors, inverse = np.unique(index, return_inverse=True)
+    rgb = np.stack([colors >> 16, (colors >> 8) & 255, colors & 255], -1)
+    labels = _classify_hsi(rgb_to_hsi(rgb[np.newaxis] / 255), params)[0]
+    return labels[inverse].reshape(index.shape)
+
+
+def _get_label_lut(params):
+    """Get a table of the label of each 8-bit RGB value, indexed by
+    _rgb_index.  The label of each RGB value is computed once in float
+    like any other image, hence the table gives the same labels.
+
+    The table of given parameters is built once per process, by the first
+    thread that needs it, while other threads needing it wait.
+
+    """
+    with _label_luts_lock:
+        lut = _label_luts.get(params)
+        if lut is not None:
+            # most recently used tables are last
+            _label_luts[params] = _label_luts.pop(params)
+            return lut
+        lock = _label_lut_locks.setdefault(params, threading.Lock())
+    with lock:
+        with _label_luts_lock:
+            lut = _label_luts.get(params)
+        if lut is not None:
+            return lut
+        lut = np.empty(256 ** 3, dtype=np.uint8)
+        values = np.arange(256, dtype=np.uint8)
+        # compute the table in slabs of 16 red values to bound memory usage
+        for r in range(0, 256, 16):
+            image = np.stack(np.meshgrid(
+                values[r:r + 16], values, values, indexing='ij'), -1)
+            lut[r * 65536:(r + 16) * 65536] = _classify_hsi(
+                rgb_to_hsi(image / 255), params).ravel()
+        with _label_luts_lock:
+            _label_luts[params] = lut
+            while len(_label_luts) > _LABEL_LUT_CACHE_SIZE:
+                old_params, _ = _label_luts.popitem(last=False)
+                _label_lut_locks.pop(old_params, None)
+    return lut
+
+
+def _rgb_index(image):
+    """Index of the RGB value of each pixel of an 8-bit RGB image in the
+    tables of _get_label_lut.
+    """
+    return ((image[..., 0].astype(np.intp) << 16) |
+            (image[..., 1].astype(np.intp) << 8) |
+            image[..., 2])
+
+
+def _count_tiles_to_label_image(ts, slide_path, params, kwargs,
+                                tile_grouping, label_image_path,
+                                label_image_colors):
+    """Count the positive pixels of all tiles and stream the label image
+    to label_image_path.
+
+    The tiles are processed in tasks of whole rows of tiles, which return
+    the totals and the label image strip of their rows.  The tasks are
+    computed in waves that keep all dask threads busy, and each strip is
+    saved to a compressed temporary TIFF file as soon as its wave is done,
+    such that the client never holds more than a wave of strips.  The
+    strips are then joined and written by pyvips, which streams them to the
+    output.  Label images have few distinct values, so the temporary files
+    take much less disk space than the uncompressed label image.
+
+    """
+    import pyvips
+
+    iterator_range = ts.getSingleTile(**kwargs)['iterator_range']
+    num_cols = iterator_range['region_x_max']
+    num_rows = iterator_range['region_y_max']
+
+    rows_per_task = max(1, tile_grouping // num_cols)
+    tasks = [
+        delayed(_count_tile_rows)(
+            slide_path, params, kwargs, num_cols,
+            range(i, min(i + rows_per_task, num_rows)))
+        for i in range(0, num_rows, rows_per_task)
+    ]
+    wave_size = _get_num_dask_threads()
+
+    tmp_dir = tempfile.mkdtemp(prefix='ppc-')
+    try:
+        results = []
+        strip_paths = []
+        for i in range(0, len(tasks), wave_size):
+            for total, strip in dask.compute(*tasks[i:i + wave_size]):
+                results.append(total)
+                strip_path = os.path.join(
+                    tmp_dir, 'strip_%06d.tiff' % len(strip_paths))
+                pyvips.Image.new_from_memory(
+                    np.ascontiguousarray(strip).data, strip.shape[1],
+                    strip.shape[0], 1, 'uchar').tiffsave(
+                        strip_path, compression='deflate')
+                strip_paths.append(strip_path)
+        label_image = _join_vertical(
+            [pyvips.Image.new_from_file(path, access='sequential')
+             for path in strip_paths])
+        if label_image_colors is not None:
+            lut = np.zeros((256, 3), dtype=np.uint8)
+            lut[:len(label_image_colors)] = label_image_colors
+            label_image = label_image.maplut(pyvips.Image.new_from_memory(
+                lut.data, 256, 1, 3, 'uchar'))
+        _write_vips_image(label_image, label_image_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return _combine(results)
+
+
+def _join_vertical(images):
+    """Join pyvips images of the same width top to bottom, each with its
+    own height.  Unlike arrayjoin, which pads all images to the largest
+    one, this keeps the short first and last strips of a region that is
+    not aligned to the tiles.  The images are joined pairwise, such that
+    the pipeline is only logarithmically deep in the number of images.
+
+    """
+    while len(images) > 1:
+        images = [images[i].join(images[i + 1], 'vertical')
+                  if i + 1 < len(images) else images[i]
+                  for i in range(0, len(images), 2)]
+    return images[0]
+
+
+def _count_tile_rows(slide_path, params, kwargs, num_cols, rows):
+    """Count the positive pixels of whole rows of tiles, returning the
+    totals and the label image of the rows.
+    """
+    ts = get_tile_source(slide_path)
+    lpotf = len(OutputTotals._fields)
+    total = [0] * lpotf
+    strips = []
+    for row in rows:
+        labels = []
+        for col in range(num_cols):
+            tile = ts.getSingleTile(tile_position=row * num_cols + col,
+                                    **kwargs)['tile']
+            subtotal, label_image = _count_image(tile, params)
+            for k in range(lpotf):
+                total[k] += subtotal[k]
+            labels.append(label_image)
+        strips.append(np.concatenate(labels, axis=1))
+    return OutputTotals._make(total), np.concatenate(strips, axis=0)
+
+
+def _get_num_dask_threads():
+    """Get the number of threads of the dask workers."""
+    import dask.distributed
+
+    try:
+        client = dask.distributed.get_client()
+    except ValueError:
+        return max(1, multiprocessing.cpu_count())
+    # Client.ncores was renamed to Client.nthreads
+    nthreads = getattr(client, 'nthreads', None) or client.ncores
+    return max(1, sum(nthreads().values()))
+
+
+def _write_vips_image(image, path):
+    """Write a pyvips image, as a tiled TIFF for TIFF files and as a PNG for
+    unknown extensions.
+    """
+    import pyvips
+
+    if os.path.splitext(path)[1].lower() in ('.tif', '.tiff'):
+        image.tiffsave(path, tile=True, compression='lzw', bigtiff=True)
+        return
+    try:
+        image.write_to_file(path)
+    except pyvips.Error:
+        # This is likely caused by an unknown extension, so try again
+        altname = path + '.png'
+        image.write_to_file(altname)
+        os.rename(altname, path)
 
 
 def _totals_to_stats(total):
@@ -11,11 +11,16 @@ from .convert_matrix_to_image import convert_matrix_to_image
 from .del2 import del2
 from .eigen import eigen
 from .exclude_nonfinite import exclude_nonfinite
+from .foreground_tile_iterator import foreground_tile_iterator
 from .gradient_diffusion import gradient_diffusion
 from .hessian import hessian
 from .merge_colinear import merge_colinear
 from .fit_poisson_mixture import fit_poisson_mixture
 from .simple_mask import simple_mask
+from .tile_source_pool import get_tile_source
+from .tile_source_pool import set_tile_source_pool_size
+from .tile_source_pool import tile_source_pool_info
+from .tile_source_pool import clear_tile_source_pool
 from .sample_pixels import sample_pixels  # must import after SimpleMask
 from . import general_utils
 from . import girder_convenience_utils
@@ -30,12 +35,17 @@ __all__ = (
     'del2',
     'eigen',
     'exclude_nonfinite',
+    'foreground_tile_iterator',
     'gradient_diffusion',
     'hessian',
     'merge_colinear',
     'fit_poisson_mixture',
     'sample_pixels',
     'simple_mask',
+    'get_tile_source',
+    'set_tile_source_pool_size',
+    'tile_source_pool_info',
+    'clear_tile_source_pool',
     'general_utils',
     'girder_convenience_utils',
 )
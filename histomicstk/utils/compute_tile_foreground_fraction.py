@@ -1,8 +1,6 @@
 import numpy as np
-import dask
-import dask.distributed
 
-import large_image
+from .tile_source_pool import get_tile_source
 
 
 def compute_tile_foreground_fraction(slide_path, im_fgnd_mask_lres,
@@ -39,88 +37,137 @@ def compute_tile_foreground_fraction(slide_path, im_fgnd_mask_lres,
         is set to None, then a 1D array containing the foreground fraction of
         all tiles will be returned.
 
+    Notes
+    -----
+    No tile is decoded. The tiles of a column of the tile grid share their
+    horizontal extent and the tiles of a row share their vertical extent,
+    hence the bounds of all tiles in the low resolution mask are derived
+    from the geometry of the tiles of the first row and column. The
+    foreground fraction of all tiles is then computed at once from the
+    summed-area table of the mask.
+
     """
 
+    # get slide tile source
+    ts = get_tile_source(slide_path)
+
     if tile_position is None:
 
-        # get slide tile source
-        ts = large_image.getTileSource(slide_path)
+        tile_fgnd_frac, _, _ = _compute_tile_grid_foreground_fraction(
+            ts, im_fgnd_mask_lres, fgnd_seg_scale, it_kwargs)
 
-        num_tiles = ts.getSingleTile(**it_kwargs)['iterator_range']['position']
+        # tile positions are in raster order
+        tile_fgnd_frac = tile_fgnd_frac.ravel()
 
-        # broadcasting fgnd mask to all dask workers
-        try:
-            c = dask.distributed.get_client()
+    elif np.isscalar(tile_position):
 
-            [im_fgnd_mask_lres] = c.scatter([im_fgnd_mask_lres],
-                                            broadcast=True)
-        except ValueError:
-            pass
+        rgn_lres = _convert_regions_to_lres(
+            ts, _get_tile_regions(ts, it_kwargs, [tile_position]),
+            fgnd_seg_scale)
 
-        # compute tile foreground fraction in parallel
-        tile_fgnd_frac = []
+        tile_fgnd_frac = _compute_region_foreground_fraction(
+            im_fgnd_mask_lres, *rgn_lres.T)[0]
 
-        for tile_position in range(num_tiles):
+    else:
 
-            tile_fgnd_frac.append(
-                dask.delayed(_compute_tile_foreground_fraction_single)(
-                    slide_path, im_fgnd_mask_lres, fgnd_seg_scale,
-                    it_kwargs, tile_position
-                ))
+        raise ValueError(
+            'Invalid value for tile_position. Must be None or int')
 
-        tile_fgnd_frac = dask.delayed(tile_fgnd_frac).compute()
+    return tile_fgnd_frac
 
-        tile_fgnd_frac = np.array(tile_fgnd_frac)
 
-    elif np.isscalar(tile_position):
+def _compute_tile_grid_foreground_fraction(ts, im_fgnd_mask_lres,
+                                           fgnd_seg_scale, it_kwargs):
+    """Computes the foreground fraction of all tiles of the tile grid.
 
-        tile_fgnd_frac = _compute_tile_foreground_fraction_single(
-            slide_path, im_fgnd_mask_lres, fgnd_seg_scale,
-            it_kwargs, tile_position
-        )
+    Returns a num_rows x num_cols array of the foreground fraction of each
+    tile, and num_cols x 4 and num_rows x 4 arrays of the (left, top, right,
+    bottom) regions in base pixels of the tiles of the first row and of the
+    first column.
+    """
 
-    else:
+    # get the number of columns and rows of the tile grid
+    iterator_range = ts.getSingleTile(**it_kwargs)['iterator_range']
 
-        raise ValueError(
-            'Invalid value for tile_position. Must be None or int')
+    num_cols = iterator_range['region_x_max']
+    num_rows = iterator_range['region_y_max']
 
-    return tile_fgnd_frac
+    # get the horizontal extent of each column and vertical extent of each
+    # row of the tile grid
+    col_rgn_hres = _get_tile_regions(ts, it_kwargs, range(num_cols))
+    row_rgn_hres = _get_tile_regions(
+        ts, it_kwargs, range(0, num_rows * num_cols, num_cols))
 
+    col_rgn_lres = _convert_regions_to_lres(ts, col_rgn_hres, fgnd_seg_scale)
+    row_rgn_lres = _convert_regions_to_lres(ts, row_rgn_hres, fgnd_seg_scale)
 
-def _compute_tile_foreground_fraction_single(slide_path, im_fgnd_mask_lres,
-                                             fgnd_seg_scale, it_kwargs,
-                                             tile_position):
+    # compute the foreground fraction of all tiles
+    tile_fgnd_frac = _compute_region_foreground_fraction(
+        im_fgnd_mask_lres,
+        col_rgn_lres[None, :, 0], row_rgn_lres[:, None, 1],
+        col_rgn_lres[None, :, 2], row_rgn_lres[:, None, 3])
 
-    # get slide tile source
-    ts = large_image.getTileSource(slide_path)
+    return tile_fgnd_frac, col_rgn_hres, row_rgn_hres
 
-    # get requested tile
-    tile = ts.getSingleTile(tile_position=tile_position,
-                            format=large_image.tilesource.TILE_FORMAT_NUMPY,
-                            **it_kwargs)
 
-    # get current region in base_pixels
-    rgn_hres = {'left': tile['gx'], 'top': tile['gy'],
-                'right': tile['gx'] + tile['gwidth'],
-                'bottom': tile['gy'] + tile['gheight'],
-                'units': 'base_pixels'}
+def _get_tile_regions(ts, it_kwargs, tile_positions):
 
-    # get foreground mask for current tile at low resolution
-    rgn_lres = ts.convertRegionScale(rgn_hres,
-                                     targetScale=fgnd_seg_scale,
-                                     targetUnits='mag_pixels')
+    regions = []
 
-    top = np.int(rgn_lres['top'])
-    bottom = np.int(rgn_lres['bottom'])
-    left = np.int(rgn_lres['left'])
-    right = np.int(rgn_lres['right'])
+    for tile_position in tile_positions:
 
-    im_tile_fgnd_mask_lres = im_fgnd_mask_lres[top:bottom, left:right]
+        # get geometry of the tile, which does not decode it
+        tile = ts.getSingleTile(tile_position=tile_position, **it_kwargs)
 
-    # compute foreground fraction
-    tile_fgnd_frac = im_tile_fgnd_mask_lres.mean()
+        regions.append([tile['gx'], tile['gy'],
+                        tile['gx'] + tile['gwidth'],
+                        tile['gy'] + tile['gheight']])
 
-    if np.isnan(tile_fgnd_frac):
-        tile_fgnd_frac = 0
+    return np.array(regions).reshape(-1, 4)
 
-    return tile_fgnd_frac
+
+def _convert_regions_to_lres(ts, regions, fgnd_seg_scale):
+
+    regions_lres = []
+
+    for left, top, right, bottom in regions:
+
+        # get current region in base_pixels
+        rgn_hres = {'left': left, 'top': top,
+                    'right': right, 'bottom': bottom,
+                    'units': 'base_pixels'}
+
+        # get region of the tile at low resolution
+        rgn_lres = ts.convertRegionScale(rgn_hres,
+                                         targetScale=fgnd_seg_scale,
+                                         targetUnits='mag_pixels')
+
+        regions_lres.append([int(rgn_lres[key])
+                             for key in ('left', 'top', 'right', 'bottom')])
+
+    return np.array(regions_lres, dtype=np.int64).reshape(-1, 4)
+
+
+def _compute_region_foreground_fraction(im_fgnd_mask_lres,
+                                        left, top, right, bottom):
+
+    height, width = im_fgnd_mask_lres.shape[:2]
+
+    # summed-area table of the mask
+    im_sat = np.zeros((height + 1, width + 1),
+                      dtype=np.cumsum(im_fgnd_mask_lres[:1, :1]).dtype)
+    im_sat[1:, 1:] = np.cumsum(np.cumsum(im_fgnd_mask_lres, axis=0), axis=1)
+
+    # clip the regions to the mask
+    top = np.clip(top, 0, height)
+    bottom = np.clip(bottom, top, height)
+    left = np.clip(left, 0, width)
+    right = np.clip(right, left, width)
+
+    area = (bottom - top) * (right - left)
+
+    fgnd_count = (im_sat[bottom, right] - im_sat[top, right] -
+                  im_sat[bottom, left] + im_sat[top, left])
+
+    # fraction of foreground pixels, which is 0 for empty regions
+    return np.where(area > 0, fgnd_count / np.maximum(area, 1.0), 0.0)
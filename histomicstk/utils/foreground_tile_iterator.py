@@ -0,0 +1,128 @@
+import numpy as np
+
+from .compute_tile_foreground_fraction import \
+    _compute_tile_grid_foreground_fraction
+from .tile_source_pool import get_tile_source
+
+
+def foreground_tile_iterator(slide_path, im_fgnd_mask_lres, fgnd_seg_scale,
+                             it_kwargs, min_fgnd_frac=0.0, order='raster'):
+    """
+    Iterates over the tiles of a whole slide image that contain foreground
+    without requesting any tile from the decoder.
+
+    Parameters
+    ----------
+    slide_path : str
+        path to an image or slide
+    im_fgnd_mask_lres : array_like
+        A binary foreground mask computed at a low-resolution
+    fgnd_seg_scale : double
+        The scale/magnification at which the foreground mask `im_fgnd_mask_lres`
+        was computed
+    it_kwargs : dict
+        A dictionary of any key:value parameters (e.g. defining the scale,
+         tile_size, region etc) that define the tiles and need to be
+         passed to `large_image.TileSource.getSingleTile` to get a tile.
+    min_fgnd_frac : double, optional
+        Only tiles whose foreground fraction is greater than `min_fgnd_frac`
+        are yielded. Default value = 0, i.e. tiles with any foreground.
+    order : {'raster', 'hilbert'}, optional
+        Order in which the tiles are yielded. 'raster' yields the tiles in
+        the order of their tile position, 'hilbert' yields the tiles along a
+        Hilbert curve over the tile grid such that consecutive tiles are
+        spatially close, which improves the locality of the tile cache of
+        the decoder. Default value = 'raster'.
+
+    Returns
+    -------
+    tiles : generator of dict
+        A dictionary for each foreground tile containing its 'tile_position'
+        as returned by `large_image.TileSource.getSingleTile` (with
+        'position', 'region_x' and 'region_y' keys), its foreground fraction
+        'fgnd_frac', and its region in base pixels ('gx', 'gy', 'gwidth' and
+        'gheight').
+
+    See Also
+    --------
+    histomicstk.utils.compute_tile_foreground_fraction
+
+    """
+
+    if order not in ('raster', 'hilbert'):
+        raise ValueError('Invalid value for order. Must be raster or hilbert')
+
+    # get slide tile source
+    ts = get_tile_source(slide_path)
+
+    # compute foreground fraction of all tiles
+    tile_fgnd_frac, col_rgn, row_rgn = \
+        _compute_tile_grid_foreground_fraction(
+            ts, im_fgnd_mask_lres, fgnd_seg_scale, it_kwargs)
+
+    num_cols = tile_fgnd_frac.shape[1]
+
+    # select foreground tiles
+    tile_positions = np.flatnonzero(tile_fgnd_frac.ravel() > min_fgnd_frac)
+
+    region_y, region_x = np.divmod(tile_positions, num_cols)
+
+    if order == 'hilbert':
+
+        ind = np.argsort(_hilbert_index(region_x, region_y), kind='mergesort')
+
+        tile_positions = tile_positions[ind]
+        region_x = region_x[ind]
+        region_y = region_y[ind]
+
+    for position, rx, ry in zip(tile_positions, region_x, region_y):
+
+        yield {
+            'tile_position': {
+                'position': int(position),
+                'region_x': int(rx),
+                'region_y': int(ry)
+            },
+            'fgnd_frac': tile_fgnd_frac[ry, rx],
+            'gx': col_rgn[rx, 0],
+            'gy': row_rgn[ry, 1],
+            'gwidth': col_rgn[rx, 2] - col_rgn[rx, 0],
+            'gheight': row_rgn[ry, 3] - row_rgn[ry, 1]
+        }
+
+
+def _hilbert_index(x, y):
+    """Computes the distance along a Hilbert curve of grid points x, y."""
+
+    x = np.array(x, dtype=np.int64)
+    y = np.array(y, dtype=np.int64)
+    d = np.zeros_like(x)
+
+    if x.size == 0:
+        return d
+
+    # smallest power of two side length that covers the grid
+    n = 1
+    while n <= max(x.max(), y.max()):
+        n *= 2
+
+    s = n // 2
+
+    while s > 0:
+
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+
+        d += s * s * ((3 * rx) ^ ry)
+
+        # rotate the quadrant
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+
+        swap = ~ry
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+
+        s //= 2
+
+    return d
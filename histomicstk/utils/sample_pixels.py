@@ -1,15 +1,17 @@
 import dask
 import dask.distributed
 import large_image
-import PIL.Image
 import numpy as np
 
+from .foreground_tile_iterator import foreground_tile_iterator
 from .simple_mask import simple_mask
+from .tile_source_pool import get_tile_source
 
 
 def sample_pixels(slide_path, sample_fraction=None, magnification=None,
                   tissue_seg_mag=1.25, min_coverage=0.1, background=False,
-                  sample_approximate_total=None, tile_grouping=256):
+                  sample_approximate_total=None, tile_grouping=256,
+                  seed=None):
     """Generates a sampling of pixels from a whole-slide image.
 
     Useful for generating statistics or Reinhard color-normalization or
@@ -39,6 +41,12 @@ def sample_pixels(slide_path, sample_fraction=None, magnification=None,
         sample. The fewer tiles are excluded, the more accurate this will be.
     tile_grouping: int, optional
         Number of tiles to process as part of a single task.
+    seed: int, optional
+        Seed of the random generators of the foreground segmentation and of
+        the tiles. Each tile is sampled with a generator seeded by `seed` and
+        its position, such that the sample does not depend on the grouping
+        and scheduling of the tiles. If None, a seed is drawn from numpy's
+        global random generator.
 
     Returns
     -------
@@ -59,52 +67,29 @@ def sample_pixels(slide_path, sample_fraction=None, magnification=None,
         raise ValueError('Exactly one of sample_fraction and ' +
                          'sample_approximate_total must have a value.')
 
-    ts = large_image.getTileSource(slide_path)
+    if seed is None:
+        seed = np.random.randint(2 ** 31)
 
-    if magnification is None:
-        magnification = ts.getMetadata()['magnification']
-
-    # get entire whole-slide image at low resolution
-    scale_lres = {'magnification': tissue_seg_mag}
-    im_lres, _ = ts.getRegion(
-        format=large_image.tilesource.TILE_FORMAT_NUMPY,
-        scale=scale_lres
-    )
-    im_lres = im_lres[:, :, :3]
-
-    # compute foreground mask of whole-slide image at low-res.
-    # it will actually be a background mask if background is set.
-    im_fgnd_mask_lres = bool(background) ^ simple_mask(im_lres)
+    iter_args, tile_positions, im_fgnd_mask_lres = _get_foreground_tiles(
+        slide_path, magnification, tissue_seg_mag, min_coverage,
+        background=background, seed=seed)
 
     if sample_approximate_total is not None:
-        scale_ratio = float(magnification) / tissue_seg_mag
+        scale_ratio = (float(iter_args['scale']['magnification']) /
+                       tissue_seg_mag)
         total_fgnd_pixels = np.count_nonzero(im_fgnd_mask_lres) * scale_ratio ** 2
         sample_fraction = sample_approximate_total / total_fgnd_pixels
 
-    # broadcasting fgnd mask to all dask workers
-    try:
-        c = dask.distributed.get_client()
-
-        [im_fgnd_mask_lres] = c.scatter([im_fgnd_mask_lres],
-                                        broadcast=True)
-    except ValueError:
-        pass
+    im_fgnd_mask_lres = _broadcast_to_workers(im_fgnd_mask_lres)
 
     # generate sample pixels
     sample_pixels = []
 
-    iter_args = dict(scale=dict(magnification=magnification),
-                     format=large_image.tilesource.TILE_FORMAT_NUMPY)
-
-    total_tiles = ts.getSingleTile(**iter_args)['iterator_range']['position']
-
-    for position in range(0, total_tiles, tile_grouping):
+    for i in range(0, len(tile_positions), tile_grouping):
 
         sample_pixels.append(dask.delayed(_sample_pixels_tile)(
-            slide_path, iter_args,
-            (position, min(tile_grouping, total_tiles - position)),
-            sample_fraction, tissue_seg_mag, min_coverage,
-            im_fgnd_mask_lres))
+            slide_path, iter_args, tile_positions[i:i + tile_grouping],
+            sample_fraction, tissue_seg_mag, im_fgnd_mask_lres, seed))
 
     # concatenate pixel values in list
     if sample_pixels:
@@ -116,57 +101,97 @@ def sample_pixels(slide_path, sample_fraction=None, magnification=None,
     return sample_pixels
 
 
-def _sample_pixels_tile(slide_path, iter_args, positions, sample_fraction,
-                        tissue_seg_mag, min_coverage, im_fgnd_mask_lres):
-    start_position, position_count = positions
-    sample_pixels = [np.empty((0, 3))]
-    ts = large_image.getTileSource(slide_path)
-    for position in range(start_position, start_position + position_count):
-        tile = ts.getSingleTile(tile_position=position, **iter_args)
-        # get current region in base_pixels
-        rgn_hres = {'left': tile['gx'], 'top': tile['gy'],
-                    'right': tile['gx'] + tile['gwidth'],
-                    'bottom': tile['gy'] + tile['gheight'],
-                    'units': 'base_pixels'}
+def _get_foreground_tiles(slide_path, magnification, tissue_seg_mag,
+                          min_coverage, background=False, mask_method='kde',
+                          seed=None):
+    """Segment the foreground of a slide at low resolution and get the tiles
+    at `magnification` with enough foreground.
+
+    Returns the arguments of `getSingleTile` to get the tiles, the positions
+    of the tiles in hilbert order such that consecutive tiles are close to
+    each other in the slide, and the low resolution foreground mask, which
+    is a background mask if `background` is set.  `seed` seeds the
+    sampling of the 'kde' `mask_method`.
+
+    """
+    ts = get_tile_source(slide_path)
+
+    if magnification is None:
+        magnification = ts.getMetadata()['magnification']
+
+    # get entire whole-slide image at low resolution
+    scale_lres = {'magnification': tissue_seg_mag}
+    im_lres, _ = ts.getRegion(
+        format=large_image.tilesource.TILE_FORMAT_NUMPY,
+        scale=scale_lres
+    )
+    im_lres = im_lres[:, :, :3]
 
-        # get foreground mask for current tile at low resolution
-        rgn_lres = ts.convertRegionScale(rgn_hres,
-                                         targetScale={'magnification':
-                                                      tissue_seg_mag},
-                                         targetUnits='mag_pixels')
+    # compute foreground mask of whole-slide image at low-res.
+    # it will actually be a background mask if background is set.
+    im_fgnd_mask_lres = bool(background) ^ simple_mask(
+        im_lres, method=mask_method, seed=seed)
 
-        top = np.int(rgn_lres['top'])
-        bottom = np.int(rgn_lres['bottom'])
-        left = np.int(rgn_lres['left'])
-        right = np.int(rgn_lres['right'])
+    iter_args = dict(scale=dict(magnification=magnification),
+                     format=large_image.tilesource.TILE_FORMAT_NUMPY)
 
-        tile_fgnd_mask_lres = im_fgnd_mask_lres[top:bottom, left:right]
+    tile_positions = [
+        tile['tile_position']['position']
+        for tile in foreground_tile_iterator(
+            slide_path, im_fgnd_mask_lres, scale_lres, iter_args,
+            min_fgnd_frac=min_coverage, order='hilbert')
+    ]
 
-        # skip tile if there is not enough foreground in the slide
-        cur_fgnd_frac = tile_fgnd_mask_lres.mean()
+    return iter_args, tile_positions, im_fgnd_mask_lres
 
-        if np.isnan(cur_fgnd_frac) or cur_fgnd_frac <= min_coverage:
-            continue
 
-        # get current tile image
-        im_tile = tile['tile'][:, :, :3]
+def _broadcast_to_workers(value):
+    """Broadcast a value to all dask workers if there is a dask client."""
+
+    try:
+        c = dask.distributed.get_client()
+
+        [value] = c.scatter([value], broadcast=True)
+    except ValueError:
+        pass
+
+    return value
 
-        # get tile foreground mask at resolution of current tile
-        tile_fgnd_mask = np.array(PIL.Image.fromarray(tile_fgnd_mask_lres).resize(
-            im_tile.shape[:2],
-            resample=PIL.Image.NEAREST
-        ))
+
+def _sample_pixels_tile(slide_path, iter_args, positions, sample_fraction,
+                        tissue_seg_mag, im_fgnd_mask_lres, seed):
+    sample_pixels = [np.empty((0, 3))]
+    ts = get_tile_source(slide_path)
+    for position in positions:
+        # the tile is only decoded when its image is accessed
+        tile = ts.getSingleTile(tile_position=position, **iter_args)
+
+        # get tile foreground mask at resolution of current tile from the
+        # geometry of the tile
+        tile_fgnd_mask = _get_tile_fgnd_mask(
+            ts, tile, (tile['height'], tile['width']), tissue_seg_mag,
+            im_fgnd_mask_lres)
 
         # generate linear indices of sample pixels in fgnd mask
-        nz_ind = np.nonzero(tile_fgnd_mask.flatten())[0]
+        nz_ind = np.flatnonzero(tile_fgnd_mask)
+
+        # the random generator of a tile depends on its position only, such
+        # that the sample does not depend on how tiles are grouped in tasks
+        rng = np.random.RandomState([seed, position])
 
         # Handle fractions in the desired sample size by rounding up
         # or down, weighted by the fractional amount.
         float_samples = sample_fraction * nz_ind.size
         num_samples = int(np.floor(float_samples))
-        num_samples += np.random.binomial(1, float_samples - num_samples)
+        num_samples += rng.binomial(1, float_samples - num_samples)
 
-        sample_ind = np.random.choice(nz_ind, num_samples)
+        if num_samples == 0:
+            continue
+
+        sample_ind = nz_ind[rng.randint(nz_ind.size, size=num_samples)]
+
+        # get current tile image
+        im_tile = tile['tile'][:, :, :3]
 
         # convert rgb tile image to Nx3 array
         tile_pix_rgb = np.reshape(im_tile, (-1, 3))
@@ -175,3 +200,42 @@ def _sample_pixels_tile(slide_path, iter_args, positions, sample_fraction,
         sample_pixels.append(tile_pix_rgb[sample_ind, :])
 
     return np.concatenate(sample_pixels, 0)
+
+
+def _get_tile_fgnd_mask(ts, tile, tile_shape, tissue_seg_mag,
+                        im_fgnd_mask_lres):
+    """Get the foreground mask of a tile from the foreground mask of the
+    slide at low resolution, resized to the (rows, columns) `tile_shape`.
+    """
+
+    # get current region in base_pixels
+    rgn_hres = {'left': tile['gx'], 'top': tile['gy'],
+                'right': tile['gx'] + tile['gwidth'],
+                'bottom': tile['gy'] + tile['gheight'],
+                'units': 'base_pixels'}
+
+    # get foreground mask for current tile at low resolution
+    rgn_lres = ts.convertRegionScale(rgn_hres,
+                                     targetScale={'magnification':
+                                                  tissue_seg_mag},
+                                     targetUnits='mag_pixels')
+
+    top = int(rgn_lres['top'])
+    bottom = int(rgn_lres['bottom'])
+    left = int(rgn_lres['left'])
+    right = int(rgn_lres['right'])
+
+    tile_fgnd_mask_lres = im_fgnd_mask_lres[top:bottom, left:right]
+
+    if tile_fgnd_mask_lres.size == 0:
+        return np.zeros(tile_shape, dtype=bool)
+
+    # nearest neighbor resizing, where the center of each pixel of the tile
+    # is mapped to the low resolution pixel containing it in exact integer
+    # arithmetic
+    rows, cols = [
+        ((2 * np.arange(size_hres) + 1) * size_lres) // (2 * size_hres)
+        for size_hres, size_lres in zip(tile_shape,
+                                        tile_fgnd_mask_lres.shape)]
+
+    return tile_fgnd_mask_lres[rows[:, None], cols]
@@ -8,7 +8,8 @@ from scipy import signal
 
 def simple_mask(im_rgb, bandwidth=2, bgnd_std=2.5, tissue_std=30,
                 min_peak_width=10, max_peak_width=25,
-                fraction=0.10, min_tissue_prob=0.05):
+                fraction=0.10, min_tissue_prob=0.05, method='kde',
+                seed=None):
     """Performs segmentation of the foreground (tissue)
     Uses a simple two-component Gaussian mixture model to mask tissue areas
     from background in brightfield H&E images. Kernel-density estimation is
@@ -20,6 +21,12 @@ def simple_mask(im_rgb, bandwidth=2, bgnd_std=2.5, tissue_std=30,
     is more prone to local minima effects). A maximum-likelihood threshold
     is then derived and used to mask the tissue area in a binarized image.
 
+    The smoothed histogram is either estimated by kernel-density estimation
+    from a random sample of pixels, or computed exactly from all pixels by
+    smoothing their 256-bin histogram with a gaussian kernel, which is the
+    kernel-density estimate of all pixels at the 256 gray levels. The latter
+    is fast and deterministic.
+
     Parameters
     ----------
     im_rgb : array_like
@@ -44,6 +51,15 @@ def simple_mask(im_rgb, bandwidth=2, bgnd_std=2.5, tissue_std=30,
         model. Default value = 0.10.
     min_tissue_prob : double, optional
         Minimum probability to qualify as tissue pixel. Default value = 0.05.
+    method : {'kde', 'histogram'}, optional
+        Method used to compute the smoothed grayscale histogram. 'kde' uses
+        kernel-density estimation from a sample of a `fraction` of the pixels
+        and 'histogram' smooths the exact histogram of all pixels.
+        Default value = 'kde'.
+    seed : int, optional
+        Seed of the random number generator used to sample the pixels with
+        the 'kde' method. If None, the global numpy random state is used.
+        Default value = None.
 
     Returns
     -------
@@ -56,16 +72,31 @@ def simple_mask(im_rgb, bandwidth=2, bgnd_std=2.5, tissue_std=30,
 
     """
 
-    # convert image to grayscale, flatten and sample
+    # convert image to grayscale
     im_rgb = 255 * color.rgb2gray(im_rgb)
     im_rgb = im_rgb.astype(np.uint8)
-    num_samples = np.int(fraction * im_rgb.size)
-    sI = np.random.choice(im_rgb.flatten(), num_samples)[:, np.newaxis]
-
-    # kernel-density smoothed histogram
-    KDE = KernelDensity(kernel='gaussian', bandwidth=bandwidth).fit(sI)
     xHist = np.linspace(0, 255, 256)[:, np.newaxis]
-    yHist = np.exp(KDE.score_samples(xHist))[:, np.newaxis]
+
+    if method == 'histogram':
+
+        # gaussian smoothed histogram of all pixels
+        yHist = _smoothed_histogram(im_rgb, bandwidth)[:, np.newaxis]
+
+    elif method == 'kde':
+
+        # flatten and sample
+        rng = np.random if seed is None else np.random.RandomState(seed)
+        num_samples = int(fraction * im_rgb.size)
+        sI = rng.choice(im_rgb.flatten(), num_samples)[:, np.newaxis]
+
+        # kernel-density smoothed histogram
+        KDE = KernelDensity(kernel='gaussian', bandwidth=bandwidth).fit(sI)
+        yHist = np.exp(KDE.score_samples(xHist))[:, np.newaxis]
+
+    else:
+
+        raise ValueError('Invalid value for method. Must be kde or histogram')
+
     yHist = yHist / sum(yHist)
 
     # flip smoothed y-histogram so that background mode is on the left side
@@ -154,6 +185,20 @@ def simple_mask(im_rgb, bandwidth=2, bgnd_std=2.5, tissue_std=30,
     return im_mask
 
 
+def _smoothed_histogram(im_gray, bandwidth):
+    """Computes the 256-bin histogram of a uint8 image smoothed by a
+    gaussian kernel of standard deviation `bandwidth`.
+    """
+
+    hist = np.bincount(im_gray.ravel(), minlength=256).astype(float)
+
+    # gaussian kernel over all offsets between gray levels
+    offsets = np.arange(-255, 256)
+    kernel = np.exp(-0.5 * (offsets / float(bandwidth)) ** 2)
+
+    return np.convolve(hist, kernel)[255:511]
+
+
 def estimate_variance(x, y, peak):
     """Estimates variance of a peak in a histogram using the FWHM of an
     approximate normal distribution.
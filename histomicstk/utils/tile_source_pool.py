@@ -0,0 +1,146 @@
+import collections
+import os
+import threading
+
+import large_image
+
+
+# Maximum number of tile sources kept open by a single process
+DEFAULT_TILE_SOURCE_POOL_SIZE = 8
+
+_pool = collections.OrderedDict()
+_pool_lock = threading.Lock()
+_pool_max_size = DEFAULT_TILE_SOURCE_POOL_SIZE
+_pool_counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def _pool_key(slide_path):
+
+    slide_path = os.path.abspath(slide_path)
+
+    try:
+        mtime = os.path.getmtime(slide_path)
+    except OSError:
+        mtime = None
+
+    return slide_path, mtime
+
+
+def get_tile_source(slide_path):
+    """Returns a large_image tile source for a slide, reusing a tile source
+    already opened by the current process whenever possible.
+
+    Tile sources are kept in a process-local pool with a least recently used
+    eviction policy, so that tile-level tasks running on the same worker
+    process do not re-open and re-parse the header of the slide for every
+    tile. Entries are keyed by the absolute path and the modification time
+    of the slide such that a file that was modified on disk is re-opened.
+
+    Parameters
+    ----------
+    slide_path : str
+        path to an image or slide
+
+    Returns
+    -------
+    ts : large_image.tilesource.TileSource
+        tile source of the slide
+
+    See Also
+    --------
+    histomicstk.utils.tile_source_pool_info,
+    histomicstk.utils.clear_tile_source_pool
+
+    """
+
+    key = _pool_key(slide_path)
+
+    with _pool_lock:
+
+        ts = _pool.get(key)
+
+        if ts is not None:
+            # mark as most recently used
+            _pool[key] = _pool.pop(key)
+            _pool_counters['hits'] += 1
+            return ts
+
+        _pool_counters['misses'] += 1
+
+    # open the slide outside the lock to not block other threads
+    ts = large_image.getTileSource(slide_path)
+
+    with _pool_lock:
+
+        # another thread may have opened the same slide in the meantime
+        ts = _pool.pop(key, ts)
+        _pool[key] = ts
+
+        while len(_pool) > _pool_max_size:
+            _pool.popitem(last=False)
+            _pool_counters['evictions'] += 1
+
+    return ts
+
+
+def set_tile_source_pool_size(max_size):
+    """Sets the maximum number of tile sources kept open by the current
+    process.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of tile sources in the pool. Must be >= 1.
+
+    """
+
+    global _pool_max_size
+
+    if max_size < 1:
+        raise ValueError('Size of the tile source pool must be >= 1')
+
+    with _pool_lock:
+
+        _pool_max_size = int(max_size)
+
+        while len(_pool) > _pool_max_size:
+            _pool.popitem(last=False)
+            _pool_counters['evictions'] += 1
+
+
+def tile_source_pool_info():
+    """Returns the counters of the tile source pool of the current process.
+
+    Returns
+    -------
+    info : dict
+        A dictionary with the number of pool `hits`, `misses` and
+        `evictions` since the process started or the pool was last cleared,
+        along with the current `size` and the `max_size` of the pool.
+
+    """
+
+    with _pool_lock:
+
+        info = dict(_pool_counters)
+        info['size'] = len(_pool)
+        info['max_size'] = _pool_max_size
+
+    return info
+
+
+def clear_tile_source_pool():
+    """Removes all tile sources from the pool of the current process and
+    resets its counters.
+
+    The pool only drops its references, so sources that are still referenced
+    elsewhere, or by the cache of large_image, are not closed.
+
+    """
+
+    with _pool_lock:
+
+        _pool.clear()
+
+        for k in _pool_counters:
+            _pool_counters[k] = 0
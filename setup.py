@@ -60,6 +60,7 @@ setup(
         'scipy>=0.19.0',
         'Pillow>=3.2.0',
         'pandas>=0.19.2',
+        'pyarrow;python_version>="3"',
         'scikit-image>=0.14.2',
         'scikit-learn>=0.18.1,<0.21;python_version<"3"',
         'scikit-learn>=0.18.1;python_version>="3"',
@@ -17,15 +17,22 @@
 #  limitations under the License.
 ###############################################################################
 
+import collections
+import importlib
 import os
 import numpy as np
-from histomicstk.filters.shape import clog, cdog
+from histomicstk.filters.shape import clog, cdog, glog
+from histomicstk.filters.shape.glog import glogkernel
+import scipy.ndimage as ndi
 from skimage.feature import peak_local_max
 import sys
 thisDir = os.path.dirname(os.path.realpath(__file__))
 sys.path.insert(0, thisDir)
 import htk_test_utilities as utilities  # noqa
 
+# the glog function of histomicstk.filters.shape shadows its module
+glog_module = importlib.import_module('histomicstk.filters.shape.glog')
+
 
 def assert_array_almost_equal_neighborhood_lines(im, gt, decimal=4):
     """Wrapper around assert_array_almost_equal to work around scikit-image bug.
@@ -131,3 +138,57 @@ class TestBlobDetectionFilters(object):
             os.path.join(utilities.externaldata('data/Easy1_cdog_sigma_max.npz.sha512')))
         im_sigma_max_gtruth = im_sigma_max_gtruth_data['Easy1_cdog_sigma_max']
         assert_array_almost_equal_neighborhood_lines(im_sigma_max, im_sigma_max_gtruth, decimal=4)
+
+    def test_glog(self):
+
+        rng = np.random.RandomState(0)
+
+        im_input = ndi.gaussian_filter(255 * rng.rand(60, 70), 2)
+
+        scale_range = np.linspace(0.5, 1.5, 3)
+        theta = np.pi / 4
+
+        Rsum, Maxima = glog(im_input, range=scale_range, theta=theta)
+
+        # sum of the responses of the filters of the bank, whose scales are
+        # all within two of the best scale
+        Rsum_gtruth = np.zeros(im_input.shape)
+        for Xi in range(3):
+            Sx = np.exp(scale_range[Xi])
+            triples = [(Sx, Sy, Th)
+                       for Sy in np.exp(scale_range[:Xi])
+                       for Th in np.linspace(0, np.pi - theta, 4)]
+            for SigmaX, SigmaY, Theta in triples + [(Sx, Sx, 0)]:
+                Kernel = glogkernel(SigmaX, SigmaY, Theta) * \
+                    (1 + np.log(SigmaX)) * (1 + np.log(SigmaY))
+                Rsum_gtruth += ndi.convolve(im_input, Kernel,
+                                            mode='constant', cval=0.0)
+
+        np.testing.assert_allclose(Rsum, Rsum_gtruth, atol=1e-10)
+
+        # in parallel threads
+        Rsum_threads, Maxima_threads = glog(
+            im_input, range=scale_range, theta=theta, num_threads=4)
+
+        np.testing.assert_allclose(Rsum_threads, Rsum, atol=1e-10)
+        np.testing.assert_array_equal(Maxima_threads, Maxima)
+
+    def test_glog_cache_size(self, monkeypatch):
+
+        monkeypatch.setattr(glog_module, '_bank_cache',
+                            collections.OrderedDict())
+        monkeypatch.setattr(glog_module, '_bank_cache_nbytes', 0)
+        monkeypatch.setattr(glog_module, '_BANK_CACHE_MAX_BYTES', 1000)
+
+        for i in range(3):
+            glog_module._cached(i, lambda: np.zeros(50))
+
+        # the least recently used value is evicted to stay within the size
+        assert list(glog_module._bank_cache) == [1, 2]
+        assert glog_module._bank_cache_nbytes == 800
+
+        # values larger than the cache are not cached
+        glog_module._cached(3, lambda: np.zeros(200))
+
+        assert len(glog_module._bank_cache) == 0
+        assert glog_module._bank_cache_nbytes == 0
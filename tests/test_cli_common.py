@@ -24,8 +24,13 @@ from argparse import Namespace
 import os
 import json
 import collections
+import gzip
+import shutil
+import tempfile
 import numpy as np
+import pandas as pd
 import skimage.io
+import pytest
 import large_image
 import histomicstk.preprocessing.color_deconvolution as htk_cdeconv
 import histomicstk.preprocessing.color_normalization as htk_cnorm
@@ -38,6 +43,11 @@ sys.path.insert(0, thisDir)
 import htk_test_utilities as utilities  # noqa
 
 
+def _tile_batch(positions, offset):
+
+    return [position + offset for position in positions]
+
+
 class TestCliCommon(object):
 
     def test_get_stain_matrix(self):
@@ -68,6 +78,52 @@ class TestCliCommon(object):
         assert result == expected, "Expected {}, got {}".format(expected,
                                                                 result)
 
+    def test_lut_cache_dir(self):
+
+        args = Namespace()
+
+        with cli_utils.lut_cache_dir(args) as cache_dir:
+
+            assert args.lut_cache_dir == cache_dir
+            assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+
+            open(os.path.join(cache_dir, 'lut.npy'), 'w').close()
+
+        # the directory and the tables cached in it are removed
+        assert not os.path.exists(cache_dir)
+        assert args.lut_cache_dir is None
+
+    def test_process_tile_batches(self):
+
+        import dask.distributed
+
+        tile_positions = [7, 3, 12, 0, 5, 9, 1, 14, 2, 8]
+
+        def check(tile_grouping):
+
+            batches = list(cli_utils.process_tile_batches(
+                _tile_batch, tile_positions, tile_grouping, 100))
+
+            # the batches are the runs of at most tile_grouping positions,
+            # ending with a partial batch, in any order
+            expected = [
+                [p + 100 for p in tile_positions[i:i + tile_grouping]]
+                for i in range(0, len(tile_positions), tile_grouping)]
+
+            assert sorted(batches) == sorted(expected)
+
+            assert list(cli_utils.process_tile_batches(
+                _tile_batch, [], tile_grouping, 100)) == []
+
+        for tile_grouping in (1, 3, 10, 16):
+            check(tile_grouping)
+
+        with dask.distributed.Client(processes=False, n_workers=1,
+                                     threads_per_worker=2) as client:
+            assert dask.distributed.get_client() is client
+            for tile_grouping in (1, 3, 10, 16):
+                check(tile_grouping)
+
     def test_segment_wsi_foreground_at_low_res(self):
         np.random.seed(0)
 
@@ -91,6 +147,15 @@ class TestCliCommon(object):
         np.testing.assert_array_equal(im_fgnd_mask_lres > 0,
                                       im_fgnd_mask_lres_gtruth)
 
+        # the seeded and histogram masks are the same on every run
+        for kwargs in ({'seed': 1}, {'mask_method': 'histogram'}):
+
+            masks = [
+                cli_utils.segment_wsi_foreground_at_low_res(ts, **kwargs)[0]
+                for _ in range(2)]
+
+            np.testing.assert_array_equal(masks[0], masks[1])
+
     def test_create_tile_nuclei_annotations(self):
 
         wsi_path = os.path.join(utilities.externaldata(
@@ -173,6 +238,14 @@ class TestCliCommon(object):
 
         np.testing.assert_equal(num_fgnd_tiles, 2)
 
+        for tile_position, tile_fgnd_frac in enumerate(tile_fgnd_frac_list):
+
+            np.testing.assert_equal(
+                htk_utils.compute_tile_foreground_fraction(
+                    wsi_path, im_fgnd_mask_lres, fgnd_seg_scale,
+                    it_kwargs, tile_position),
+                tile_fgnd_frac)
+
         # create nuclei annotations
         nuclei_bbox_annot_list = []
         nuclei_bndry_annot_list = []
@@ -276,3 +349,182 @@ class TestCliCommon(object):
                 a=5,
             ),
         )
+
+    def test_annotation_writer(self):
+
+        elements = [
+            {'type': 'polyline', 'points': [[1.5, 2.0, 0], [3.0, 4.25, 0]],
+             'closed': True, 'fillColor': 'rgba(0,0,0,0)',
+             'lineColor': 'rgb(0,255,0)'},
+            {'type': 'rectangle', 'center': [10.0, 20.0, 0], 'width': 5.0,
+             'height': 6.0, 'rotation': 0, 'fillColor': 'rgba(0,0,0,0)',
+             'lineColor': 'rgb(0,255,0)'},
+        ]
+
+        tmp_dir = tempfile.mkdtemp()
+
+        try:
+            annot_file = os.path.join(tmp_dir, 'nuclei.anot')
+
+            with cli_utils.AnnotationWriter(annot_file, 'nuclei') as writer:
+                writer.write_elements(elements[:1])
+                writer.write_elements([])
+                writer.write_elements(elements[1:])
+
+            assert writer.count == 2
+
+            with open(annot_file) as f:
+                annotation = json.load(f)
+
+            assert annotation == {'name': 'nuclei', 'elements': elements}
+
+            # empty and compressed annotation
+            annot_file = os.path.join(tmp_dir, 'nuclei.anot.gz')
+
+            with cli_utils.AnnotationWriter(annot_file, 'nuclei'):
+                pass
+
+            with gzip.open(annot_file) as f:
+                annotation = json.loads(f.read().decode('utf8'))
+
+            assert annotation == {'name': 'nuclei', 'elements': []}
+
+            # no partial annotation file is left on errors
+            with pytest.raises(ValueError):
+                with cli_utils.AnnotationWriter(annot_file, 'nuclei') as writer:
+                    writer.write_elements(elements)
+                    raise ValueError()
+
+            assert not os.path.exists(annot_file)
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_concat_nuclei_annotations(self):
+
+        im_label = np.zeros((20, 30), dtype=np.int32)
+        im_label[2:6, 3:9] = 1
+        im_label[10:17, 12:16] = 2
+        im_label[12:15, 20:28] = 4
+
+        tile_info_list = [
+            {'gx': 0, 'gy': 0, 'gwidth': 60, 'gheight': 40,
+             'width': 30, 'height': 20},
+            {'gx': 60, 'gy': 0, 'gwidth': 60, 'gheight': 40,
+             'width': 30, 'height': 20},
+        ]
+
+        for annot_format in ['bbox', 'boundary']:
+
+            annot_list = []
+            expected = []
+
+            for tile_info in tile_info_list:
+
+                annot = cli_utils.compute_tile_nuclei_annotations(
+                    im_label, tile_info, annot_format)
+
+                assert len(annot.offsets) == 4
+
+                annot_list.append(annot)
+                expected.extend(cli_utils.create_tile_nuclei_annotations(
+                    im_label, tile_info, annot_format))
+
+            annot = cli_utils.concat_nuclei_annotations(
+                annot_list, annot_format)
+
+            assert list(cli_utils.nuclei_annotation_elements(annot)) == \
+                expected
+
+            annot = cli_utils.concat_nuclei_annotations([], annot_format)
+
+            assert list(cli_utils.nuclei_annotation_elements(annot)) == []
+
+        # center, width and height of the bounding boxes in base pixels
+        annot = cli_utils.compute_tile_nuclei_bboxes(
+            im_label, tile_info_list[1])
+
+        np.testing.assert_allclose(annot.coords[0], [71.0, 7.0, 14.0, 10.0])
+        np.testing.assert_allclose(annot.coords[2], [107.0, 26.0, 18.0, 8.0])
+
+    def test_parquet_feature_writer(self):
+
+        import pyarrow.parquet as pq
+
+        im_label = np.zeros((20, 30), dtype=np.int32)
+        im_label[2:6, 3:9] = 1
+        im_label[10:17, 12:16] = 2
+
+        tile_info = {'gx': 60, 'gy': 0, 'gwidth': 60, 'gheight': 40,
+                     'width': 30, 'height': 20}
+
+        fdata_ident = cli_utils.compute_tile_nuclei_identifiers(
+            im_label, tile_info)
+
+        np.testing.assert_allclose(fdata_ident.values, [
+            [71.0, 7.0, 66.0, 4.0, 78.0, 12.0],
+            [87.0, 26.0, 84.0, 20.0, 92.0, 34.0],
+        ])
+
+        fdata_list = []
+
+        for i in range(3):
+
+            fdata = fdata_ident.copy()
+            fdata['Feature.Size.Area'] = [24.0 + i, 28.0 + i]
+            fdata['Feature.Shape.Circularity'] = [0.5 * i, 0.25 * i]
+
+            fdata_list.append(fdata)
+
+        tmp_dir = tempfile.mkdtemp()
+
+        try:
+            feature_file = os.path.join(tmp_dir, 'nuclei.parquet')
+
+            with cli_utils.ParquetFeatureWriter(feature_file) as writer:
+                for fdata in fdata_list:
+                    writer.write_frame(fdata)
+
+            assert writer.count == 6
+
+            result = pd.read_parquet(feature_file)
+            expected = pd.concat(fdata_list, ignore_index=True)
+
+            pd.testing.assert_frame_equal(result, expected)
+
+            # one row group per frame and columns can be read selectively
+            assert pq.ParquetFile(feature_file).num_row_groups == 3
+
+            result = pd.read_parquet(feature_file,
+                                     columns=['Feature.Size.Area'])
+
+            assert list(result.columns) == ['Feature.Size.Area']
+            np.testing.assert_allclose(result['Feature.Size.Area'],
+                                       [24, 28, 25, 29, 26, 30])
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_parquet_feature_writer_error(self):
+
+        fdata = pd.DataFrame({'Feature.Size.Area': [24.0, 28.0]})
+
+        tmp_dir = tempfile.mkdtemp()
+
+        try:
+            feature_file = os.path.join(tmp_dir, 'nuclei.parquet')
+
+            # no partial feature file is left on errors, whether or not a
+            # frame was written
+            for frames in ([], [fdata]):
+
+                with pytest.raises(ValueError):
+                    with cli_utils.ParquetFeatureWriter(feature_file) as writer:
+                        for frame in frames:
+                            writer.write_frame(frame)
+                        raise ValueError()
+
+                assert not os.path.exists(feature_file)
+
+        finally:
+            shutil.rmtree(tmp_dir)
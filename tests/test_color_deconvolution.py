@@ -19,8 +19,11 @@
 
 import numpy as np
 import os
+import pytest
 import skimage.io
 from histomicstk.preprocessing import color_deconvolution as htk_dcv
+from histomicstk.preprocessing.color_deconvolution import \
+    slide_separate_stains as htk_slide_dcv
 import sys
 thisDir = os.path.dirname(os.path.realpath(__file__))
 sys.path.insert(0, thisDir)
@@ -58,3 +61,89 @@ class TestColorDeconvolution(object):
                                               conv_result.Wc, 255)
 
         np.testing.assert_allclose(im, im_reconv, atol=1)
+
+    def test_fused_color_deconvolution(self):
+
+        np.random.seed(1)
+
+        im = np.random.randint(0, 256, (100, 120, 3)).astype(np.uint8)
+
+        w = np.array([[0.650, 0.072, 0],
+                      [0.704, 0.990, 0],
+                      [0.286, 0.105, 0]])
+
+        for I_0 in [None, 255, np.array([240, 245, 250])]:
+
+            conv_result = htk_dcv.color_deconvolution(im, w, I_0)
+
+            im_stains = htk_dcv.fused_color_deconvolution(
+                im, w, I_0, block_size=1000)
+
+            assert im_stains.dtype == np.uint8
+
+            np.testing.assert_allclose(im_stains, conv_result.Stains, atol=1)
+            assert np.mean(im_stains == conv_result.Stains) > 0.99
+
+            im_stains = htk_dcv.fused_color_deconvolution(
+                im, w, I_0, channels=[1], dtype=np.float32)
+
+            np.testing.assert_allclose(
+                im_stains[..., 0], conv_result.StainsFloat[..., 1],
+                rtol=1e-4, atol=1e-3)
+
+        # output buffer
+        out = np.zeros((100, 120, 1), dtype=np.uint8)
+
+        im_stains = htk_dcv.fused_color_deconvolution(
+            im, w, channels=[0], out=out)
+
+        assert im_stains is out
+        assert np.any(out)
+
+
+class TestSlideSeparateStains(object):
+
+    def test_merge_sda_statistics(self):
+
+        np.random.seed(1)
+
+        m = np.random.rand(3, 1000) * 255
+
+        sample_size = 100
+
+        # statistics of disjoint chunks of pixels
+        stats = []
+
+        for chunk in np.array_split(np.arange(m.shape[1]), 7):
+
+            stats.append((len(chunk), m[:, chunk].dot(m[:, chunk].T),
+                          m[:, chunk[:sample_size]]))
+
+        merged = stats[0]
+
+        for i, s in enumerate(stats[1:]):
+            merged = htk_slide_dcv._merge_sda_statistics(
+                merged, s, sample_size, i)
+
+        num_pixels, scatter, sample = merged
+
+        assert num_pixels == m.shape[1]
+
+        np.testing.assert_allclose(scatter, m.dot(m.T))
+
+        # the sample consists of distinct pixels
+        assert sample.shape == (3, sample_size)
+        assert len(np.unique(sample[0])) == sample_size
+        assert np.all(np.isin(sample[0], m[0]))
+
+    def test_empty_sample(self, monkeypatch):
+
+        monkeypatch.setattr(
+            htk_slide_dcv, 'compute_slide_sda_statistics',
+            lambda *args, **kwargs: htk_slide_dcv._empty_sda_statistics())
+
+        with pytest.raises(ValueError, match='No foreground pixels'):
+            htk_slide_dcv.slide_separate_stains_macenko_pca('slide.svs', 255)
+
+        with pytest.raises(ValueError, match='No foreground pixels'):
+            htk_slide_dcv.slide_separate_stains_xu_snmf('slide.svs', 255)
@@ -21,6 +21,8 @@ import collections
 import numpy as np
 import os
 from histomicstk.preprocessing import color_normalization as htk_cn
+from histomicstk.preprocessing.color_normalization.reinhard_stats import \
+    _merge_moments
 from histomicstk.cli import utils as cli_utils
 import sys
 thisDir = os.path.dirname(os.path.realpath(__file__))
@@ -60,6 +62,44 @@ class TestReinhardNormalization(object):
         np.testing.assert_allclose(wsi_mean, gt_mean, atol=1e-2)
         np.testing.assert_allclose(wsi_stddev, gt_stddev, atol=1e-2)
 
+        # the merged moments of the sampled pixels agree
+        wsi_mean, wsi_stddev = htk_cn.reinhard_stats(
+            wsi_path, 0.1, magnification=20, method='moments')
+
+        np.testing.assert_allclose(wsi_mean, gt_mean, atol=1e-2)
+        np.testing.assert_allclose(wsi_stddev, gt_stddev, atol=1e-2)
+
+        # seeding the tiles samples other pixels with the same statistics
+        seeded_mean, seeded_stddev = htk_cn.reinhard_stats(
+            wsi_path, 0.1, magnification=20, method='moments', seed=1)
+
+        assert not np.array_equal(seeded_mean, wsi_mean)
+
+        np.testing.assert_allclose(seeded_mean, gt_mean, atol=1e-2)
+        np.testing.assert_allclose(seeded_stddev, gt_stddev, atol=1e-2)
+
+    def test_merge_moments(self):
+
+        np.random.seed(1)
+
+        values = np.random.rand(1000, 3) * 10
+
+        moments = (0, np.full(3, np.nan), np.zeros(3))
+
+        for chunk in np.array_split(values, 7):
+
+            mean = chunk.mean(axis=0)
+
+            moments = _merge_moments(
+                moments, (len(chunk), mean, ((chunk - mean) ** 2).sum(0)))
+
+        count, mean, m2 = moments
+
+        assert count == len(values)
+
+        np.testing.assert_allclose(mean, values.mean(axis=0))
+        np.testing.assert_allclose(np.sqrt(m2 / count), values.std(axis=0))
+
 
 class TestBackgroundIntensity(object):
 
@@ -87,3 +127,43 @@ class TestBackgroundIntensity(object):
                                           sample_approximate_total=5000)
 
         np.testing.assert_allclose(I_0, [242, 244, 241], atol=1)
+
+
+class TestReinhardLUT(object):
+
+    def test_reinhard_lut(self, tmpdir):
+
+        target_mu = [8.63234435, -0.11501964, 0.03868433]
+        target_sigma = [0.57506023, 0.10403329, 0.01364062]
+        src_mu = [8.896134, -0.074579, 0.022006]
+        src_sigma = [0.612143, 0.122667, 0.021361]
+
+        np.random.seed(1)
+
+        im_src = np.random.randint(0, 256, (64, 64, 3)).astype(np.uint8)
+
+        im_gt = htk_cn.reinhard(im_src, target_mu, target_sigma,
+                                src_mu=src_mu, src_sigma=src_sigma)
+
+        # the full table reproduces the float path exactly
+        lut = htk_cn.reinhard_lut(target_mu, target_sigma, src_mu, src_sigma,
+                                  cache_dir=str(tmpdir))
+
+        np.testing.assert_array_equal(
+            htk_cn.apply_reinhard_lut(im_src, lut), im_gt)
+
+        assert len(tmpdir.listdir()) == 1
+
+        # the quantized table is within one intensity level
+        lut = htk_cn.reinhard_lut(target_mu, target_sigma, src_mu, src_sigma,
+                                  grid_size=33)
+
+        report = htk_cn.reinhard_lut_accuracy(
+            lut, target_mu, target_sigma, src_mu, src_sigma, im_src=im_src)
+
+        assert report['num_values'] == 64 * 64
+        assert report['max_abs_error'] <= 1
+        assert report['exact_fraction'] > 0.95
+
+        np.testing.assert_allclose(
+            htk_cn.apply_reinhard_lut(im_src, lut), im_gt, atol=1)
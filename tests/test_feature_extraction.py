@@ -2,6 +2,7 @@ import collections
 import numpy as np
 import os
 import pandas as pd
+import scipy.stats
 import skimage.io
 import skimage.measure
 import tempfile
@@ -299,3 +300,138 @@ class TestFeatureExtraction(object):
 
         pd.testing.assert_frame_equal(
             fdata, fdata_gtruth, check_less_precise=2)
+
+    def test_compute_label_statistics(self):
+
+        from histomicstk.features._label_statistics import (
+            compute_label_statistics, label_pixel_index)
+
+        np.random.seed(0)
+
+        im_label = np.zeros((40, 50), dtype=np.int32)
+        im_label[2:10, 3:15] = 3
+        im_label[12:30, 20:27] = 1
+        im_label[30:40, 40:50] = 7
+        im_label[35, 5] = 9
+
+        im_intensity = np.random.rand(40, 50) * 255
+
+        rprops = skimage.measure.regionprops(im_label)
+
+        pixel_ind, offsets = label_pixel_index(im_label, rprops)
+
+        stats = compute_label_statistics(
+            np.ravel(im_intensity)[pixel_ind], offsets,
+            ['Min', 'Max', 'Mean', 'Median', 'Std', 'IQR', 'MAD',
+             'HistEnergy', 'HistEntropy'])
+
+        for i, prop in enumerate(rprops):
+
+            pixels = im_intensity[prop.coords[:, 0], prop.coords[:, 1]]
+
+            hist, _ = np.histogram(pixels, bins=10)
+            prob = hist / float(len(pixels))
+
+            expected = {
+                'Min': np.min(pixels),
+                'Max': np.max(pixels),
+                'Mean': np.mean(pixels),
+                'Median': np.median(pixels),
+                'Std': np.std(pixels),
+                'IQR': np.subtract(*np.percentile(pixels, [75, 25])),
+                'MAD': np.median(np.abs(pixels - np.median(pixels))),
+                'HistEnergy': np.sum(prob ** 2),
+                'HistEntropy': scipy.stats.entropy(prob),
+            }
+
+            for stat in expected:
+                np.testing.assert_allclose(stats[stat][i], expected[stat])
+
+        # skewness and kurtosis of objects with at least two distinct values
+        stats = compute_label_statistics(
+            np.ravel(im_intensity)[pixel_ind], offsets,
+            ['Skewness', 'Kurtosis'])
+
+        for i, prop in enumerate(rprops[:-1]):
+
+            pixels = im_intensity[prop.coords[:, 0], prop.coords[:, 1]]
+
+            np.testing.assert_allclose(
+                stats['Skewness'][i], scipy.stats.skew(pixels))
+            np.testing.assert_allclose(
+                stats['Kurtosis'][i], scipy.stats.kurtosis(pixels))
+
+        # single pixel object
+        assert stats['Skewness'][-1] == 0
+        assert stats['Kurtosis'][-1] == -3
+
+    def test_object_table(self):
+
+        im_label = np.zeros((60, 80), dtype=np.int32)
+        im_label[5:20, 10:30] = 4
+        im_label[25:45, 40:55] = 2
+        im_label[30:40, 60:75] = 8
+        im_label[50:58, 5:20] = 5
+
+        np.random.seed(1)
+        im_nuclei = (np.random.rand(60, 80) * 255).astype(np.uint8)
+        im_cytoplasm = (np.random.rand(60, 80) * 255).astype(np.uint8)
+
+        object_table = htk_features.ObjectTable(im_label)
+
+        assert len(object_table) == 4
+        assert list(object_table.labels) == [2, 4, 5, 8]
+
+        pixel_ind, offsets = object_table.pixel_index()
+
+        for i, prop in enumerate(object_table.rprops):
+
+            np.testing.assert_array_equal(
+                np.sort(pixel_ind[offsets[i]:offsets[i + 1]]),
+                np.ravel_multi_index(prop.coords.T, im_label.shape))
+
+            assert np.all(object_table.crop_mask(i) == prop.image)
+
+        # features are the same when computed in parallel threads
+        fdata = htk_features.compute_nuclei_features(
+            im_label, im_nuclei, im_cytoplasm)
+
+        fdata_threads = htk_features.compute_nuclei_features(
+            im_label, im_nuclei, im_cytoplasm, num_threads=4)
+
+        assert list(fdata.columns) == list(fdata_threads.columns)
+
+        pd.testing.assert_frame_equal(fdata, fdata_threads)
+
+    def test_object_table_boundaries(self):
+
+        from skimage.segmentation import find_boundaries
+
+        from histomicstk.features.compute_fsd_features import _GetBounds
+
+        # touching objects, objects at the image border and single pixels
+        im_label = np.zeros((50, 60), dtype=np.int32)
+        im_label[0:10, 0:12] = 1
+        im_label[10:20, 5:15] = 2
+        im_label[30:50, 45:60] = 3
+        im_label[25, 25] = 4
+        im_label[40:48, 0:3] = 5
+        im_label[44, 3:30] = 6
+
+        object_table = htk_features.ObjectTable(im_label)
+
+        for delta in [0, 1, 8]:
+
+            bounds, offsets = object_table.boundaries(delta)
+
+            for i, prop in enumerate(object_table.rprops):
+
+                min_row, max_row, min_col, max_col = _GetBounds(
+                    prop.bbox, delta, *im_label.shape)
+
+                lmask = im_label[min_row:max_row,
+                                 min_col:max_col] == prop.label
+
+                np.testing.assert_array_equal(
+                    bounds[offsets[i]:offsets[i + 1]],
+                    np.argwhere(find_boundaries(lmask, mode='inner')))
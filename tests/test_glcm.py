@@ -20,6 +20,7 @@
 import histomicstk as htk
 import numpy as np
 import skimage.feature
+import skimage.measure
 
 
 class TestGLCMMatrixGeneration(object):
@@ -72,3 +73,70 @@ class TestGLCMMatrixGeneration(object):
         )
 
         np.testing.assert_allclose(np.squeeze(res_htk), np.squeeze(res_skim))
+
+    def test_haralick_features_glcm(self):
+
+        np.random.seed(0)
+
+        im_intensity = np.random.randint(0, 256, (30, 40)).astype(float)
+
+        im_label = np.zeros((30, 40), dtype=np.int32)
+        im_label[2:9, 3:12] = 1
+        im_label[10:20, 25:40] = 2
+        im_label[22:30, 0:5] = 3
+        im_label[25, 20] = 4
+
+        fdata = htk.features.compute_haralick_features(
+            im_label, im_intensity, num_levels=8)
+
+        offsets = np.array([[0, 1], [1, 0], [1, 1], [1, -1]])
+
+        # the features of each object are computed from the GLCMs of its
+        # bounding box extended by one row and column
+        for i, prop in enumerate(skimage.measure.regionprops(im_label)):
+
+            minr, minc, maxr, maxc = prop.bbox
+
+            glcm = htk.features.graycomatrixext(
+                im_intensity[minr:maxr+1, minc:maxc+1].astype(np.uint8),
+                offsets=offsets, num_levels=8, symmetric=True, normed=True)
+
+            asm = np.sum(np.square(glcm), axis=(0, 1))
+
+            np.testing.assert_allclose(
+                fdata['Haralick.ASM.Mean'][i], np.mean(asm))
+            np.testing.assert_allclose(
+                fdata['Haralick.ASM.Range'][i], np.ptp(asm))
+
+            # contrast
+            i_minus_j = np.subtract.outer(np.arange(8), np.arange(8))
+            contrast = np.sum(
+                np.square(i_minus_j)[:, :, None] * glcm, axis=(0, 1))
+
+            np.testing.assert_allclose(
+                fdata['Haralick.Contrast.Mean'][i], np.mean(contrast))
+
+    def test_graycomatrixext_roi_mask(self):
+
+        from histomicstk.features.graycomatrixext import \
+            _graycomatrixext_numpy
+
+        np.random.seed(1)
+
+        image = np.random.randint(0, 8, (20, 30))
+        im_roi_mask = np.random.rand(20, 30) > 0.3
+        offsets = np.array([[0, 1], [1, 0], [1, 1], [1, -1], [-2, 3]])
+
+        for symmetric in [False, True]:
+            for normed in [False, True]:
+
+                res_htk = htk.features.graycomatrixext(
+                    image, im_roi_mask=im_roi_mask, offsets=offsets,
+                    num_levels=8, gray_limits=[0, 7],
+                    symmetric=symmetric, normed=normed)
+
+                res_numpy = _graycomatrixext_numpy(
+                    image, im_roi_mask, offsets, 8,
+                    symmetric, normed, False)
+
+                np.testing.assert_allclose(res_htk, res_numpy)
@@ -97,3 +97,66 @@ class TestNucleiSegmentation(object):
         num_nuclei = len(np.unique(im_nuclei_seg_mask)) - 1
 
         assert num_nuclei == 0
+
+    def test_gvf_tracking(self):
+
+        # three gaussian blobs
+        yy, xx = np.mgrid[:64, :96]
+        centers = [(20, 20), (40, 50), (25, 75)]
+
+        im_input = sum(
+            np.exp(-((yy - r) ** 2 + (xx - c) ** 2) / (2 * 6.0 ** 2))
+            for r, c in centers)
+
+        im_mask = im_input > 0.1
+
+        im_label, sinks = htk_seg.nuclear.gvf_tracking(im_input, im_mask)
+
+        # every foreground pixel is tracked to a sink
+        assert sinks.shape[1] == 2
+        assert np.all(im_label[im_mask] > 0)
+        np.testing.assert_array_equal(np.unique(im_label[im_label > 0]),
+                                      np.arange(1, len(sinks) + 1))
+
+        # merged basins are the blobs
+        im_merged = htk_seg.nuclear.merge_sinks(im_label, sinks, 5)
+
+        assert len(np.unique(im_merged[im_mask])) == len(centers)
+        assert len(set(im_merged[r, c] for r, c in centers)) == len(centers)
+
+        # segment the blobs as dark nuclei
+        im_nuclei_seg_mask = htk_seg.nuclear.detect_nuclei_gvf(
+            255 - 200.0 * (im_input > 0.3), im_input > 0.3,
+            min_radius=6, max_radius=10,
+            min_nucleus_area=20, merge_radius=10
+        )
+
+        assert len(np.unique(im_nuclei_seg_mask)) - 1 == len(centers)
+        assert len(set(im_nuclei_seg_mask[r, c] for r, c in centers)) == \
+            len(centers)
+
+    def test_gaussian_voting(self):
+
+        # dark nuclei on a light background
+        yy, xx = np.mgrid[:256, :320]
+        centers = [(60, 60), (60, 200), (170, 110), (180, 250)]
+
+        im_input = np.full((256, 320), 220.0)
+
+        for r, c in centers:
+            im_input[(yy - r) ** 2 + (xx - c) ** 2 < 18 ** 2] = 60
+
+        nuclei, im_votes = htk_seg.nuclear.gaussian_voting(im_input)
+
+        assert im_votes.shape == im_input.shape
+        assert len(nuclei.X) == len(centers)
+
+        for r, c in centers:
+            assert np.min(np.hypot(nuclei.Y - r, nuclei.X - c)) < 2
+
+        # no voting pixels
+        nuclei, im_votes = htk_seg.nuclear.gaussian_voting(
+            np.zeros((64, 64)))
+
+        assert len(nuclei.X) == 0
+        assert not np.any(im_votes)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+###############################################################################
+
+import os
+import sys
+
+import large_image
+import numpy as np
+import skimage.io
+
+from histomicstk.preprocessing.color_conversion import rgb_to_hsi
+import histomicstk.segmentation.positive_pixel_count as ppc
+
+thisDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, thisDir)
+import htk_test_utilities as utilities  # noqa
+
+
+params = ppc.Parameters(
+    hue_value=0.05,
+    hue_width=0.15,
+    saturation_minimum=0.05,
+    intensity_upper_limit=0.95,
+    intensity_weak_threshold=0.65,
+    intensity_strong_threshold=0.35,
+    intensity_lower_limit=0.05,
+)
+
+
+class TestPositivePixelCount(object):
+
+    def test_count_image(self):
+
+        im_rgb = np.random.RandomState(1).randint(
+            256, size=(64, 96, 3)).astype(np.uint8)
+
+        # labels and intensities computed in floating point
+        im_hsi = rgb_to_hsi(im_rgb / 255.0)
+        label_image_float = ppc._classify_hsi(im_hsi, params)
+
+        stats, label_image = ppc.count_image(im_rgb, params)
+
+        np.testing.assert_array_equal(label_image, label_image_float)
+
+        for label, field in [
+                (ppc.Labels.WEAK, 'WeakPositive'),
+                (ppc.Labels.PLAIN, 'Positive'),
+                (ppc.Labels.STRONG, 'StrongPositive')]:
+
+            mask = label_image_float == label
+
+            assert getattr(stats, 'Number' + field) == np.count_nonzero(mask)
+            np.testing.assert_allclose(
+                getattr(stats, 'IntensitySum' + field),
+                im_hsi[mask, 2].sum())
+
+        # large images are labeled with the table of all 8-bit RGB values
+        lut = ppc._get_label_lut(params)
+
+        np.testing.assert_array_equal(
+            np.take(lut, ppc._rgb_index(im_rgb)), label_image_float)
+
+        # images that are not 8-bit are classified in floating point
+        stats_float, label_image = ppc.count_image(
+            im_rgb.astype(np.float64), params)
+
+        np.testing.assert_array_equal(label_image, label_image_float)
+        np.testing.assert_allclose(stats_float, stats)
+
+    def test_count_slide_label_image_path(self, tmpdir):
+
+        wsi_path = utilities.externaldata(
+            'data/TCGA-06-0129-01Z-00-DX3.bae772ea-dd36-47ec-8185-761989be3cc8.svs.sha512'  # noqa
+        )
+
+        ts_metadata = large_image.getTileSource(wsi_path).getMetadata()
+        tile_width = ts_metadata['tileWidth']
+        tile_height = ts_metadata['tileHeight']
+
+        # a region whose first and last rows and columns of tiles are short
+        left = tile_width * (ts_metadata['sizeX'] // (2 * tile_width))
+        top = tile_height * (ts_metadata['sizeY'] // (2 * tile_height))
+        region = {'left': left + tile_width // 3,
+                  'top': top + tile_height // 2,
+                  'width': tile_width * 3 + tile_width // 4,
+                  'height': tile_height * 5 + tile_height // 5,
+                  'units': 'base_pixels'}
+
+        stats, label_image = ppc.count_slide(
+            wsi_path, params, region=region, make_label_image=True)
+
+        # one row of tiles per strip
+        label_image_path = str(tmpdir.join('label_image.png'))
+        stats_streamed, = ppc.count_slide(
+            wsi_path, params, region=region, tile_grouping=1,
+            label_image_path=label_image_path)
+
+        np.testing.assert_array_equal(
+            skimage.io.imread(label_image_path), label_image)
+        np.testing.assert_allclose(stats_streamed, stats)
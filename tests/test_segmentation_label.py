@@ -20,6 +20,9 @@
 import numpy as np
 from histomicstk.segmentation.label import trace_object_boundaries
 from histomicstk.segmentation.label import delete_border
+from histomicstk.segmentation.label import (
+    area_open, condense, delete, relabel, split, trace_label_boundaries,
+    width_open)
 
 
 class TestTraceBoundary(object):
@@ -64,6 +67,33 @@ class TestTraceBoundary(object):
         np.testing.assert_allclose(rx_moore, x_moore[0])
         np.testing.assert_allclose(ry_moore, y_moore[0])
 
+        # trace all objects of a label image at once
+        im_label = np.zeros((13, 14), dtype=np.int32)
+        im_label[1:12, 1:11][m_neighbor] = 5
+        im_label[2:5, 11:13] = 2
+
+        for conn, rx, ry in [(4, rx_isbf, ry_isbf), (8, rx_moore, ry_moore)]:
+
+            x, y, offsets, labels = trace_label_boundaries(
+                im_label, conn, simplify_colinear_spurs=False)
+
+            np.testing.assert_array_equal(labels, [2, 5])
+
+            np.testing.assert_array_equal(
+                x[offsets[1]:offsets[2]], np.array(rx) + 1)
+            np.testing.assert_array_equal(
+                y[offsets[1]:offsets[2]], np.array(ry) + 1)
+
+            x_all, y_all = trace_object_boundaries(
+                im_label, conn, trace_all=True,
+                simplify_colinear_spurs=False)
+
+            for i in range(len(labels)):
+                np.testing.assert_array_equal(
+                    x_all[i], x[offsets[i]:offsets[i + 1]])
+                np.testing.assert_array_equal(
+                    y_all[i], y[offsets[i]:offsets[i + 1]])
+
 
 class TestDeleteBorderLabel(object):
 
@@ -87,3 +117,68 @@ class TestDeleteBorderLabel(object):
         im_label_del = delete_border(im_label)
 
         np.testing.assert_array_equal(im_label_del, im_label)
+
+
+class TestRelabel(object):
+
+    def test_relabel(self):
+
+        im_label = np.array([[0, 2, 2, 0, 5],
+                             [0, 2, 0, 0, 5],
+                             [7, 0, 0, 5, 5]])
+
+        remap = np.array([0, 0, 1, 0, 0, 3, 0, 0])
+
+        np.testing.assert_array_equal(relabel(im_label, remap), remap[im_label])
+
+        # relabel in place
+        im_out = im_label.copy()
+        relabel(im_out, remap, out=im_out)
+
+        np.testing.assert_array_equal(im_out, remap[im_label])
+
+        np.testing.assert_array_equal(condense(im_label),
+                                      [[0, 1, 1, 0, 2],
+                                       [0, 1, 0, 0, 2],
+                                       [3, 0, 0, 2, 2]])
+
+        np.testing.assert_array_equal(delete(im_label, np.array([2, 7])),
+                                      [[0, 0, 0, 0, 5],
+                                       [0, 0, 0, 0, 5],
+                                       [0, 0, 0, 5, 5]])
+
+        np.testing.assert_array_equal(area_open(im_label, 3),
+                                      [[0, 1, 1, 0, 2],
+                                       [0, 1, 0, 0, 2],
+                                       [0, 0, 0, 2, 2]])
+
+    def test_split(self):
+
+        im_label = np.array([[3, 3, 0, 3, 0],
+                             [0, 0, 0, 0, 0],
+                             [5, 0, 3, 0, 5],
+                             [0, 5, 0, 0, 5]])
+
+        # the first portion of each object keeps its (condensed) label
+        np.testing.assert_array_equal(split(im_label, conn=8),
+                                      [[1, 1, 0, 3, 0],
+                                       [0, 0, 0, 0, 0],
+                                       [2, 0, 4, 0, 5],
+                                       [0, 2, 0, 0, 5]])
+
+        np.testing.assert_array_equal(split(im_label, conn=4),
+                                      [[1, 1, 0, 3, 0],
+                                       [0, 0, 0, 0, 0],
+                                       [2, 0, 4, 0, 5],
+                                       [0, 6, 0, 0, 5]])
+
+    def test_width_open(self):
+
+        im_label = np.zeros((10, 10), dtype=np.int32)
+        im_label[1:6, 1:6] = 4
+        im_label[1:6, 6] = 2
+        im_label[8, 1:9] = 9
+
+        # the thin objects have a width of 1, the square has a width of 3
+        np.testing.assert_array_equal(width_open(im_label, 2),
+                                      np.where(im_label == 4, 1, 0))
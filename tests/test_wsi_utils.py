@@ -0,0 +1,165 @@
+import os
+import sys
+
+import large_image
+import numpy as np
+
+from histomicstk.cli import utils as cli_utils
+import histomicstk.utils as htk_utils
+
+thisDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, thisDir)
+import htk_test_utilities as utilities  # noqa
+
+
+class TestTileSourcePool(object):
+
+    def test_get_tile_source(self):
+
+        image_path = utilities.externaldata('data/Easy1.png.sha512')
+
+        htk_utils.clear_tile_source_pool()
+
+        ts1 = htk_utils.get_tile_source(image_path)
+        ts2 = htk_utils.get_tile_source(image_path)
+
+        assert ts1 is ts2
+
+        info = htk_utils.tile_source_pool_info()
+
+        assert info['hits'] == 1
+        assert info['misses'] == 1
+        assert info['size'] == 1
+
+    def test_tile_source_pool_eviction(self):
+
+        image_path = utilities.externaldata('data/Easy1.png.sha512')
+        other_path = utilities.externaldata('data/L1.png.sha512')
+
+        htk_utils.clear_tile_source_pool()
+        htk_utils.set_tile_source_pool_size(1)
+
+        try:
+            htk_utils.get_tile_source(image_path)
+            htk_utils.get_tile_source(other_path)
+            htk_utils.get_tile_source(image_path)
+
+            info = htk_utils.tile_source_pool_info()
+
+            assert info['misses'] == 3
+            assert info['evictions'] == 2
+            assert info['size'] == 1
+
+        finally:
+            htk_utils.set_tile_source_pool_size(
+                htk_utils.tile_source_pool.DEFAULT_TILE_SOURCE_POOL_SIZE)
+            htk_utils.clear_tile_source_pool()
+
+
+class TestForegroundTileIterator(object):
+
+    def test_foreground_tile_iterator(self):
+
+        wsi_path = utilities.externaldata(
+            'data/TCGA-06-0129-01Z-00-DX3.bae772ea-dd36-47ec-8185-761989be3cc8.svs.sha512'  # noqa
+        )
+
+        ts = large_image.getTileSource(wsi_path)
+
+        im_fgnd_mask_lres, fgnd_seg_scale = \
+            cli_utils.segment_wsi_foreground_at_low_res(ts)
+
+        it_kwargs = {
+            'tile_size': {'width': 512},
+            'scale': {'magnification': 10},
+        }
+
+        tile_fgnd_frac = htk_utils.compute_tile_foreground_fraction(
+            wsi_path, im_fgnd_mask_lres, fgnd_seg_scale, it_kwargs)
+
+        tiles = list(htk_utils.foreground_tile_iterator(
+            wsi_path, im_fgnd_mask_lres, fgnd_seg_scale, it_kwargs,
+            min_fgnd_frac=0.25))
+
+        positions = [tile['tile_position']['position'] for tile in tiles]
+
+        np.testing.assert_array_equal(
+            positions, np.flatnonzero(tile_fgnd_frac > 0.25))
+
+        # tile geometry and foreground fraction match those of the tiles
+        for tile in tiles[::10]:
+
+            tile_info = ts.getSingleTile(
+                tile_position=tile['tile_position']['position'], **it_kwargs)
+
+            for key in ['gx', 'gy', 'gwidth', 'gheight']:
+                assert tile[key] == tile_info[key]
+
+            for key in ['region_x', 'region_y']:
+                assert (tile['tile_position'][key] ==
+                        tile_info['tile_position'][key])
+
+            assert (tile['fgnd_frac'] ==
+                    tile_fgnd_frac[tile['tile_position']['position']])
+
+        # hilbert order yields the same tiles
+        hilbert_positions = [
+            tile['tile_position']['position']
+            for tile in htk_utils.foreground_tile_iterator(
+                wsi_path, im_fgnd_mask_lres, fgnd_seg_scale, it_kwargs,
+                min_fgnd_frac=0.25, order='hilbert')]
+
+        assert sorted(hilbert_positions) == positions
+
+
+class TestSimpleMask(object):
+
+    def test_simple_mask_histogram(self):
+
+        # synthetic slide thumbnail with an elliptic tissue region
+        rng = np.random.RandomState(0)
+
+        yy, xx = np.mgrid[:150, :200]
+        tissue = ((yy - 70) ** 2 / 50.0 ** 2 + (xx - 90) ** 2 / 70.0 ** 2) < 1
+
+        im_rgb = np.where(tissue[..., None],
+                          rng.normal([180, 110, 170], 25, (150, 200, 3)),
+                          rng.normal(235, 3, (150, 200, 3)))
+        im_rgb = np.clip(im_rgb, 0, 255).astype(np.uint8)
+
+        im_mask = htk_utils.simple_mask(im_rgb, method='histogram')
+
+        assert np.mean(im_mask[tissue]) > 0.9
+        assert np.mean(im_mask[~tissue]) < 0.01
+
+        # the mask agrees with the one of the kernel density estimate
+        im_mask_kde = htk_utils.simple_mask(im_rgb, fraction=1.0, seed=0)
+
+        assert np.mean(im_mask == im_mask_kde) > 0.99
+
+        # sampling is reproducible with a seed
+        np.testing.assert_array_equal(
+            htk_utils.simple_mask(im_rgb, seed=1),
+            htk_utils.simple_mask(im_rgb, seed=1))
+
+
+class TestSamplePixels(object):
+
+    def test_sample_pixels_seed(self):
+
+        wsi_path = utilities.externaldata(
+            'data/sample_svs_image.TCGA-DU-6399-01A-01-TS1.e8eb65de-d63e-42db-af6f-14fefbbdf7bd.svs.sha512'  # noqa
+        )
+
+        # the sample, including the foreground mask, depends on the seed
+        # only, not on the grouping of tiles
+        sample1 = htk_utils.sample_pixels(
+            wsi_path, sample_fraction=0.01, magnification=10,
+            tile_grouping=4, seed=2)
+
+        sample2 = htk_utils.sample_pixels(
+            wsi_path, sample_fraction=0.01, magnification=10,
+            tile_grouping=256, seed=2)
+
+        assert sample1.shape[0] > 0
+        np.testing.assert_array_equal(sample1, sample2)